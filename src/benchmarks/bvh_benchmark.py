@@ -0,0 +1,79 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+import sys
+import time
+
+import numpy
+
+from utils.algebra.bvh import buildBVH, refitBVH,\
+                              frustumQueryBVH, rayQueryBVH, overlapQueryBVH
+from utils.algebra.culling import frustumPlanes, visibleBounds
+from utils.algebra.matrix44 import getProjectionMatrix, getLookAtMatrix
+
+def randomBoxes(numBoxes, worldSize=1000.0):
+    """
+    random boxes with sizes of about 1/100 of the world.
+    """
+    centers = numpy.random.uniform(-worldSize, worldSize, (numBoxes,3)).astype('float32')
+    extents = numpy.random.uniform(0.1, worldSize*0.01, (numBoxes,3)).astype('float32')
+    return (centers - extents, centers + extents)
+
+def timeCall(func, *args):
+    """
+    returns the result and the best time of a few calls.
+    """
+    best = 1.0e30
+    for i in range(5):
+        t = time.time()
+        result = func(*args)
+        best = min(best, time.time() - t)
+    return (result, best)
+
+def benchmarkBVH(numBoxes):
+    (boxMin, boxMax) = randomBoxes(numBoxes)
+    (tree, buildTime) = timeCall(buildBVH, boxMin, boxMax)
+    (_, refitTime) = timeCall(refitBVH, *(tree + (boxMin, boxMax)))
+
+    # a camera in the world looking at the center, matrices in gl layout
+    projection = getProjectionMatrix(60.0, 4.0/3.0, 1.0, 500.0)
+    modelView = getLookAtMatrix(numpy.array([300.0, 100.0, 300.0], 'float32'),
+                                numpy.zeros(3, 'float32'),
+                                numpy.array([0.0, 1.0, 0.0], 'float32'))
+    planes = frustumPlanes(projection, modelView)
+    (mask, frustumTime) = timeCall(frustumQueryBVH, planes, *(tree + (boxMin, boxMax)))
+
+    centers = 0.5*(boxMin + boxMax)
+    extents = 0.5*(boxMax - boxMin)
+    radii = numpy.sqrt((extents**2).sum(axis=1)).astype('float32')
+    (linearMask, linearTime) = timeCall(visibleBounds, planes, centers, radii, extents)
+
+    origin = numpy.array([-1000.0, 0.0, 0.0], 'float32')
+    direction = numpy.array([1.0, 0.0, 0.0], 'float32')
+    ((hits, _), rayTime) = timeCall(rayQueryBVH, origin, direction, 1.0e30,
+                                    *(tree + (boxMin, boxMax)))
+    center = numpy.zeros(3, 'float32')
+    (sphereHits, sphereTime) = timeCall(overlapQueryBVH, center, center, 100.0,
+                                        *(tree + (boxMin, boxMax)))
+    (boxHits, boxTime) = timeCall(overlapQueryBVH, center - 100.0, center + 100.0, -1.0,
+                                  *(tree + (boxMin, boxMax)))
+
+    print "%7d boxes  build %.4f s  refit %.5f s" % (numBoxes, buildTime, refitTime)
+    print "    frustum  %.5f s  linear %.5f s (%.1fx)  %d visible, %d linear visible" % (
+            frustumTime, linearTime, linearTime/max(frustumTime, 1e-9),
+            int(mask.sum()), int(linearMask.sum()))
+    print "    ray %.6f s (%d hits)  sphere %.6f s (%d hits)  box %.6f s (%d hits)" % (
+            rayTime, len(hits), sphereTime, len(sphereHits), boxTime, len(boxHits))
+
+if __name__ == "__main__":
+    if len(sys.argv)>1:
+        counts = map(int, sys.argv[1:])
+    else:
+        counts = [1000, 10000, 100000]
+    numpy.random.seed(0)
+    for numBoxes in counts:
+        benchmarkBVH(numBoxes)
@@ -0,0 +1,53 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+import os
+import time
+import tempfile
+import shutil
+
+from xml_parser.xml_loader import XMLLoader
+from xml_parser.xml_cache import GeometryCache
+from benchmarks.scene_generator import writeGridScene
+
+def loadScene(file, modelNames, useGeometryCache):
+    """
+    loads models and processes the vertex data of all segments,
+    this is what Model.create does before creating gl resources.
+    """
+    xmlLoader = XMLLoader([file], useGeometryCache=useGeometryCache)
+    models = [xmlLoader.getModel(m) for m in modelNames]
+    del xmlLoader
+    for m in models:
+        for segment in m.segments:
+            segment.createResources()
+            segment.createResourcesPost()
+            segment.cacheResources()
+    return models
+
+def benchmark(name, file, modelNames, useGeometryCache, clearCache=False):
+    if clearCache:
+        GeometryCache(file).clear()
+    t = time.time()
+    loadScene(file, modelNames, useGeometryCache)
+    t = time.time() - t
+    print "    %-24s %.3f s" % (name, t)
+    return t
+
+if __name__ == "__main__":
+    tmpDir = tempfile.mkdtemp()
+    try:
+        for (numModels, gridSize) in [(4, 30), (4, 60)]:
+            file = os.path.join(tmpDir, "grid%d_%d.xml" % (numModels, gridSize))
+            modelNames = writeGridScene(file, numModels, gridSize)
+            print "%d models with %dx%d quads:" % (numModels, gridSize, gridSize)
+            benchmark("no cache", file, modelNames, False)
+            cold = benchmark("cold (writes cache)", file, modelNames, True, True)
+            warm = benchmark("warm", file, modelNames, True)
+            print "    speedup                  %.2fx" % (cold/max(warm, 1e-9))
+    finally:
+        shutil.rmtree(tmpDir)
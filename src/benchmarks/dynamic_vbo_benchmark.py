@@ -0,0 +1,139 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+"""
+measures the time per frame for updating a dynamic vbo and drawing it,
+with scattered updates of a fraction of the vertices.
+the upload path is forced to copying into the region in use,
+switching to the next ring region or orphaning the buffer,
+and left to the changed fraction of the data.
+afterwards each region of the ring is read back and compared
+with the shadow copy of the data.
+opens a window, usage:
+    python dynamic_vbo_benchmark.py [gridSize [numFrames]]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy
+
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+
+from gui.model_app import ModelApp
+from xml_parser.xml_loader import XMLLoader
+from core.gl_vertex_attribute import GLVertexAttribute
+import core.vbo
+from core.vbo import DynamicIntervealedVBO
+from benchmarks.scene_generator import writeGridScene
+
+# (label, SUB_DATA_FRACTION, ORPHAN_FRACTION)
+UPLOAD_PATHS = [
+    ("sub data", 2.0, 2.0),
+    ("ring", 0.0, 2.0),
+    ("orphan", 0.0, 0.0),
+    ("automatic", core.vbo.SUB_DATA_FRACTION, core.vbo.ORPHAN_FRACTION)
+]
+
+def createVBO(segment):
+    """
+    returns a dynamic vbo with the vertex positions of the segment.
+    """
+    positions = numpy.random.random((segment.numVertices, 3)).astype('float32')
+    attribute = GLVertexAttribute(name="vertexPosition",
+                                  data=positions,
+                                  elementSize=3*4,
+                                  dataType=gl.GL_FLOAT)
+    return DynamicIntervealedVBO(attributes=[attribute], segment=segment)
+
+def frameTime(segment, vbo, numFrames, fraction, numSlices):
+    """
+    returns the time per frame for queueing @numSlices scattered slices
+    covering @fraction of the vertices, uploading and drawing them.
+    """
+    recordSize = vbo.recordType.itemsize
+    numVertices = segment.numVertices
+    sliceVertices = max(1, int(fraction*numVertices/numSlices))
+    data = numpy.random.random((sliceVertices, 3)).astype('float32')
+
+    segment.shader.enable()
+    vbo.bind()
+    vbo.bindAttributes()
+    gl.glFinish()
+    t = time.time()
+    for i in range(numFrames):
+        starts = numpy.random.randint(0, numVertices - sliceVertices + 1, numSlices)
+        for start in starts:
+            vbo.queueSetSlice(int(start)*recordSize, sliceVertices*recordSize, data)
+        vbo.doSetSlices()
+        if vbo.regionChanged:
+            vbo.bindAttributes()
+        gl.glDrawArrays(gl.GL_POINTS, 0, numVertices)
+    gl.glFinish()
+    t = time.time() - t
+    segment.shader.disable()
+    return t / numFrames
+
+def checkRegions(vbo):
+    """
+    steps through all regions of the ring with small updates
+    and returns the regions with data different from the shadow copy.
+    """
+    (subDataFraction, orphanFraction) = (core.vbo.SUB_DATA_FRACTION, core.vbo.ORPHAN_FRACTION)
+    # every update goes to the next region
+    core.vbo.SUB_DATA_FRACTION = 0.0
+    core.vbo.ORPHAN_FRACTION = 2.0
+    badRegions = []
+    for i in range(vbo.ringSize):
+        vbo.queueSetSlice(0, 4, numpy.array([float(i)], 'float32'))
+        vbo.doSetSlices()
+        data = numpy.empty(vbo.regionSize, 'uint8')
+        gl.glGetBufferSubData(vbo.target, vbo.regionOffset, vbo.regionSize, data)
+        if not (data==vbo.shadowData).all():
+            badRegions.append(vbo.region)
+    (core.vbo.SUB_DATA_FRACTION, core.vbo.ORPHAN_FRACTION) = (subDataFraction, orphanFraction)
+    return badRegions
+
+if __name__ == "__main__":
+    if len(sys.argv)>1:
+        gridSize = int(sys.argv[1])
+    else:
+        gridSize = 256
+    if len(sys.argv)>2:
+        numFrames = int(sys.argv[2])
+    else:
+        numFrames = 100
+
+    app = ModelApp()
+
+    file = os.path.join(tempfile.mkdtemp(), "dynamic.xml")
+    names = writeGridScene(file, 1, gridSize)
+    loader = XMLLoader([file], useGeometryCache=False)
+    model = loader.getModel(names[0])
+    app.addModel(model)
+    model.create(app=app)
+    os.remove(file)
+    os.rmdir(os.path.dirname(file))
+    segment = model.segments[0]
+
+    print "%d vertices, %d frames:" % (segment.numVertices, numFrames)
+    for fraction in [0.01, 0.2, 0.8]:
+        print "  %.0f%% of the vertices in 64 slices:" % (fraction*100.0)
+        for (label, subDataFraction, orphanFraction) in UPLOAD_PATHS:
+            core.vbo.SUB_DATA_FRACTION = subDataFraction
+            core.vbo.ORPHAN_FRACTION = orphanFraction
+            vbo = createVBO(segment)
+            t = frameTime(segment, vbo, numFrames, fraction, 64)
+            badRegions = checkRegions(vbo)
+            vbo.delete()
+            print "    %-10s %8.3f ms per frame" % (label, t*1000.0)
+            if badRegions:
+                print "    ERROR: stale data in regions %s" % badRegions
@@ -0,0 +1,89 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+"""
+measures the python time spend for drawing the scene pass
+with the render queue walking the models each frame and
+with the compiled frame drawing the flat list of gl calls.
+opens a window, usage:
+    python frame_compiler_benchmark.py [numModels [numFrames]]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+
+from gui.model_app import ModelApp
+from xml_parser.xml_loader import XMLLoader
+import core.frame_compiler
+from benchmarks.scene_generator import writeGridScene
+
+def drawTime(app, numFrames, useFrameCompiler):
+    """
+    returns the python time per frame for drawing the scene pass,
+    the gl commands are not waited for.
+    """
+    core.frame_compiler.USE_FRAME_COMPILER = useFrameCompiler
+    app.frameCompiler.invalidate()
+
+    # the grids are placed along the x axis, look at all of them
+    gl.glMatrixMode(gl.GL_PROJECTION)
+    gl.glPushMatrix()
+    gl.glLoadIdentity()
+    gl.glOrtho(-1.0, 5000.0, -1.0, 10.0, -100.0, 100.0)
+    gl.glMatrixMode(gl.GL_MODELVIEW)
+    gl.glPushMatrix()
+    gl.glLoadIdentity()
+
+    # the first frame compiles the pass
+    app.drawSceneComplete()
+    app.frameCompiler.nextFrame()
+    gl.glFinish()
+    t = time.time()
+    for i in range(numFrames):
+        app.drawSceneComplete()
+        app.frameCompiler.nextFrame()
+    t = time.time() - t
+    gl.glFinish()
+
+    gl.glPopMatrix()
+    gl.glMatrixMode(gl.GL_PROJECTION)
+    gl.glPopMatrix()
+    gl.glMatrixMode(gl.GL_MODELVIEW)
+    return t / numFrames
+
+if __name__ == "__main__":
+    if len(sys.argv)>1:
+        numModels = int(sys.argv[1])
+    else:
+        numModels = 1000
+    if len(sys.argv)>2:
+        numFrames = int(sys.argv[2])
+    else:
+        numFrames = 50
+
+    app = ModelApp()
+
+    file = os.path.join(tempfile.mkdtemp(), "frame.xml")
+    names = writeGridScene(file, numModels, 4)
+    loader = XMLLoader([file], useGeometryCache=False)
+    for name in names:
+        model = loader.getModel(name)
+        app.addModel(model)
+        model.create(app=app)
+    os.remove(file)
+    os.rmdir(os.path.dirname(file))
+
+    print "%d segments:" % numModels
+    for (label, useFrameCompiler) in [("render queue", False), ("compiled", True)]:
+        t = drawTime(app, numFrames, useFrameCompiler)
+        print "    %-12s %8.3f ms per frame" % (label, t*1000.0)
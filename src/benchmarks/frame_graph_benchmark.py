@@ -0,0 +1,99 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+"""
+counts the textures and fbo binds of a frame graph with
+many reflection like passes, each pass writes a color texture
+read by the scene pass and a transient depth texture.
+measures the time per frame with and without sharing
+the transient textures.
+opens a window, usage:
+    python frame_graph_benchmark.py [numReflectors [numFrames]]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+
+from gui.model_app import ModelApp
+from xml_parser.xml_loader import XMLLoader
+from core.fbo import FBO
+from core.textures.texture import Texture2D, DepthTexture2D
+import core.frame_graph
+from benchmarks.scene_generator import writeGridScene
+
+def addReflectors(app, numReflectors, size):
+    """
+    adds passes drawing the scene to a texture read by the scene pass.
+    """
+    graph = app.frameGraph
+    for i in range(numReflectors):
+        texture = Texture2D(width=size, height=size)
+        texture.create()
+        color = graph.importTexture("reflector%d color" % i, texture)
+        depth = graph.createTexture("reflector%d depth" % i, DepthTexture2D, size, size)
+        graph.addPass("reflector%d" % i,
+                      lambda: app.drawSceneComplete('reflection'), app.sceneCamera,
+                      colors=[color], depth=depth, prepend=True)
+        graph.addReads('scene', [color])
+
+def drawTime(app, numFrames, aliasTextures):
+    """
+    returns the time per frame for drawing the graph
+    and the report of the last frame.
+    """
+    core.frame_graph.ALIAS_TRANSIENT_TEXTURES = aliasTextures
+    app.frameGraph.invalidate()
+
+    app.frameGraph.draw()
+    app.frameGraph.nextFrame()
+    app.frameCompiler.nextFrame()
+    gl.glFinish()
+    t = time.time()
+    for i in range(numFrames):
+        app.frameGraph.draw()
+        app.frameGraph.nextFrame()
+        app.frameCompiler.nextFrame()
+    gl.glFinish()
+    t = time.time() - t
+    FBO.disable()
+    return (t / numFrames, app.frameGraph.report())
+
+if __name__ == "__main__":
+    if len(sys.argv)>1:
+        numReflectors = int(sys.argv[1])
+    else:
+        numReflectors = 16
+    if len(sys.argv)>2:
+        numFrames = int(sys.argv[2])
+    else:
+        numFrames = 50
+
+    app = ModelApp()
+    app.setDefaultSceneFBO()
+
+    file = os.path.join(tempfile.mkdtemp(), "graph.xml")
+    names = writeGridScene(file, 20, 4)
+    loader = XMLLoader([file], useGeometryCache=False)
+    for name in names:
+        model = loader.getModel(name)
+        app.addModel(model)
+        model.create(app=app)
+    os.remove(file)
+    os.rmdir(os.path.dirname(file))
+
+    addReflectors(app, numReflectors, 512)
+
+    print "%d reflectors:" % numReflectors
+    for (label, aliasTextures) in [("no sharing", False), ("shared", True)]:
+        (t, report) = drawTime(app, numFrames, aliasTextures)
+        print "    %-12s %8.3f ms per frame, %s" % (label, t*1000.0, report)
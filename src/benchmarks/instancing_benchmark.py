@@ -0,0 +1,112 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+"""
+compares models loaded for each copy of a segment with one
+instanced model drawing all copies, for a growing number of copies.
+opens a window, usage:
+    python instancing_benchmark.py [gridSize [numFrames]]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+
+from gui.model_app import ModelApp
+from xml_parser.xml_loader import XMLLoader
+from benchmarks.scene_generator import writeInstanceScene
+
+# copies are only loaded as models up to this number
+MAX_COPY_MODELS = 1000
+
+def loadModels(app, file, names):
+    """
+    loads and creates the models, returns the models
+    and the number of bytes used in the buffer arena.
+    """
+    usedSize = app.bufferArena.usedSize()
+    loader = XMLLoader([file], useGeometryCache=False)
+    models = []
+    for name in names:
+        model = loader.getModel(name)
+        app.addModel(model)
+        model.create(app=app)
+        models.append(model)
+    return (models, app.bufferArena.usedSize() - usedSize)
+
+def frameTime(app, models, numFrames):
+    """
+    returns the time for drawing the models once, waiting for gl.
+    """
+    # the copies are placed in the xy plane, look at all of them
+    gl.glMatrixMode(gl.GL_PROJECTION)
+    gl.glPushMatrix()
+    gl.glLoadIdentity()
+    gl.glOrtho(-1.0, 1000.0, -1.0, 1000.0, -100.0, 100.0)
+    gl.glMatrixMode(gl.GL_MODELVIEW)
+    gl.glPushMatrix()
+    gl.glLoadIdentity()
+
+    # warm up the gl wrappers
+    app.renderQueue.draw(app, models, 'benchmark')
+    gl.glFinish()
+    app.renderQueue.nextFrame()
+    t = time.time()
+    for i in range(numFrames):
+        app.renderQueue.draw(app, models, 'benchmark')
+    gl.glFinish()
+    t = (time.time() - t) / numFrames
+    app.renderQueue.nextFrame()
+
+    gl.glPopMatrix()
+    gl.glMatrixMode(gl.GL_PROJECTION)
+    gl.glPopMatrix()
+    gl.glMatrixMode(gl.GL_MODELVIEW)
+    return t
+
+def benchmarkCopies(app, file, names, label, numFrames):
+    t = time.time()
+    (models, usedSize) = loadModels(app, file, names)
+    loadTime = time.time() - t
+    if hasattr(models[0], 'instances'):
+        # the instance buffer holds one matrix for each copy
+        usedSize += 64*len(models[0].instanceMatrices)
+    t = frameTime(app, models, numFrames)
+    draws = app.renderQueue.frameCounters['draws'] / (numFrames)
+    print "    %-10s load %7.3f s  %6d draws  %9d bytes  %8.2f ms per frame" % (
+            label, loadTime, draws, usedSize, t*1000.0)
+    for model in models:
+        app.removeModel(model)
+
+if __name__ == "__main__":
+    if len(sys.argv)>1:
+        gridSize = int(sys.argv[1])
+    else:
+        gridSize = 4
+    if len(sys.argv)>2:
+        numFrames = int(sys.argv[2])
+    else:
+        numFrames = 10
+
+    app = ModelApp()
+    tmpDir = tempfile.mkdtemp()
+    try:
+        for numCopies in [10, 100, 1000, 10000]:
+            file = os.path.join(tmpDir, "instances.xml")
+            (names, instancesName) = writeInstanceScene(file, numCopies, gridSize)
+            print "%d copies of a %dx%d grid:" % (numCopies, gridSize, gridSize)
+            if numCopies<=MAX_COPY_MODELS:
+                benchmarkCopies(app, file, names, "models", numFrames)
+            benchmarkCopies(app, file, [instancesName], "instanced", numFrames)
+            os.remove(file)
+    finally:
+        os.rmdir(tmpDir)
@@ -0,0 +1,65 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+import os
+import time
+import tempfile
+import shutil
+
+from xml_parser.xml_loader import XMLLoader
+from benchmarks.scene_generator import writeGridScene
+
+def processModels(models):
+    """
+    processes the vertex data of model segments,
+    this is what Model.create does before creating gl resources.
+    """
+    for m in models:
+        m.loadSegments()
+        for segment in m.segments:
+            segment.createResources()
+            segment.createResourcesPost()
+
+def firstFrame(file, modelNames, numVisible, lazy, prefetch=False):
+    """
+    returns seconds until the visible models are ready for drawing
+    and the seconds until all models are ready.
+    eager models are all created before the first frame,
+    lazy models only when they are drawn.
+    """
+    t = time.time()
+    xmlLoader = XMLLoader([file], useGeometryCache=False)
+    models = [xmlLoader.getModel(m, lazy=lazy) for m in modelNames]
+    if prefetch:
+        thread = xmlLoader.prefetch(modelNames[numVisible:])
+    if lazy:
+        processModels(models[:numVisible])
+    else:
+        processModels(models)
+    first = time.time() - t
+    if prefetch:
+        thread.join()
+    if lazy:
+        processModels(models[numVisible:])
+    return (first, time.time() - t)
+
+if __name__ == "__main__":
+    tmpDir = tempfile.mkdtemp()
+    try:
+        for (numModels, numVisible, gridSize) in [(8, 2, 30), (16, 2, 30)]:
+            file = os.path.join(tmpDir, "grid%d_%d.xml" % (numModels, gridSize))
+            modelNames = writeGridScene(file, numModels, gridSize)
+            print "%d models with %dx%d quads, %d visible:" % (
+                        numModels, gridSize, gridSize, numVisible)
+            print "    %-24s %-12s %s" % ("", "first frame", "all models")
+            for (name, lazy, prefetch) in [("eager", False, False),
+                                           ("lazy", True, False),
+                                           ("lazy+prefetch", True, True)]:
+                (first, total) = firstFrame(file, modelNames, numVisible, lazy, prefetch)
+                print "    %-24s %-12s %.3f s" % (name, "%.3f s" % first, total)
+    finally:
+        shutil.rmtree(tmpDir)
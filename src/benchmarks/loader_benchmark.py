@@ -0,0 +1,113 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+import time
+import random
+
+from xml.etree.cElementTree import Element, SubElement
+
+from xml_parser.xml_helper import xmlGetRoot, xmlFloatTuple, xmlIntList,\
+    xmlFloatTupleList
+from xml_parser.xml_segment import _parseSegmentVertices, _parseSegmentFaces
+from xml_parser.xml_states import XMLStateGroups
+
+from numpy import array as NumpyArray
+
+def legacyParseVertices(node, segmentParams):
+    """
+    per vertex parsing, like the parser did before bulk conversion.
+    """
+    cos = []
+    nos = []
+    for vNode in list(node):
+        if vNode.tag != "v": continue
+        cos.append(NumpyArray(xmlFloatTuple(vNode.get('co')), "float32"))
+        if nos!=None:
+            no = xmlFloatTuple(vNode.get('no'))
+            if no==None: nos=None
+            else: nos.append(NumpyArray(no, "float32"))
+    segmentParams['cos'] = cos
+    segmentParams['nos'] = nos
+
+def legacyParseFaces(node, segmentParams, xmlStateGroups):
+    """
+    per face parsing, like the parser did before bulk conversion.
+    """
+    faces = []
+    for fNode in list(node):
+        if fNode.tag != "face": continue
+        faceParams = {}
+        for iNode in list(fNode):
+            if iNode.tag == "i":
+                faceParams['i'] = NumpyArray(xmlIntList(iNode.get('val')), "int32")
+            elif iNode.tag in ["uv", "col", "nor"]:
+                faceParams[iNode.tag] = NumpyArray(
+                        xmlFloatTupleList(iNode.get('val')), "float32")
+        faces.append(faceParams)
+    segmentParams['faces'] = faces
+
+def segmentNodes(file):
+    """
+    returns vertices and faces nodes of all segments in @file.
+    """
+    nodes = []
+    for segmentNode in xmlGetRoot(file).getiterator("segment"):
+        vertices = segmentNode.find("vertices")
+        faces = segmentNode.find("faces")
+        if vertices!=None and faces!=None:
+            # old files name the primitive in the type attribute
+            if faces.get('primitive')==None:
+                faces.set('primitive', faces.get('type', 'triangles').capitalize())
+            nodes.append( (vertices, faces) )
+    return nodes
+
+def randomSegmentNodes(numVertices, numFaces):
+    """
+    generates a triangle segment with per face uv coordinates.
+    """
+    def tupleStr(vals):
+        return "(" + ", ".join(map(lambda x: "%f" % x, vals)) + ")"
+    
+    vertices = Element("vertices")
+    for _ in xrange(numVertices):
+        SubElement(vertices, "v",
+                   co=tupleStr([random.random() for _ in range(3)]),
+                   no=tupleStr([random.random() for _ in range(3)]))
+    faces = Element("faces", primitive="Triangles")
+    for _ in xrange(numFaces):
+        face = SubElement(faces, "face")
+        i = [random.randint(0, numVertices-1) for _ in range(3)]
+        SubElement(face, "i", val=", ".join(map(str, i)))
+        uv = [tupleStr([random.random(), random.random()]) for _ in range(3)]
+        SubElement(face, "uv", val="[" + ", ".join(uv) + "]")
+    return [(vertices, faces)]
+
+def benchmark(name, nodes, parseVertices, parseFaces, repeat=3):
+    xmlStateGroups = XMLStateGroups()
+    best = None
+    for _ in range(repeat):
+        t = time.time()
+        for (vertices, faces) in nodes:
+            segmentParams = {}
+            parseVertices(vertices, segmentParams)
+            parseFaces(faces, segmentParams, xmlStateGroups)
+        t = time.time() - t
+        if best==None or t<best: best = t
+    print "    %-8s %.4f s" % (name, best)
+    return best
+
+def compare(label, nodes):
+    print "%s:" % label
+    legacy = benchmark("legacy", nodes, legacyParseVertices, legacyParseFaces)
+    bulk = benchmark("bulk", nodes, _parseSegmentVertices, _parseSegmentFaces)
+    print "    speedup  %.2fx" % (legacy/max(bulk, 1e-9))
+
+if __name__ == "__main__":
+    random.seed(0)
+    compare("female.xml", segmentNodes('../data/female.xml'))
+    compare("random segment (100000 vertices, 200000 faces)",
+            randomSegmentNodes(100000, 200000))
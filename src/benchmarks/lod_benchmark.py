@@ -0,0 +1,89 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy
+
+from xml_parser.xml_loader import XMLLoader
+from core.model import Model
+from core.gl_state import GLState
+from benchmarks.scene_generator import writeGridScene
+
+class _Camera(object):
+    def __init__(self, position):
+        self.position = position
+
+class _App(object):
+    """
+    the parts of the app used for selecting the level of detail.
+    """
+    def __init__(self, lodPixelError):
+        self.winSize = (1024, 768)
+        self.fov = 45.0
+        self.nearClip = 1.0
+        self.lodPixelError = lodPixelError
+        self.sceneCamera = _Camera(numpy.array([0.0, 1.0, 0.0], 'float32'))
+
+def sceneTriangles(segment, numModels, spacing, lodPixelError):
+    """
+    places @numModels instances of the segment on a field in front
+    of the camera and returns the number of drawn triangles
+    and the number of instances drawn with each level of detail.
+    """
+    app = _App(lodPixelError)
+    (_, faceLengths) = segment.getFaceIndexArrays()
+    levelTriangles = [int((faceLengths-2).sum())] + \
+                     map(lambda indexes: len(indexes)/3, segment.lodIndexes)
+    levelCounts = [0]*len(levelTriangles)
+
+    numTriangles = 0
+    rows = int(numpy.ceil(numpy.sqrt(numModels)))
+    for i in range(numModels):
+        translation = (spacing*(i%rows - 0.5*rows), 0.0, -spacing*(1 + i/rows))
+        model = Model([segment], {'states': [GLState('translation', translation)]})
+        model.selectLODs(app)
+        numTriangles += levelTriangles[segment.lodLevel]
+        levelCounts[segment.lodLevel] += 1
+    return (numTriangles, levelCounts)
+
+if __name__ == "__main__":
+    if len(sys.argv)>1:
+        gridSize = int(sys.argv[1])
+    else:
+        gridSize = 64
+    numModels = 400
+    spacing = 2.0*gridSize
+
+    file = os.path.join(tempfile.mkdtemp(), "lod.xml")
+    writeGridScene(file, 1, gridSize)
+    loader = XMLLoader([file], useGeometryCache=False)
+    segment = loader.getModel("grid0").segments[0]
+    segment.createResources()
+    t = time.time()
+    segment.createResourcesPost()
+    t = time.time() - t
+    segment.boundingSphere = segment.getBoundingSphere()
+    segment.boundingBox = segment.getBoundingBox()
+    os.remove(file)
+    os.rmdir(os.path.dirname(file))
+
+    print "%dx%d quad grid, createResourcesPost %.3f s" % (gridSize, gridSize, t)
+    for i in range(len(segment.lodIndexes)):
+        print "    level %d  %6d triangles  error %.4f" % (i+1,
+                len(segment.lodIndexes[i])/3, segment.lodErrors[i])
+
+    print "%d models, %.0f units apart:" % (numModels, spacing)
+    for lodPixelError in [0.0, 0.5, 1.0, 2.0]:
+        t = time.time()
+        (numTriangles, levelCounts) = sceneTriangles(segment, numModels, spacing, lodPixelError)
+        t = time.time() - t
+        print "    pixel error %.1f  %9d triangles  levels %s  selection %.3f s" % (
+                lodPixelError, numTriangles, levelCounts, t)
@@ -0,0 +1,103 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+import os
+import sys
+import time
+import tempfile
+import shutil
+
+import numpy
+from numpy import zeros, float32
+
+from utils.algebra.vector import crossVec3Float32, normalize
+from xml_parser.xml_helper import xmlGetRoot, xmlFindChild
+from xml_parser.xml_segment import parseSegmentGeometry, createGeometrySegment
+from core.segments.normal_generator import genVertexNormalsPlane, genVertexNormalsUnplane
+from benchmarks.scene_generator import writeGridScene
+
+def _loopFaceNormals(segment, face, normals):
+    v = map(lambda i: segment.vertices.data[i], face.indexes)
+    normal = crossVec3Float32(v[1] - v[0], v[-1] - v[0])
+    for i in face.indexes:
+        normals[i] = normals[i]+normal
+
+def _loopNormalize(normals):
+    for n in normals:
+        if n.any():
+            normalize(n)
+    return normals
+
+def loopVertexNormalsPlane(segment):
+    """
+    per face loop used for plane faces before.
+    """
+    normals = map(lambda i: zeros(3, float32), range(segment.numVertices))
+    for face in segment.faces:
+        _loopFaceNormals(segment, face, normals)
+    return _loopNormalize(normals)
+
+def loopVertexNormalsUnplane(segment):
+    """
+    per face loop used for not plane faces before.
+    """
+    normals = map(lambda i: zeros(3, float32), range(segment.numVertices))
+    for face in segment.faces:
+        for planeFace in face.getPlaneFaces(segment):
+            _loopFaceNormals(segment, planeFace, normals)
+    return _loopNormalize(normals)
+
+def timeNormals(func, segment):
+    t = time.time()
+    normals = func(segment)
+    return (normals, time.time() - t)
+
+def generateNormals(file):
+    """
+    generates the normals of all segments in the file with the per face
+    loops and the vectorized generator.
+    prints the times and the maximal deviation of the plane face normals.
+    """
+    root = xmlGetRoot(file)
+    for node in list(xmlFindChild(root, "segments")):
+        name = node.get('name') or node.get('id')
+        fNode = xmlFindChild(node, "faces")
+        if fNode!=None and fNode.get('primitive')==None:
+            # old files use the type attribute
+            fNode.set('primitive', "Triangles")
+
+        segment = createGeometrySegment(name, node, parseSegmentGeometry(node))
+        if segment==None or not hasattr(segment, 'faces'): continue
+
+        (loopNormals, loopTime) = timeNormals(loopVertexNormalsPlane, segment)
+        (_, loopUnplaneTime) = timeNormals(loopVertexNormalsUnplane, segment)
+        (planeNormals, planeTime) = timeNormals(genVertexNormalsPlane, segment)
+        (_, unplaneTime) = timeNormals(genVertexNormalsUnplane, segment)
+        deviation = numpy.abs(numpy.array(loopNormals, float32) - planeNormals).max()
+        print "    %-16s %7d faces  plane %.3f s -> %.4f s (%.0fx)  unplane %.3f s -> %.4f s (%.0fx)  max deviation %.1e" % (
+                name, len(segment.faces),
+                loopTime, planeTime, loopTime/max(planeTime, 1e-9),
+                loopUnplaneTime, unplaneTime, loopUnplaneTime/max(unplaneTime, 1e-9),
+                deviation)
+
+if __name__ == "__main__":
+    if len(sys.argv)>1:
+        gridSize = int(sys.argv[1])
+    else:
+        gridSize = 300
+
+    print "female.xml:"
+    generateNormals("../data/female.xml")
+
+    tmpDir = tempfile.mkdtemp()
+    try:
+        file = os.path.join(tmpDir, "grid.xml")
+        writeGridScene(file, 1, gridSize)
+        print "%dx%d quads:" % (gridSize, gridSize)
+        generateNormals(file)
+    finally:
+        shutil.rmtree(tmpDir)
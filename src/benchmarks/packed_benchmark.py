@@ -0,0 +1,52 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+import os
+import time
+import tempfile
+import shutil
+
+from xml_parser.xml_helper import xmlGetRoot, xmlFindChild
+from xml_parser.xml_segment import parseSegmentGeometry
+from utils.pack_xml import packXMLFile
+from benchmarks.scene_generator import writeGridScene
+
+def parseScene(file):
+    """
+    returns seconds needed for parsing the xml file and
+    converting the vertex data of all segments.
+    """
+    t = time.time()
+    root = xmlGetRoot(file)
+    for node in list(xmlFindChild(root, "segments")):
+        parseSegmentGeometry(node)
+    return time.time() - t
+
+if __name__ == "__main__":
+    tmpDir = tempfile.mkdtemp()
+    try:
+        for (numModels, gridSize) in [(4, 100), (4, 200)]:
+            file = os.path.join(tmpDir, "grid%d_%d.xml" % (numModels, gridSize))
+            writeGridScene(file, numModels, gridSize)
+            size = os.path.getsize(file)
+            t = parseScene(file)
+            print "%d models with %dx%d quads:" % (numModels, gridSize, gridSize)
+            print "    %-24s %8d kB  %.3f s" % ("text", size/1024, t)
+            for (encoding, compression) in [("base64", None), ("hex", None),
+                                            ("base64", "zlib")]:
+                packedFile = file + "." + encoding
+                if compression!=None:
+                    packedFile += "." + compression
+                packXMLFile(file, packedFile, encoding, compression)
+                packedSize = os.path.getsize(packedFile)
+                packedTime = parseScene(packedFile)
+                print "    %-24s %8d kB  %.3f s   %.1fx smaller  %.1fx faster" % (
+                        "+".join(filter(None, [encoding, compression])),
+                        packedSize/1024, packedTime,
+                        float(size)/packedSize, t/max(packedTime, 1e-9))
+    finally:
+        shutil.rmtree(tmpDir)
@@ -0,0 +1,83 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+"""
+loads a scene split across multiple files with a growing number
+of loader processes.
+"""
+
+import os
+import time
+import tempfile
+import shutil
+from multiprocessing import cpu_count
+
+import numpy
+
+from xml_parser.xml_loader import XMLLoader
+from benchmarks.scene_generator import writeGridScene
+
+def loadScene(files, modelNames, processes):
+    """
+    loads all models and processes the vertex data,
+    this is what Model.create does before creating gl resources.
+    """
+    xmlLoader = XMLLoader(files, useGeometryCache=False, processes=processes)
+    models = [xmlLoader.getModel(m) for m in modelNames]
+    del xmlLoader
+    for m in models:
+        for segment in m.segments:
+            segment.createResources()
+            segment.createResourcesPost()
+    return models
+
+def benchmark(files, modelNames, processes):
+    t = time.time()
+    models = loadScene(files, modelNames, processes)
+    t = time.time() - t
+    print "    %2d processes %8.2f s" % (processes, t)
+    return (t, models)
+
+def sameGeometry(models0, models1):
+    """
+    compares processed vertex data of two model lists.
+    """
+    for (m0, m1) in zip(models0, models1):
+        for (s0, s1) in zip(m0.segments, m1.segments):
+            g0 = s0.getGeometry(); g1 = s1.getGeometry()
+            # tangents are only kept if the material needs them
+            for g in [g0, g1]:
+                if g.has_key('vertexTangent'): del g['vertexTangent']
+            if sorted(g0.keys())!=sorted(g1.keys()):
+                return False
+            for key in g0.keys():
+                if g0[key].shape!=g1[key].shape or \
+                        not numpy.allclose(g0[key], g1[key], equal_nan=True):
+                    return False
+    return True
+
+if __name__ == "__main__":
+    numFiles = 16
+    tmpDir = tempfile.mkdtemp()
+    try:
+        files = []
+        modelNames = []
+        for i in range(numFiles):
+            file = os.path.join(tmpDir, "part%d.xml" % i)
+            modelNames += writeGridScene(file, 2, 20, prefix="part%d_" % i)
+            files.append(file)
+        
+        print "%d files, %d cores:" % (numFiles, cpu_count())
+        processes = 1
+        (serial, serialModels) = benchmark(files, modelNames, processes)
+        while processes < max(4, cpu_count()):
+            processes *= 2
+            (t, models) = benchmark(files, modelNames, processes)
+            print "    speedup     %8.2fx  (same geometry: %s)" % \
+                (serial/max(t, 1e-9), sameGeometry(serialModels, models))
+    finally:
+        shutil.rmtree(tmpDir)
@@ -0,0 +1,104 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+"""
+generates synthetic xml scenes for the benchmarks.
+each model has one segment, a grid of quads with per face uv coordinates.
+"""
+
+def _writeGridSegment(out, name, gridSize, offset):
+    out.write('<segment name="%s">\n    <vertices>\n' % name)
+    for y in xrange(gridSize+1):
+        for x in xrange(gridSize+1):
+            out.write('        <v co="(%f, %f, %f)" />\n' %
+                      (offset + x, y, 0.1*((x*y) % 7)))
+    out.write('    </vertices>\n    <faces primitive="Quads">\n')
+    uv = '[(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)]'
+    for y in xrange(gridSize):
+        for x in xrange(gridSize):
+            i = y*(gridSize+1) + x
+            out.write('        <face>\n'
+                      '            <i val="%d, %d, %d, %d" />\n'
+                      '            <uv val="%s" />\n'
+                      '        </face>\n' %
+                      (i, i+1, i+gridSize+2, i+gridSize+1, uv))
+    out.write('    </faces>\n</segment>\n')
+
+def writeGridScene(file, numModels, gridSize, prefix="grid"):
+    """
+    writes a scene with @numModels models to @file.
+    returns the model names.
+    """
+    names = map(lambda i: "%s%d" % (prefix, i), range(numModels))
+    
+    out = open(file, 'w')
+    try:
+        out.write('<xml>\n<models>\n')
+        for name in names:
+            out.write('    <model name="%s">\n'
+                      '        <segment name="%s">\n'
+                      '            <material name="%sMaterial" />\n'
+                      '        </segment>\n'
+                      '    </model>\n' % (name, name, prefix))
+        out.write('</models>\n<materials>\n'
+                  '    <material name="%sMaterial">\n'
+                  '        <state name="matShininess" type="float" val="50" />\n'
+                  '    </material>\n'
+                  '</materials>\n<segments>\n' % prefix)
+        for i in range(numModels):
+            _writeGridSegment(out, names[i], gridSize, i*(gridSize+1))
+        out.write('</segments>\n</xml>\n')
+    finally:
+        out.close()
+    
+    return names
+
+def _instancePositions(numInstances, gridSize):
+    columns = max(1, int(numInstances**0.5))
+    return map(lambda i: ((i % columns)*(gridSize+1), (i // columns)*(gridSize+1), 0.0),
+               range(numInstances))
+
+def writeInstanceScene(file, numInstances, gridSize, prefix="grid"):
+    """
+    writes a scene with one grid segment placed @numInstances times to @file,
+    once as models with a translation state and once as an instance set.
+    returns the model names and the name of the instance set.
+    """
+    positions = _instancePositions(numInstances, gridSize)
+    names = map(lambda i: "%s%d" % (prefix, i), range(numInstances))
+    instancesName = "%sInstances" % prefix
+    
+    out = open(file, 'w')
+    try:
+        out.write('<xml>\n<models>\n')
+        for i in range(numInstances):
+            out.write('    <model name="%s">\n'
+                      '        <state name="translation" type="floatTuple" val="(%f, %f, %f)" />\n'
+                      '        <segment name="%s">\n'
+                      '            <material name="%sMaterial" />\n'
+                      '        </segment>\n'
+                      '    </model>\n' % ((names[i],) + positions[i] + (prefix, prefix)))
+        out.write('    <model name="%s">\n'
+                  '        <segment name="%s">\n'
+                  '            <material name="%sMaterial" />\n'
+                  '        </segment>\n'
+                  '    </model>\n' % (prefix, prefix, prefix))
+        out.write('    <instances name="%s" model="%s">\n' % (instancesName, prefix))
+        for position in positions:
+            out.write('        <instance translation="(%f, %f, %f)" />\n' % position)
+        out.write('    </instances>\n')
+        out.write('</models>\n<materials>\n'
+                  '    <material name="%sMaterial">\n'
+                  '        <state name="matShininess" type="float" val="50" />\n'
+                  '    </material>\n'
+                  '</materials>\n<segments>\n' % prefix)
+        _writeGridSegment(out, prefix, gridSize, 0)
+        out.write('</segments>\n</xml>\n')
+    finally:
+        out.close()
+    
+    return (names, instancesName)
@@ -0,0 +1,60 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+import os
+import sys
+import time
+import tempfile
+import shutil
+
+from xml_parser.xml_helper import xmlGetRoot, xmlFindChild
+from xml_parser.xml_segment import parseSegmentGeometry, createGeometrySegment
+from benchmarks.scene_generator import writeGridScene
+
+def splitSegments(file):
+    """
+    splits the vertices of all segments in the file by per face data.
+    prints the time needed by createResourcesPost for each segment.
+    """
+    root = xmlGetRoot(file)
+    for node in list(xmlFindChild(root, "segments")):
+        name = node.get('name') or node.get('id')
+        fNode = xmlFindChild(node, "faces")
+        if fNode!=None and fNode.get('primitive')==None:
+            # old files use the type attribute
+            fNode.set('primitive', "Triangles")
+
+        segment = createGeometrySegment(name, node, parseSegmentGeometry(node))
+        if segment==None: continue
+        numFaces = len(segment.faces)
+        numVertices = segment.numVertices
+        segment.createResources()
+
+        t = time.time()
+        segment.createResourcesPost()
+        t = time.time() - t
+        print "    %-16s %7d faces %7d -> %7d vertices  %.3f s" % (
+                name, numFaces, numVertices, segment.numVertices, t)
+
+if __name__ == "__main__":
+    if len(sys.argv)>1:
+        gridSize = int(sys.argv[1])
+    else:
+        # 500k faces
+        gridSize = 707
+
+    print "female.xml:"
+    splitSegments("../data/female.xml")
+
+    tmpDir = tempfile.mkdtemp()
+    try:
+        file = os.path.join(tmpDir, "grid.xml")
+        writeGridScene(file, 1, gridSize)
+        print "%dx%d quads with per face uv:" % (gridSize, gridSize)
+        splitSegments(file)
+    finally:
+        shutil.rmtree(tmpDir)
@@ -0,0 +1,90 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+"""
+counts the issued and skipped state calls of the scene pass
+and measures the python time per frame with and without the state cache.
+opens a window, usage:
+    python state_cache_benchmark.py [numModels [numFrames]]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+
+from gui.model_app import ModelApp
+from xml_parser.xml_loader import XMLLoader
+import core.gl_state_cache
+from core.gl_state_cache import stateCache
+from benchmarks.scene_generator import writeGridScene
+
+def drawTime(app, numFrames, useStateCache):
+    """
+    returns the python time per frame for drawing the scene pass
+    and the (issued, skipped) state calls of the last frame.
+    """
+    core.gl_state_cache.USE_STATE_CACHE = useStateCache
+    stateCache.invalidate()
+
+    # the grids are placed along the x axis, look at all of them
+    gl.glMatrixMode(gl.GL_PROJECTION)
+    gl.glPushMatrix()
+    gl.glLoadIdentity()
+    gl.glOrtho(-1.0, 5000.0, -1.0, 10.0, -100.0, 100.0)
+    gl.glMatrixMode(gl.GL_MODELVIEW)
+    gl.glPushMatrix()
+    gl.glLoadIdentity()
+
+    app.drawSceneComplete()
+    stateCache.nextFrame()
+    gl.glFinish()
+    t = time.time()
+    for i in range(numFrames):
+        app.drawSceneComplete()
+        app.frameCompiler.nextFrame()
+        stateCache.nextFrame()
+    t = time.time() - t
+    gl.glFinish()
+
+    gl.glPopMatrix()
+    gl.glMatrixMode(gl.GL_PROJECTION)
+    gl.glPopMatrix()
+    gl.glMatrixMode(gl.GL_MODELVIEW)
+    return (t / numFrames, stateCache.frameCounters)
+
+if __name__ == "__main__":
+    if len(sys.argv)>1:
+        numModels = int(sys.argv[1])
+    else:
+        numModels = 1000
+    if len(sys.argv)>2:
+        numFrames = int(sys.argv[2])
+    else:
+        numFrames = 50
+
+    app = ModelApp()
+
+    file = os.path.join(tempfile.mkdtemp(), "states.xml")
+    names = writeGridScene(file, numModels, 4)
+    loader = XMLLoader([file], useGeometryCache=False)
+    for name in names:
+        model = loader.getModel(name)
+        app.addModel(model)
+        model.create(app=app)
+    os.remove(file)
+    os.rmdir(os.path.dirname(file))
+
+    print "%d segments:" % numModels
+    for (label, useStateCache) in [("no cache", False), ("state cache", True)]:
+        (t, (issued, skipped)) = drawTime(app, numFrames, useStateCache)
+        print "    %-12s %6d calls issued %6d skipped  %8.3f ms per frame" % (
+                label, issued, skipped, t*1000.0)
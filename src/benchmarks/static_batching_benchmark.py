@@ -0,0 +1,72 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+"""
+compares static models drawn one by one with the same models
+merged into static batches, for a growing number of models.
+opens a window, usage:
+    python static_batching_benchmark.py [gridSize [numFrames]]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from gui.model_app import ModelApp
+from xml_parser.xml_loader import XMLLoader
+from benchmarks.scene_generator import writeInstanceScene
+from benchmarks.instancing_benchmark import frameTime
+
+def loadModels(app, file, names, batched):
+    """
+    loads and creates the models, returns the models drawn by the app.
+    """
+    loader = XMLLoader([file], useGeometryCache=False)
+    models = map(loader.getModel, names)
+    if not batched:
+        for model in models:
+            app.addModel(model)
+            model.create(app=app)
+        return models
+    batchModels = app.addStaticModels(models)
+    return filter(lambda m: m.segments, models) + batchModels
+
+def benchmarkModels(app, file, names, batched, numFrames):
+    t = time.time()
+    models = loadModels(app, file, names, batched)
+    loadTime = time.time() - t
+    t = frameTime(app, models, numFrames)
+    draws = app.renderQueue.frameCounters['draws'] / (numFrames)
+    print "    %-10s load %7.3f s  %6d draws  %8.2f ms per frame" % (
+            "batched" if batched else "models", loadTime, draws, t*1000.0)
+    for model in models:
+        app.removeModel(model)
+
+if __name__ == "__main__":
+    if len(sys.argv)>1:
+        gridSize = int(sys.argv[1])
+    else:
+        gridSize = 4
+    if len(sys.argv)>2:
+        numFrames = int(sys.argv[2])
+    else:
+        numFrames = 10
+
+    app = ModelApp()
+    tmpDir = tempfile.mkdtemp()
+    try:
+        for numModels in [10, 100, 1000]:
+            file = os.path.join(tmpDir, "static.xml")
+            # the copies share one material and are placed by translation states
+            (names, _) = writeInstanceScene(file, numModels, gridSize)
+            print "%d static models of a %dx%d grid:" % (numModels, gridSize, gridSize)
+            benchmarkModels(app, file, names, False, numFrames)
+            benchmarkModels(app, file, names, True, numFrames)
+            os.remove(file)
+    finally:
+        os.rmdir(tmpDir)
@@ -0,0 +1,78 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+"""
+compares peak memory of the tree and the streaming xml loader.
+each loader runs in its own process, usage:
+    python streaming_benchmark.py [sceneSizeMB [tree|streaming ...]]
+the tree loader needs about 12 times the scene size of memory.
+"""
+
+import os
+import sys
+import time
+import resource
+import tempfile
+import shutil
+import subprocess
+
+from benchmarks.scene_generator import writeGridScene
+
+# each generated segment is a 50x50 quad grid
+_GRID_SIZE = 50
+
+def loadAllSegments(file, streaming):
+    """
+    loads the file and converts the vertex data of all segments.
+    returns number of segments and vertices.
+    """
+    from xml_parser.xml_loader import XMLLoader
+    xmlLoader = XMLLoader([file], useGeometryCache=False, streaming=streaming)
+    xmlSegments = xmlLoader.xmlSegments
+    numVertices = 0
+    names = xmlSegments.segmentNodes.keys()
+    for name in names:
+        (_, params, _) = xmlSegments.loadSegment(name)
+        numVertices += len(params['cos'].data)
+    return (len(names), numVertices)
+
+def _peakMemoryMB():
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def runLoader(file, mode):
+    t = time.time()
+    numSegments, numVertices = loadAllSegments(file, mode=="streaming")
+    t = time.time() - t
+    print "    %-10s %8.2f s %8.1f MB peak  (%d segments, %d vertices)" % \
+        (mode, t, _peakMemoryMB(), numSegments, numVertices)
+
+if __name__ == "__main__":
+    if len(sys.argv)==4 and sys.argv[1]=="--load":
+        runLoader(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+    
+    sizeMB = 300
+    if len(sys.argv)>1:
+        sizeMB = int(sys.argv[1])
+    modes = sys.argv[2:] or ["tree", "streaming"]
+    
+    tmpDir = tempfile.mkdtemp()
+    try:
+        file = os.path.join(tmpDir, "scene.xml")
+        # estimate the number of models for the requested size
+        writeGridScene(file, 1, _GRID_SIZE)
+        segmentSize = os.path.getsize(file)
+        numModels = max(1, sizeMB*1024*1024 / segmentSize)
+        writeGridScene(file, numModels, _GRID_SIZE)
+        
+        print "scene with %d models, %.1f MB:" % (numModels, os.path.getsize(file)/(1024.0*1024.0))
+        for mode in modes:
+            sys.stdout.flush()
+            subprocess.call([sys.executable, __file__, "--load", file, mode])
+    finally:
+        shutil.rmtree(tmpDir)
@@ -0,0 +1,90 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+"""
+measures the python time spend for drawing vbo segments
+with and without vertex array objects.
+opens a window, usage:
+    python vertex_array_benchmark.py [numModels [numFrames]]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+
+from gui.model_app import ModelApp
+from xml_parser.xml_loader import XMLLoader
+import core.vbo
+from benchmarks.scene_generator import writeGridScene
+
+def createSegments(app, file, names, useVertexArrays):
+    """
+    loads and creates the models, returns the segments.
+    """
+    core.vbo.USE_VERTEX_ARRAYS = useVertexArrays
+    loader = XMLLoader([file], useGeometryCache=False)
+    segments = []
+    for name in names:
+        model = loader.getModel(name)
+        app.addModel(model)
+        model.create(app=app)
+        segments += model.segments
+    return segments
+
+def drawTime(segments, numFrames):
+    """
+    returns the python time per segment draw,
+    the gl commands are not waited for.
+    """
+    gl.glFinish()
+    t = time.time()
+    for i in range(numFrames):
+        for segment in segments:
+            segment.shader.enable()
+            segment.enableStates()
+            segment.drawSegment()
+            segment.disableStates()
+            segment.shader.disable()
+    t = time.time() - t
+    gl.glFinish()
+    return t / (numFrames*len(segments))
+
+if __name__ == "__main__":
+    if len(sys.argv)>1:
+        numModels = int(sys.argv[1])
+    else:
+        numModels = 200
+    if len(sys.argv)>2:
+        numFrames = int(sys.argv[2])
+    else:
+        numFrames = 20
+
+    app = ModelApp()
+
+    file = os.path.join(tempfile.mkdtemp(), "vao.xml")
+    names = writeGridScene(file, numModels, 4)
+    withoutVAO = createSegments(app, file, names, False)
+    withVAO = createSegments(app, file, names, True)
+    os.remove(file)
+    os.rmdir(os.path.dirname(file))
+
+    if withVAO[0].vertexArray==None:
+        print "vertex array objects not available."
+        sys.exit(0)
+
+    print "%d segments, %d frames:" % (numModels, numFrames)
+    for (label, segments) in [("attribute pointers", withoutVAO),
+                              ("vertex arrays", withVAO)]:
+        # warm up the gl wrappers
+        drawTime(segments, 1)
+        t = drawTime(segments, numFrames)
+        print "    %-20s %7.1f us per draw" % (label, t*1000000.0)
@@ -0,0 +1,75 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+import sys
+import time
+
+import numpy
+
+from xml_parser.xml_helper import xmlGetRoot, xmlFindChild
+from xml_parser.xml_segment import parseSegmentGeometry, createGeometrySegment
+from core.segments.vertex_cache import averageCacheMissRatio,\
+    optimizeTriangleOrder, vertexFetchOrder
+
+def shuffledGridTriangles(gridSize):
+    """
+    returns the index array of a triangulated grid,
+    triangles are in random order.
+    """
+    vertices = numpy.arange((gridSize+1)*(gridSize+1)).reshape((gridSize+1, gridSize+1))
+    (a, b) = (vertices[:-1,:-1].ravel(), vertices[:-1,1:].ravel())
+    (c, d) = (vertices[1:,1:].ravel(), vertices[1:,:-1].ravel())
+    triangles = numpy.vstack((numpy.column_stack((a, b, c)),
+                              numpy.column_stack((a, c, d))))
+    numpy.random.seed(0)
+    numpy.random.shuffle(triangles)
+    return triangles.ravel()
+
+def optimizeSegments(file):
+    """
+    prints the ACMR of all triangle segments in the file
+    before and after optimizing the index order.
+    """
+    root = xmlGetRoot(file)
+    for node in list(xmlFindChild(root, "segments")):
+        name = node.get('name') or node.get('id')
+        fNode = xmlFindChild(node, "faces")
+        if fNode!=None and fNode.get('primitive')==None:
+            # old files use the type attribute
+            fNode.set('primitive', "Triangles")
+
+        segment = createGeometrySegment(name, node, parseSegmentGeometry(node))
+        if segment==None: continue
+        segment.createResources()
+        t = time.time()
+        segment.createResourcesPost()
+        t = time.time() - t
+        if segment.acmr==None: continue
+        print "    %-16s %7d faces  ACMR %.3f -> %.3f  createResourcesPost %.3f s" % (
+                name, len(segment.faces), segment.acmr[0], segment.acmr[1], t)
+
+if __name__ == "__main__":
+    if len(sys.argv)>1:
+        gridSize = int(sys.argv[1])
+    else:
+        gridSize = 400
+
+    print "female.xml:"
+    optimizeSegments("../data/female.xml")
+
+    indexes = shuffledGridTriangles(gridSize)
+    numVertices = (gridSize+1)*(gridSize+1)
+    print "%dx%d grid, %d shuffled triangles:" % (gridSize, gridSize, len(indexes)/3)
+    for cacheSize in [16, 32]:
+        t = time.time()
+        order = optimizeTriangleOrder(indexes, numVertices, cacheSize)
+        optimized = indexes.reshape((-1, 3))[order].ravel()
+        vertexFetchOrder(optimized, numVertices)
+        t = time.time() - t
+        print "    cache size %2d  ACMR %.3f -> %.3f  %.3f s" % (cacheSize,
+                averageCacheMissRatio(indexes, cacheSize),
+                averageCacheMissRatio(optimized, cacheSize), t)
@@ -0,0 +1,160 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+from OpenGL.arrays.arraydatatype import ArrayDatatype
+
+from core.gl_state_cache import stateCache
+
+from bisect import bisect
+
+# default size of arena buffers in byte,
+# bigger allocations get a buffer of their own size.
+ARENA_PAGE_SIZE = 4*1024*1024
+
+class FreeList(object):
+    """
+    first fit allocator for byte ranges of a buffer.
+    freed ranges are merged with free neighbors.
+    """
+    def __init__(self, size):
+        self.size = size
+        # sorted list of free (offset, size) ranges
+        self.freeRanges = [(0, size)]
+
+    def allocate(self, size, alignment=1):
+        """
+        returns the offset of a free range with @size bytes
+        aligned to @alignment, or None if there is no such range.
+        """
+        for i in range(len(self.freeRanges)):
+            (offset, freeSize) = self.freeRanges[i]
+            start = ((offset + alignment - 1) / alignment) * alignment
+            end = start + size
+            if end > offset + freeSize: continue
+
+            # keep the unused head and tail of the free range
+            remaining = []
+            if start > offset:
+                remaining.append( (offset, start - offset) )
+            if end < offset + freeSize:
+                remaining.append( (end, offset + freeSize - end) )
+            self.freeRanges[i:i+1] = remaining
+            return start
+        return None
+
+    def free(self, offset, size):
+        """
+        marks the range as free again.
+        """
+        i = bisect(self.freeRanges, (offset, size))
+        end = offset + size
+        # merge with the following free range
+        if i < len(self.freeRanges) and self.freeRanges[i][0] == end:
+            end += self.freeRanges[i][1]
+            del self.freeRanges[i]
+        # merge with the preceding free range
+        if i > 0:
+            (prevOffset, prevSize) = self.freeRanges[i-1]
+            if prevOffset + prevSize == offset:
+                self.freeRanges[i-1] = (prevOffset, end - prevOffset)
+                return
+        self.freeRanges.insert(i, (offset, end - offset))
+
+    def freeSize(self):
+        """
+        returns the number of free bytes.
+        """
+        return sum(map(lambda (offset, size): size, self.freeRanges))
+
+class ArenaBuffer(object):
+    """
+    a gl buffer with ranges used by different segments.
+    """
+    def __init__(self, target, size, usage):
+        self.target = target
+        self.size = size
+        self.usage = usage
+        self.freeList = FreeList(size)
+
+        self.glID = gl.glGenBuffers(1)
+        self.bind()
+        gl.glBufferData(target, size, None, usage)
+
+    def bind(self):
+        # binding the buffer again is skipped
+        stateCache.bindBuffer(self.target, self.glID)
+
+    def upload(self, offset, data):
+        """
+        copies data to the buffer at @offset.
+        """
+        self.bind()
+        gl.glBufferSubData(self.target, offset, data.nbytes,
+                           ArrayDatatype.voidDataPointer(data))
+
+    def delete(self):
+        stateCache.forgetBuffer(self.target)
+        gl.glDeleteBuffers(1, [self.glID])
+
+class BufferArena(object):
+    """
+    static vertex and index data of many segments in few big buffers.
+    segments share the buffers, so less buffers must be bound for drawing.
+    ranges of removed segments can be used by segments added later.
+    """
+    def __init__(self, pageSize=ARENA_PAGE_SIZE, usage=gl.GL_STATIC_DRAW):
+        self.pageSize = pageSize
+        self.usage = usage
+        # buffers for each target
+        self.buffers = {}
+
+    def allocate(self, target, data, alignment=4):
+        """
+        copies @data to a free range of a buffer with @target.
+        returns the buffer and the offset of the range.
+        """
+        size = data.nbytes
+        buffers = self.buffers.setdefault(target, [])
+        for buffer in buffers:
+            offset = buffer.freeList.allocate(size, alignment)
+            if offset!=None:
+                buffer.upload(offset, data)
+                return (buffer, offset)
+
+        buffer = ArenaBuffer(target, max(self.pageSize, size), self.usage)
+        buffers.append(buffer)
+        offset = buffer.freeList.allocate(size, alignment)
+        buffer.upload(offset, data)
+        return (buffer, offset)
+
+    def free(self, buffer, offset, size):
+        """
+        frees an allocated range.
+        """
+        buffer.freeList.free(offset, size)
+
+    def numBuffers(self):
+        return sum(map(len, self.buffers.values()))
+
+    def usedSize(self):
+        """
+        returns the number of bytes used by segments.
+        """
+        size = 0
+        for buffers in self.buffers.values():
+            for buffer in buffers:
+                size += buffer.size - buffer.freeList.freeSize()
+        return size
+
+    def delete(self):
+        for buffers in self.buffers.values():
+            for buffer in buffers:
+                buffer.delete()
+        self.buffers = {}
@@ -11,6 +11,7 @@ from OpenGL import GL as gl
 import OpenGL.GLU as glu
 
 from core.gl_object import GLObject
+from core.gl_state_cache import stateCache
 
 class EvalParam(object):
     def __init__(self, name):
@@ -52,7 +53,7 @@ class CurveEvaluator(GLEvaluator):
         gl.glMap1f(self.target,
                    self.u.min, self.u.max,
                    self.controlPoints)
-        gl.glEnable(self.target)
+        stateCache.enable(self.target)
         gl.glMapGrid1f(self.u.steps, self.u.min, self.u.max)
     
     def draw(self):
@@ -77,18 +78,18 @@ class PatchEvaluator(GLEvaluator):
                    self.u.min, self.u.max,
                    self.v.min, self.v.max,
                    self.controlPoints)
-        gl.glEnable(self.target)
+        stateCache.enable(self.target)
         
         gl.glMapGrid2f(self.u.steps, self.u.min, self.u.max,
                        self.v.steps, self.v.min, self.v.max)
         
         if self.generateNormals:
-            gl.glEnable( gl.GL_AUTO_NORMAL )
+            stateCache.enable( gl.GL_AUTO_NORMAL )
     def disableStaticStates(self):
         GLEvaluator.disableStaticStates(self)
         
         if self.generateNormals:
-            gl.glDisable( gl.GL_AUTO_NORMAL )
+            stateCache.disable( gl.GL_AUTO_NORMAL )
     
     def draw(self):
         gl.glEvalMesh2(self.evalPolygonMode, 0, self.u.steps,
@@ -136,11 +137,11 @@ class NURBPatchEvaluator(NURBEvaluator):
         NURBEvaluator.enableStaticStates(self)
         
         if self.generateNormals:
-            gl.glEnable( gl.GL_AUTO_NORMAL )
+            stateCache.enable( gl.GL_AUTO_NORMAL )
     
     def disableStaticStates(self):
         if self.generateNormals:
-            gl.glDisable( gl.GL_AUTO_NORMAL )
+            stateCache.disable( gl.GL_AUTO_NORMAL )
         NURBEvaluator.disableStaticStates(self)
     
     def draw(self):
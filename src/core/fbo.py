@@ -46,12 +46,19 @@ class FBO(object):
             FBO.MAX_TARGETS = gl.glGetInteger(glFBO.GL_MAX_COLOR_ATTACHMENTS)
     
     def __del__(self):
+        self.delete()
+    
+    def delete(self):
+        """
+        deletes the gl frame buffer object.
+        """
         if self.glFBO!=-1:
             if bool(glFBO.glDeleteFramebuffers):
                 glFBO.glDeleteFramebuffers(1, [self.glFBO])
             else:
                 # gl module might already uninitialled
                 pass
+            self.glFBO = -1
     
     def _setSize(self, tex):
         #if self.size==None:
@@ -95,14 +102,15 @@ class FBO(object):
         self.colorTextures.append(colorTexture)
         self._setSize(colorTexture)
     
-    def enable(self):
+    def enable(self, clearBits=gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT):
         """
-        enables render to texture.
+        enables render to texture and clears the buffers in @clearBits.
         Note: you must set the colormask before for depth only textures.
         """
         glFBO.glBindFramebuffer(glFBO.GL_FRAMEBUFFER, self.glFBO)
         
-        gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
+        if clearBits:
+            gl.glClear(clearBits)
         # set viewport to textures size
         gl.glViewport(0, 0, self.size[0], self.size[1])
         
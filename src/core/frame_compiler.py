@@ -0,0 +1,110 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+from core.render_queue import runCommands, RENDER_COUNTERS
+
+# set to False for building the draw calls of each pass in every frame
+USE_FRAME_COMPILER = True
+
+class _CompiledPass(object):
+    """
+    the gl calls of a pass and the counters they add to the frame.
+    """
+    def __init__(self, commands, renderCounters, cullCounters):
+        self.commands = commands
+        self.renderCounters = renderCounters
+        self.cullCounters = cullCounters
+
+class FrameCompiler(object):
+    """
+    keeps the gl calls of each render queue pass as flat list,
+    the list is drawn again in later frames without walking
+    the models and segments, culling and sorting them.
+    lists are dropped by invalidate(), which must be called if models,
+    segments, states affecting the drawn segments or the camera change.
+    passes with moving segments or occlusion queries are not compiled.
+    """
+    def __init__(self, renderQueue, frustumCuller=None):
+        self.renderQueue = renderQueue
+        self.frustumCuller = frustumCuller
+        # compiled pass for each pass name and draw of the pass in a frame,
+        # passes drawn for multiple cameras (reflections) have a list for each camera.
+        self.passes = {}
+        # draws of each pass in the current frame
+        self.passDraws = {}
+        # incremented by invalidate, lists compiled while
+        # the scene changed are not kept.
+        self.version = 0
+        # (replayed, compiled) passes in the current frame
+        self.counters = (0, 0)
+        # (replayed, compiled) passes in the last frame
+        self.frameCounters = (0, 0)
+
+    def nextFrame(self):
+        self.frameCounters = self.counters
+        self.counters = (0, 0)
+        self.passDraws = {}
+
+    def report(self):
+        """
+        returns the replayed and compiled passes of the last frame as string.
+        """
+        return "%d replayed, %d compiled" % self.frameCounters
+
+    def invalidate(self):
+        """
+        drops the compiled lists, they are compiled again when drawn next.
+        """
+        self.version += 1
+        self.passes = {}
+
+    def draw(self, app, models, passName='scene'):
+        """
+        draws the models like the render queue does,
+        using the compiled list of the pass if there is one.
+        """
+        draws = self.passDraws.get(passName, 0)
+        self.passDraws[passName] = draws+1
+        key = (passName, draws)
+        compiledPass = self.passes.get(key)
+        if compiledPass!=None:
+            runCommands(compiledPass.commands)
+            self.addCounters(passName, compiledPass)
+            (replayed, compiled) = self.counters
+            self.counters = (replayed+1, compiled)
+            return
+
+        queueCounters = self.renderQueue.counters
+        renderCounters = map(queueCounters.get, RENDER_COUNTERS)
+        cullCounters = self.passCullCounters(passName)
+        version = self.version
+        (commands, compilable) = self.renderQueue.compile(app, models, passName)
+        # lazy models may add segments while the list is compiled
+        if USE_FRAME_COMPILER and compilable and version==self.version:
+            (cullDrawn, cullCulled) = self.passCullCounters(passName)
+            self.passes[key] = _CompiledPass(commands,
+                    map(lambda (name, count): queueCounters[name] - count,
+                        zip(RENDER_COUNTERS, renderCounters)),
+                    (cullDrawn - cullCounters[0], cullCulled - cullCounters[1]))
+            (replayed, compiled) = self.counters
+            self.counters = (replayed, compiled+1)
+        runCommands(commands)
+
+    def passCullCounters(self, passName):
+        if self.frustumCuller==None:
+            return (0, 0)
+        return self.frustumCuller.counters.get(passName, (0, 0))
+
+    def addCounters(self, passName, compiledPass):
+        """
+        counts the state changes and culled segments of a replayed pass.
+        """
+        counters = self.renderQueue.counters
+        for (name, count) in zip(RENDER_COUNTERS, compiledPass.renderCounters):
+            counters[name] += count
+        if self.frustumCuller!=None:
+            self.frustumCuller.count(passName, *compiledPass.cullCounters)
@@ -0,0 +1,330 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+
+from core.fbo import FBO
+
+# set to False for creating a texture for each transient resource
+ALIAS_TRANSIENT_TEXTURES = True
+
+class FrameGraphError(ValueError):
+    def __init__(self, message):
+        ValueError.__init__(self, message)
+
+class FrameResource(object):
+    """
+    a render target used by the passes of the frame graph.
+    imported resources wrap a texture that is kept by the caller,
+    transient resources get a texture from the graph that is shared
+    with other transient resources not used by the same passes.
+    """
+    def __init__(self, name, texture=None, textureClass=None,
+                 width=0, height=0, output=False):
+        self.name = name
+        self.texture = texture
+        self.textureClass = textureClass
+        self.width = width
+        self.height = height
+        # outputs are used after the passes, for example by the orthogonal pass
+        self.output = output
+
+    def isTransient(self):
+        return self.textureClass!=None
+
+    def descriptor(self):
+        """
+        transient resources with the same descriptor can share a texture.
+        """
+        return (self.textureClass, self.width, self.height)
+
+class FramePass(object):
+    """
+    a pass drawing to the color and depth resources it writes.
+    passes added without resources draw to an fbo of the caller,
+    they are never culled.
+    """
+    def __init__(self, name, draw, camera, colors=[], depth=None, fbo=None):
+        self.name = name
+        self.draw = draw
+        self.camera = camera
+        self.colors = list(colors)
+        self.depth = depth
+        self.fbo = fbo
+        # the fbo bound for drawing, declared passes get it when compiled
+        self.targetFBO = fbo
+        # the resources are cleared before the pass if it writes them first
+        self.clearBits = gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT
+
+    def isDeclared(self):
+        return self.fbo==None
+
+    def writes(self):
+        if self.depth==None:
+            return self.colors
+        return self.colors + [self.depth]
+
+class FrameGraph(object):
+    """
+    passes drawn before the scene is drawn to the screen,
+    declaring the resources they write and read.
+    passes are ordered by their dependencies, passes with
+    results not read by other passes and not written to an output
+    are culled. transient textures are shared by resources
+    with lifetimes that do not overlap.
+    the graph is compiled again when passes or reads are added.
+    """
+    def __init__(self):
+        self.passes = []
+        self.resources = []
+        # resources read by the passes with the name
+        self.reads = {}
+        # textures of transient resources for each descriptor
+        self.texturePool = {}
+        # fbo for each tuple of attached textures
+        self.fbos = {}
+        # the live passes in drawing order, None if the graph needs compiling
+        self.order = None
+        # passes culled by the last compile
+        self.culled = 0
+        # (drawn, culled, fbo binds) in the current frame
+        self.counters = (0, 0, 0)
+        # (drawn, culled, fbo binds) in the last frame
+        self.frameCounters = (0, 0, 0)
+
+    def nextFrame(self):
+        self.frameCounters = self.counters
+        self.counters = (0, 0, 0)
+
+    def report(self):
+        """
+        returns the drawn passes, fbo binds and texture sharing as string.
+        """
+        transient = filter(FrameResource.isTransient, self.resources)
+        textures = sum(map(len, self.texturePool.values()))
+        return "%d passes drawn, %d culled, %d fbo binds, %d targets in %d textures" % (
+                self.frameCounters + (len(transient), textures))
+
+    def invalidate(self):
+        self.order = None
+
+    def importTexture(self, name, texture, output=False):
+        """
+        adds a resource for a texture created by the caller.
+        """
+        resource = FrameResource(name, texture=texture, output=output)
+        self.resources.append(resource)
+        return resource
+
+    def createTexture(self, name, textureClass, width, height):
+        """
+        adds a resource with a texture created by the graph,
+        the texture is only valid while the passes using the resource are drawn.
+        """
+        resource = FrameResource(name, textureClass=textureClass,
+                                 width=width, height=height)
+        self.resources.append(resource)
+        return resource
+
+    def addPass(self, name, draw, camera, colors=[], depth=None, reads=[], prepend=False):
+        """
+        adds a pass writing the color and depth resources.
+        """
+        if not colors and depth==None:
+            raise FrameGraphError, "pass '%s' writes no resources" % name
+        framePass = FramePass(name, draw, camera, colors, depth)
+        self._insertPass(framePass, prepend)
+        if reads:
+            self.addReads(name, reads)
+        return framePass
+
+    def addFBOPass(self, fbo, draw, camera, prepend=False):
+        """
+        adds a pass drawing to an fbo of the caller,
+        the pass is drawn in the order it was added.
+        """
+        framePass = FramePass(None, draw, camera, fbo=fbo)
+        self._insertPass(framePass, prepend)
+        return framePass
+
+    def _insertPass(self, framePass, prepend):
+        if prepend:
+            self.passes.insert(0, framePass)
+        else:
+            self.passes.append(framePass)
+        self.order = None
+
+    def addReads(self, passName, resources):
+        """
+        lets the passes with the name read the resources,
+        the passes may be added later.
+        """
+        self.reads.setdefault(passName, []).extend(resources)
+        self.order = None
+
+    def compile(self):
+        """
+        culls the unused passes, orders the others by their dependencies
+        and assigns textures and fbos to the passes.
+        """
+        passes = self.passes
+        passReads = map(lambda p: self.reads.get(p.name, []) if p.isDeclared() else [], passes)
+
+        # writers of each resource in the order the passes were added
+        writers = {}
+        for i in range(len(passes)):
+            for resource in passes[i].writes():
+                writers.setdefault(id(resource), []).append(i)
+
+        # passes each pass depends on: readers depend on all writers,
+        # writers of the same resource keep the order they were added.
+        dependencies = map(lambda i: set(), range(len(passes)))
+        for i in range(len(passes)):
+            for resource in passReads[i]:
+                dependencies[i].update(writers.get(id(resource), []))
+            for resource in passes[i].writes():
+                dependencies[i].update(filter(lambda j: j<i, writers[id(resource)]))
+            dependencies[i].discard(i)
+
+        # live passes draw to outputs or to resources read by live passes
+        live = set()
+        stack = filter(lambda i: not passes[i].isDeclared() or
+                       any(map(lambda r: r.output, passes[i].writes())), range(len(passes)))
+        while stack:
+            i = stack.pop()
+            if i in live: continue
+            live.add(i)
+            stack.extend(dependencies[i])
+
+        # order the live passes, ready passes are drawn in the order they were added
+        order = []
+        done = set()
+        while len(order)<len(live):
+            ready = filter(lambda i: i in live and i not in done and
+                           dependencies[i]<=done, range(len(passes)))
+            if not ready:
+                raise FrameGraphError, "cyclic pass dependencies"
+            order.append(ready[0])
+            done.add(ready[0])
+
+        self.assignTextures(map(passes.__getitem__, order), map(passReads.__getitem__, order))
+
+        # clear resources with the first pass writing them
+        written = set()
+        for i in order:
+            framePass = passes[i]
+            if not framePass.isDeclared(): continue
+            framePass.clearBits = 0
+            for resource in framePass.colors:
+                if id(resource) not in written:
+                    framePass.clearBits |= gl.GL_COLOR_BUFFER_BIT
+            if framePass.depth!=None and id(framePass.depth) not in written:
+                framePass.clearBits |= gl.GL_DEPTH_BUFFER_BIT
+            written.update(map(id, framePass.writes()))
+
+        self.culled = len(passes) - len(order)
+        self.order = map(passes.__getitem__, order)
+
+    def assignTextures(self, passes, passReads):
+        """
+        shares textures between transient resources that are not used by
+        the same passes, creates the fbos for the attached textures.
+        """
+        # first and last pass using each transient resource
+        lifetimes = {}
+        for i in range(len(passes)):
+            for resource in passes[i].writes() + passReads[i]:
+                if not resource.isTransient(): continue
+                (first, _) = lifetimes.get(id(resource), (i, i))
+                lifetimes[id(resource)] = (first, i)
+        transient = filter(lambda r: id(r) in lifetimes, self.resources)
+        transient.sort(key=lambda r: lifetimes[id(r)][0])
+
+        # last pass using each texture of the pool
+        busyUntil = {}
+        used = {}
+        for resource in transient:
+            descriptor = resource.descriptor()
+            pool = self.texturePool.setdefault(descriptor, [])
+            (first, last) = lifetimes[id(resource)]
+            texture = None
+            if ALIAS_TRANSIENT_TEXTURES:
+                for candidate in pool:
+                    if busyUntil.get(id(candidate), -1) < first:
+                        texture = candidate
+                        break
+            else:
+                for candidate in pool:
+                    if id(candidate) not in busyUntil:
+                        texture = candidate
+                        break
+            if texture==None:
+                texture = resource.textureClass(width=resource.width, height=resource.height)
+                texture.create()
+                pool.append(texture)
+            busyUntil[id(texture)] = last
+            used.setdefault(descriptor, []).append(texture)
+            resource.texture = texture
+        # delete textures not used anymore,
+        # resources of culled passes do not have a texture.
+        for resource in filter(FrameResource.isTransient, self.resources):
+            if id(resource) not in lifetimes:
+                resource.texture = None
+        for descriptor in self.texturePool.keys():
+            textures = used.get(descriptor, [])
+            for texture in self.texturePool[descriptor]:
+                if texture not in textures:
+                    texture.delete()
+            self.texturePool[descriptor] = filter(
+                    lambda t: t in textures, self.texturePool[descriptor])
+
+        # passes with the same attachments share the fbo
+        fbos = {}
+        for framePass in passes:
+            if not framePass.isDeclared(): continue
+            key = (tuple(map(lambda r: r.texture.glID, framePass.colors)),
+                   framePass.depth.texture.glID if framePass.depth!=None else -1)
+            fbo = fbos.get(key) or self.fbos.get(key)
+            if fbo==None:
+                fbo = FBO()
+                for resource in framePass.colors:
+                    fbo.addColorTexture(resource.texture)
+                if framePass.depth!=None:
+                    fbo.setDepthTexture(framePass.depth.texture)
+                fbo.create()
+            fbos[key] = fbo
+            framePass.targetFBO = fbo
+        # delete the fbos not used anymore
+        for fbo in self.fbos.values():
+            if fbo not in fbos.values():
+                fbo.delete()
+        self.fbos = fbos
+
+    def draw(self):
+        """
+        draws the live passes, the fbo is only bound if it changes.
+        """
+        if self.order==None:
+            self.compile()
+        (drawn, culled, binds) = self.counters
+        lastFBO = None
+        lastCam = None
+        for framePass in self.order:
+            fbo = framePass.targetFBO
+            if fbo is not lastFBO:
+                fbo.enable(framePass.clearBits)
+                lastFBO = fbo
+                binds += 1
+            elif framePass.clearBits:
+                gl.glClear(framePass.clearBits)
+            if framePass.camera!=lastCam:
+                framePass.camera.enable()
+                lastCam = framePass.camera
+            framePass.draw()
+        self.counters = (drawn + len(self.order), culled + self.culled, binds)
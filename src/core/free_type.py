@@ -14,6 +14,7 @@ from utils.gl_config import importGL
 OpenGL = importGL()
 from OpenGL import GL as gl
 
+from core.gl_state_cache import stateCache
 
 def isFontAvailable (ft, facename):
     """ Returns true if FreeType can find the requested face name 
@@ -90,7 +91,7 @@ def makeDList (ft, ch, list_base, tex_base_list):
     # Now we just setup some texture paramaters.
     ID = gl.glGenTextures (1)
     tex_base_list [ch] = ID
-    gl.glBindTexture (gl.GL_TEXTURE_2D, ID)
+    stateCache.bindTexture (gl.GL_TEXTURE_2D, ID)
     gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
     gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
 
@@ -248,6 +249,9 @@ class FontData:
             gl.glPopMatrix()
 
         gl.glPopAttrib()
+        # the glyph lists bind textures and the blend function is not restored
+        stateCache.forgetTextures(gl.GL_TEXTURE_2D)
+        stateCache.forget(['blendFunc'])
 
     def release (self):
         """ Release the gl resources for this Face.
@@ -0,0 +1,144 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+
+import numpy
+
+from utils.algebra.culling import frustumPlanes, visibleBounds
+
+def worldBounds(model, segment):
+    """
+    returns center, sphere radius and box extents of the segment
+    transformed by the model and segment states,
+    None if the segment has no bounds.
+    """
+    bounds = model.segmentBounds(segment)
+    if bounds==None:
+        return None
+    (mat, (boxMin, boxMax), radius) = bounds
+    rot = mat[:3,:3]
+    center = numpy.dot(rot, 0.5*(boxMin + boxMax)) + mat[:3,3]
+    # the sphere is centered in the box
+    radius = radius*numpy.sqrt((rot**2).sum(axis=0)).max()
+    extents = numpy.dot(numpy.abs(rot), 0.5*(boxMax - boxMin))
+    return (center, radius, extents)
+
+class _PassBounds(object):
+    """
+    bounds of the segments drawn by a pass.
+    """
+    def __init__(self, pairs, bvh):
+        self.pairs = pairs
+        # pairs in the bvh are tested by the bvh
+        if bvh!=None:
+            self.bvhVersion = bvh.version
+            self.bvhIndexes = numpy.array(map(bvh.indexOf, pairs), 'int32')
+        else:
+            self.bvhVersion = -1
+            self.bvhIndexes = -numpy.ones(len(pairs), 'int32')
+        self.inBVH = numpy.flatnonzero(self.bvhIndexes>=0)
+        # the other pairs are tested one by one
+        self.linearIndexes = numpy.flatnonzero(self.bvhIndexes<0)
+        
+        n = len(self.linearIndexes)
+        self.centers = numpy.zeros((n,3), 'float32')
+        self.radii = numpy.zeros(n, 'float32')
+        self.extents = numpy.zeros((n,3), 'float32')
+        # segments without bounds are never culled
+        self.unbounded = numpy.zeros(n, 'uint8')
+        # segments with bounds that may change each frame
+        self.dynamicIndexes = []
+        for i in range(n):
+            (model, segment) = pairs[self.linearIndexes[i]]
+            if model.hasDynamicTransformation() or segment.hasDynamicTransformation():
+                self.dynamicIndexes.append(i)
+            self.updateBounds(i)
+
+    def updateBounds(self, i):
+        bounds = worldBounds(*self.pairs[self.linearIndexes[i]])
+        if bounds==None:
+            self.unbounded[i] = 1
+        else:
+            (self.centers[i], self.radii[i], self.extents[i]) = bounds
+
+class FrustumCuller(object):
+    """
+    skips segments outside of the frustum given by
+    the current gl projection and model view matrix.
+    segments are tested with the scene bvh if one is given.
+    other segments are tested in batches, their world space
+    bounds are calculated once for each pass.
+    """
+    def __init__(self, bvh=None):
+        self.bvh = bvh
+        # bounds for each pass name
+        self.passBounds = {}
+        # (drawn, culled) segments of each pass in the current frame
+        self.counters = {}
+        # (drawn, culled) segments of each pass in the last frame
+        self.frameCounters = {}
+
+    def nextFrame(self):
+        """
+        starts counting segments for a new frame.
+        """
+        self.frameCounters = self.counters
+        self.counters = {}
+
+    def report(self):
+        """
+        returns the drawn and culled segments of the last frame as string.
+        """
+        return ", ".join(map(lambda (name, (drawn, culled)):
+                                    "%s %d drawn %d culled" % (name, drawn, culled),
+                             sorted(self.frameCounters.items())))
+
+    def cull(self, pairs, passName):
+        """
+        returns the (model, segment) pairs with bounds intersecting the frustum.
+        """
+        if not pairs: return pairs
+        bvh = self.bvh
+        if bvh!=None and bvh.needsRebuild:
+            bvh = None
+        bounds = self.passBounds.get(passName)
+        if bounds==None or bounds.pairs!=pairs or \
+                bounds.bvhVersion!=(bvh.version if bvh!=None else -1):
+            bounds = _PassBounds(pairs, bvh)
+            self.passBounds[passName] = bounds
+        else:
+            for i in bounds.dynamicIndexes:
+                bounds.updateBounds(i)
+
+        planes = frustumPlanes(numpy.asarray(gl.glGetFloatv(gl.GL_PROJECTION_MATRIX), 'float32'),
+                               numpy.asarray(gl.glGetFloatv(gl.GL_MODELVIEW_MATRIX), 'float32'))
+        visible = numpy.empty(len(pairs), 'uint8')
+        if len(bounds.inBVH):
+            visible[bounds.inBVH] = bvh.frustumMask(planes)[bounds.bvhIndexes[bounds.inBVH]]
+        if len(bounds.linearIndexes):
+            visible[bounds.linearIndexes] = visibleBounds(planes,
+                    bounds.centers, bounds.radii, bounds.extents) | bounds.unbounded
+        visiblePairs = map(pairs.__getitem__, numpy.flatnonzero(visible))
+
+        self.count(passName, len(visiblePairs), len(pairs) - len(visiblePairs))
+        return visiblePairs
+
+    def count(self, passName, drawn, culled):
+        """
+        adds drawn and culled segments to the counters of the pass.
+        """
+        (passDrawn, passCulled) = self.counters.get(passName, (0, 0))
+        self.counters[passName] = (passDrawn + drawn, passCulled + culled)
+
+    def clear(self):
+        """
+        forgets the bounds, must be called if segments were moved.
+        """
+        self.passBounds = {}
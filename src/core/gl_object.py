@@ -12,6 +12,36 @@ import OpenGL.GLU as glu
 
 from utils.util import doNothing, joinFunctions
 from core.gl_state import GLState
+from core.gl_state_cache import stateCache
+
+import math
+import numpy
+
+def _rotationMatrix(angle, axis):
+    """
+    returns the matrix of glRotatef(angle, x, y, z) for a coordinate axis.
+    """
+    mat = numpy.identity(4)
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+    (i, j) = [(1, 2), (2, 0), (0, 1)][axis]
+    mat[i,i] = c; mat[i,j] = -s
+    mat[j,i] = s; mat[j,j] = c
+    return mat
+
+def transformationMatrix(translation=None, rotation=None, scaling=None):
+    """
+    returns the matrix of the translation, rotation and scaling states.
+    """
+    mat = numpy.identity(4)
+    if translation is not None:
+        mat[:3,3] = translation[:3]
+    if rotation is not None:
+        for axis in range(3):
+            mat = numpy.dot(mat, _rotationMatrix(rotation[axis], axis))
+    if scaling is not None:
+        mat = numpy.dot(mat, numpy.diag(list(scaling[:3]) + [1.0]))
+    return mat
 
 class SignalData(object):
     def __init__(self, id):
@@ -74,7 +104,8 @@ class GLObject(object):
             'matReflectionIntensity': (doNothing, doNothing),
             'matColor': (self.enableMatColor, self.disableMatColor),
             'reflectionMapSize': (doNothing, doNothing),
-            'isPlane': (doNothing, doNothing)
+            'isPlane': (doNothing, doNothing),
+            'castsShadows': (doNothing, doNothing)
         }
         for state in states:
             funcs = stateSetter.get(state.name)
@@ -159,20 +190,27 @@ class GLObject(object):
             
             self.staticStateListIds = [gl.glGenLists(1), gl.glGenLists(1)]
         
-            # create list for setting static states
+            # create list for setting static states,
+            # the cached values of states set by the list are unknown after calling it.
             gl.glNewList(self.staticStateListIds[0], gl.GL_COMPILE)
+            stateCache.beginList()
             self._enableStaticStates()
+            enableKeys = stateCache.endList()
             gl.glEndList()
             def enableStaticList():
                 gl.glCallList(self.staticStateListIds[0])
+                stateCache.forget(enableKeys)
             self._enableStaticStates = enableStaticList
             
             # create list for unsetting static states
             gl.glNewList(self.staticStateListIds[1], gl.GL_COMPILE)
+            stateCache.beginList()
             self._disableStaticStates()
+            disableKeys = stateCache.endList()
             gl.glEndList()
             def disableStaticList():
                 gl.glCallList(self.staticStateListIds[1])
+                stateCache.forget(disableKeys)
             self._disableStaticStates = disableStaticList
         else:
             self._enableStaticStates = doNothing
@@ -222,6 +260,32 @@ class GLObject(object):
             return True
         except KeyError:
             return False
+    def getTransformation(self):
+        """
+        returns the 4x4 matrix multiplied to the model view matrix
+        by the translation, rotation and scaling states.
+        states are applied in the same order as by the state functions.
+        """
+        mat = numpy.identity(4)
+        states = self.states.values()
+        for state in filter(lambda s: not s.dynamic, states) + \
+                     filter(lambda s: s.dynamic, states):
+            if state.name=='translation':
+                m = numpy.identity(4)
+                m[:3,3] = state.value[:3]
+                mat = numpy.dot(mat, m)
+            elif state.name=='rotation':
+                for axis in range(3):
+                    mat = numpy.dot(mat, _rotationMatrix(state.value[axis], axis))
+            elif state.name=='scaling':
+                mat = numpy.dot(mat, numpy.diag(list(state.value[:3]) + [1.0]))
+        return mat
+    def hasDynamicTransformation(self):
+        for name in ['translation', 'rotation', 'scaling']:
+            if self.hasState(name) and self.states[name].dynamic:
+                return True
+        return False
+    
     def hasTranslation(self):
         return self.hasState("translation")
     def hasRotation(self):
@@ -286,10 +350,10 @@ class GLObject(object):
     
     def enableLineStipple(self):
         stipple = self.lineStipple
-        gl.glEnable( gl.GL_LINE_STIPPLE )
+        stateCache.enable( gl.GL_LINE_STIPPLE )
         gl.glLineStipple( stipple[0], stipple[1] )
     def disableLineStipple(self):
-        gl.glDisable(gl.GL_LINE_STIPPLE)
+        stateCache.disable(gl.GL_LINE_STIPPLE)
     
     def enableShadeModel(self):
         gl.glShadeModel( self.shadeModel )
@@ -299,12 +363,12 @@ class GLObject(object):
     def enablePolygonMode(self):
         front, back = self.polygonMode
         if front==back:
-            gl.glPolygonMode(gl.GL_FRONT_AND_BACK, front)
+            stateCache.polygonMode(gl.GL_FRONT_AND_BACK, front)
         else:
-            gl.glPolygonMode(gl.GL_FRONT, front)
-            gl.glPolygonMode(gl.GL_BACK, back)
+            stateCache.polygonMode(gl.GL_FRONT, front)
+            stateCache.polygonMode(gl.GL_BACK, back)
     def disablePolygonMode(self):
-        gl.glPolygonMode(gl.GL_FRONT_AND_BACK, gl.GL_FILL)
+        stateCache.polygonMode(gl.GL_FRONT_AND_BACK, gl.GL_FILL)
     
     def enableEvalPolygonMode(self):
         glu.gluNurbsProperty(self.glID,
@@ -332,61 +396,61 @@ class GLObject(object):
         gl.glScalef(self.scale[0], self.scale[1], self.scale[2])
 
     def enableLightPosition(self):
-        gl.glLightfv(self.glIndex,
-                     gl.GL_POSITION,
-                     self.lightPosition)
+        stateCache.lightfv(self.glIndex,
+                           gl.GL_POSITION,
+                           self.lightPosition)
     def enableLightAmbient(self):
-        gl.glLightfv(self.glIndex,
-                     gl.GL_AMBIENT,
-                     self.lightAmbient)
+        stateCache.lightfv(self.glIndex,
+                           gl.GL_AMBIENT,
+                           self.lightAmbient)
     def enableLightDiffuse(self):
-        gl.glLightfv(self.glIndex,
-                     gl.GL_DIFFUSE,
-                     self.lightDiffuse)
+        stateCache.lightfv(self.glIndex,
+                           gl.GL_DIFFUSE,
+                           self.lightDiffuse)
     def enableLightSpecular(self):
-        gl.glLightfv(self.glIndex,
-                     gl.GL_SPECULAR,
-                     self.lightSpecular)
+        stateCache.lightfv(self.glIndex,
+                           gl.GL_SPECULAR,
+                           self.lightSpecular)
     
     def enableConstAttenuation(self):
-        gl.glLightf(self.glIndex,
-                    gl.GL_CONSTANT_ATTENUATION,
-                    self.constantAttenuation)
+        stateCache.lightf(self.glIndex,
+                          gl.GL_CONSTANT_ATTENUATION,
+                          self.constantAttenuation)
     def enableLinaerAttenuation(self):
-        gl.glLightf(self.glIndex,
-                    gl.GL_LINEAR_ATTENUATION,
-                    self.linearAttenuation)
+        stateCache.lightf(self.glIndex,
+                          gl.GL_LINEAR_ATTENUATION,
+                          self.linearAttenuation)
     def enableQuadricAttenuation(self):
-        gl.glLightf(self.glIndex,
-                    gl.GL_QUADRATIC_ATTENUATION,
-                    self.quadricAttenuation)
+        stateCache.lightf(self.glIndex,
+                          gl.GL_QUADRATIC_ATTENUATION,
+                          self.quadricAttenuation)
     
     def enableDirection(self):
-        gl.glLightfv(self.glIndex,
-                     gl.GL_SPOT_DIRECTION,
-                     self.lightDirection)
+        stateCache.lightfv(self.glIndex,
+                           gl.GL_SPOT_DIRECTION,
+                           self.lightDirection)
     def enableExponent(self):
-        gl.glLightf(self.glIndex,
-                    gl.GL_SPOT_EXPONENT,
-                    self.lightExponent)
+        stateCache.lightf(self.glIndex,
+                          gl.GL_SPOT_EXPONENT,
+                          self.lightExponent)
     def enableCutOff(self):
-        gl.glLightf(self.glIndex,
-                    gl.GL_SPOT_CUTOFF,
-                    self.lightCutOff)
+        stateCache.lightf(self.glIndex,
+                          gl.GL_SPOT_CUTOFF,
+                          self.lightCutOff)
     
     def enableMatEmission(self):
-        gl.glMaterialfv(gl.GL_FRONT, gl.GL_EMISSION,  self.matEmission )
+        stateCache.materialfv(gl.GL_FRONT, gl.GL_EMISSION,  self.matEmission )
     def enableMatDiffuse(self):
-        gl.glMaterialfv(gl.GL_FRONT, gl.GL_DIFFUSE,   self.matDiffuse )
+        stateCache.materialfv(gl.GL_FRONT, gl.GL_DIFFUSE,   self.matDiffuse )
     def enableMatAmbient(self):
-        gl.glMaterialfv(gl.GL_FRONT, gl.GL_AMBIENT,   self.matAmbient )
+        stateCache.materialfv(gl.GL_FRONT, gl.GL_AMBIENT,   self.matAmbient )
     def enableMatSpecular(self):
-        gl.glMaterialfv(gl.GL_FRONT, gl.GL_SPECULAR,  self.matSpecular )
+        stateCache.materialfv(gl.GL_FRONT, gl.GL_SPECULAR,  self.matSpecular )
     def enableMatShininess(self):
-        gl.glMaterialfv(gl.GL_FRONT, gl.GL_SHININESS, (self.matShininess ))
+        stateCache.materialfv(gl.GL_FRONT, gl.GL_SHININESS, (self.matShininess ))
     def enableMatColor(self):
-        gl.glEnable( gl.GL_COLOR_MATERIAL )
+        stateCache.enable( gl.GL_COLOR_MATERIAL )
         gl.glColor4fv( self.matColor )
     def disableMatColor(self):
         gl.glColor3f( 1.0, 1.0, 1.0 )
-        gl.glDisable( gl.GL_COLOR_MATERIAL )
+        stateCache.disable( gl.GL_COLOR_MATERIAL )
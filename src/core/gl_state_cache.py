@@ -0,0 +1,253 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+
+# set to False for issuing every state call
+USE_STATE_CACHE = True
+
+# light parameters transformed by the current model view matrix,
+# setting them again with the same value may change the state.
+_EYE_SPACE_LIGHT_PARAMETERS = [gl.GL_POSITION, gl.GL_SPOT_DIRECTION]
+# material parameters following the current color
+# while GL_COLOR_MATERIAL is enabled
+_COLOR_MATERIAL_PARAMETERS = [gl.GL_AMBIENT, gl.GL_DIFFUSE, gl.GL_AMBIENT_AND_DIFFUSE]
+
+def _stateValue(value):
+    """
+    returns a value that can be compared with the cached value.
+    """
+    try:
+        return tuple(value)
+    except TypeError:
+        return value
+
+class GLStateCache(object):
+    """
+    shadow copy of the gl states set by the engine.
+    calls setting a state to the value it already has are skipped.
+    code changing states without the cache must call forget()
+    or invalidate() afterwards, for example after glPopAttrib.
+    calls compiled in display lists are issued and the states
+    they touch are forgotten when the list is called.
+    """
+    def __init__(self):
+        # known value of each state key
+        self.values = {}
+        # keys touched by the display list that is compiled,
+        # None if no list is compiled.
+        self.listKeys = None
+        # (issued, skipped) calls in the current frame
+        self.counters = (0, 0)
+        # (issued, skipped) calls in the last frame
+        self.frameCounters = (0, 0)
+
+    def nextFrame(self):
+        """
+        starts counting calls for a new frame.
+        """
+        self.frameCounters = self.counters
+        self.counters = (0, 0)
+
+    def report(self):
+        """
+        returns the issued and skipped calls of the last frame as string.
+        """
+        return "%d state calls issued, %d skipped" % self.frameCounters
+
+    def invalidate(self):
+        """
+        forgets all states, must be called if unknown code changed states.
+        """
+        self.values = {}
+
+    def forget(self, keys):
+        """
+        forgets the states with the keys.
+        """
+        for key in keys:
+            if type(key)==tuple and key[0]=='texture' and key[1]==None:
+                # bound to the unit that was active, which is not known
+                self.forgetTextures(key[2])
+            self.values.pop(key, None)
+
+    def beginList(self):
+        """
+        must be called before a display list is compiled.
+        """
+        self.listKeys = set()
+
+    def endList(self):
+        """
+        returns the keys of the states touched by the compiled list.
+        """
+        keys = frozenset(self.listKeys)
+        self.listKeys = None
+        return keys
+
+    def setState(self, key, value, func, *args):
+        """
+        calls func(*args) if the state with @key does not have @value.
+        """
+        (issued, skipped) = self.counters
+        if self.listKeys!=None:
+            # the call is executed when the list is called
+            self.listKeys.add(key)
+        elif USE_STATE_CACHE:
+            if key in self.values and self.values[key]==value:
+                self.counters = (issued, skipped+1)
+                return
+            self.values[key] = value
+        func(*args)
+        self.counters = (issued+1, skipped)
+
+    def setStates(self, keys, value, func, *args):
+        """
+        calls func(*args) if one of the states with @keys does not have @value.
+        """
+        (issued, skipped) = self.counters
+        if self.listKeys!=None:
+            self.listKeys.update(keys)
+        elif USE_STATE_CACHE:
+            values = self.values
+            if all(map(lambda key: key in values and values[key]==value, keys)):
+                self.counters = (issued, skipped+1)
+                return
+            for key in keys:
+                values[key] = value
+        func(*args)
+        self.counters = (issued+1, skipped)
+
+    def issue(self, key, func, *args):
+        """
+        calls func(*args) and forgets the state with @key.
+        """
+        if self.listKeys!=None:
+            self.listKeys.add(key)
+        else:
+            self.values.pop(key, None)
+        func(*args)
+        (issued, skipped) = self.counters
+        self.counters = (issued+1, skipped)
+
+    ### PROGRAMS, TEXTURES AND BUFFERS
+
+    def useProgram(self, program):
+        self.setState('program', program, gl.glUseProgram, program)
+
+    def activeTexture(self, unit):
+        self.setState('activeTexture', unit, gl.glActiveTexture, gl.GL_TEXTURE0 + unit)
+
+    def bindTexture(self, target, texture, unit=None):
+        """
+        binds the texture to @unit, or to the active unit if @unit is None.
+        """
+        if unit==None:
+            unit = self.values.get('activeTexture')
+            # the unit active when a compiled list is called is not known
+            if unit==None or self.listKeys!=None:
+                # the active unit is not known, any binding of the target may change
+                self.forgetTextures(target)
+                self.issue(('texture', None, target), gl.glBindTexture, target, texture)
+                return
+        else:
+            self.activeTexture(unit)
+        self.setState(('texture', unit, target), texture, gl.glBindTexture, target, texture)
+
+    def forgetTextures(self, target):
+        """
+        must be called if textures were bound to @target without the cache.
+        """
+        self.forget(filter(lambda key: type(key)==tuple and key[0]=='texture' and key[2]==target,
+                           self.values.keys()))
+
+    def forgetProgram(self, program):
+        """
+        must be called if the program was deleted,
+        the handle may be used by a new program.
+        """
+        self.forget(filter(lambda key: type(key)==tuple and key[0]=='uniform' and key[1]==program,
+                           self.values.keys()))
+
+    def uniform1i(self, program, location, value):
+        """
+        sets an integer uniform of the program in use.
+        """
+        self.setState(('uniform', program, location), value, gl.glUniform1i, location, value)
+
+    def bindBuffer(self, target, buffer):
+        self.setState(('buffer', target), buffer, gl.glBindBuffer, target, buffer)
+
+    def forgetBuffer(self, target):
+        """
+        must be called if a buffer was bound to @target without the cache.
+        """
+        self.values.pop(('buffer', target), None)
+
+    def bindVertexArray(self, vertexArray):
+        if self.values.get('vertexArray', -1)!=vertexArray:
+            # the element buffer binding is part of the vertex array state
+            self.forgetBuffer(gl.GL_ELEMENT_ARRAY_BUFFER)
+        self.setState('vertexArray', vertexArray, gl.glBindVertexArray, vertexArray)
+
+    ### CAPABILITIES AND RASTER STATES
+
+    def enable(self, cap):
+        self.setState(('cap', cap), True, gl.glEnable, cap)
+        if cap==gl.GL_COLOR_MATERIAL:
+            self.forgetColorMaterial()
+
+    def disable(self, cap):
+        self.setState(('cap', cap), False, gl.glDisable, cap)
+
+    def cullFace(self, mode):
+        self.setState('cullFace', mode, gl.glCullFace, mode)
+
+    def polygonMode(self, face, mode):
+        if face==gl.GL_FRONT_AND_BACK:
+            keys = (('polygonMode', gl.GL_FRONT), ('polygonMode', gl.GL_BACK))
+        else:
+            keys = (('polygonMode', face),)
+        self.setStates(keys, mode, gl.glPolygonMode, face, mode)
+
+    def blendFunc(self, src, dst):
+        self.setState('blendFunc', (src, dst), gl.glBlendFunc, src, dst)
+
+    ### FIXED FUNCTION LIGHTS AND MATERIALS
+
+    def lightfv(self, light, name, value):
+        if name in _EYE_SPACE_LIGHT_PARAMETERS:
+            # transformed by the current model view matrix
+            self.issue(('light', light, name), gl.glLightfv, light, name, value)
+        else:
+            self.setState(('light', light, name), _stateValue(value),
+                          gl.glLightfv, light, name, value)
+
+    def lightf(self, light, name, value):
+        self.setState(('light', light, name), value, gl.glLightf, light, name, value)
+
+    def materialfv(self, face, name, value):
+        if self.values.get(('cap', gl.GL_COLOR_MATERIAL), True) and \
+                name in _COLOR_MATERIAL_PARAMETERS:
+            # the parameter may follow the current color
+            self.issue(('material', face, name), gl.glMaterialfv, face, name, value)
+        else:
+            self.setState(('material', face, name), _stateValue(value),
+                          gl.glMaterialfv, face, name, value)
+
+    def forgetColorMaterial(self):
+        """
+        forgets the material parameters following the current color.
+        """
+        for face in [gl.GL_FRONT, gl.GL_BACK]:
+            for name in _COLOR_MATERIAL_PARAMETERS:
+                self.values.pop(('material', face, name), None)
+
+# the states of the gl context used by the engine
+stateCache = GLStateCache()
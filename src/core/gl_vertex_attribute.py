@@ -9,6 +9,20 @@ from utils.gl_config import importGL
 OpenGL = importGL()
 from OpenGL import GL as gl
 
+import numpy
+
+# numpy types of the gl data types
+_glDataTypes = {
+    gl.GL_FLOAT: 'float32',
+    gl.GL_DOUBLE: 'float64',
+    gl.GL_BYTE: 'int8',
+    gl.GL_UNSIGNED_BYTE: 'uint8',
+    gl.GL_SHORT: 'int16',
+    gl.GL_UNSIGNED_SHORT: 'uint16',
+    gl.GL_INT: 'int32',
+    gl.GL_UNSIGNED_INT: 'uint32'
+}
+
 def normalAttribute(normals):
     return GLVertexAttribute(name="vertexNormal",
                             data=normals,
@@ -54,5 +68,43 @@ class GLVertexAttribute(object):
         # offset to the next attribute of this type.
         self.stride = 0
     
+    def duplicateElement(self, index):
+        """
+        appends a copy of the element at @index to the data.
+        """
+        if not isinstance(self.data, list):
+            # parsed data is a contiguous array, switch to a list of rows
+            self.data = list(self.data)
+        self.data.append(self.data[index])
+    
+    def duplicateElements(self, indexes):
+        """
+        appends copies of the elements at @indexes to the data.
+        """
+        if isinstance(self.data, list):
+            self.data += [self.data[i] for i in indexes]
+        else:
+            data = numpy.asarray(self.data)
+            self.data = numpy.concatenate((data, data[indexes]))
+    
+    def reorderElements(self, order):
+        """
+        reorders the data, element i is the old element at @order[i].
+        """
+        self.data = numpy.asarray(self.data).take(order, axis=0)
+    
+    def getDtype(self):
+        """
+        returns the numpy type of a single attribute element.
+        """
+        return numpy.dtype((_glDataTypes[self.dataType], (self.valsPerElement,)))
+    
+    def getArray(self):
+        """
+        returns the data as contiguous (numElements, valsPerElement) array.
+        """
+        return numpy.asarray(self.data, _glDataTypes[self.dataType]).reshape(
+                (-1, self.valsPerElement))
+    
     def __str__(self):
         return self.name
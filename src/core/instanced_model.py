@@ -0,0 +1,210 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+from OpenGL.arrays.arraydatatype import ArrayDatatype
+from OpenGL.raw.GL.VERSION.GL_2_0 import glVertexAttribPointer as glVertexAttribPointerRAW
+
+import ctypes
+import numpy
+
+from shader.shader_utils import INSTANCE_MATRIX_LOCATION
+from core.model import Model
+from core.gl_state_cache import stateCache
+from core.segments.vbo_segment import VBOSegment
+from utils.algebra.culling import frustumPlanes, visibleBounds
+
+# set to False for drawing all instances without testing them against the frustum
+USE_INSTANCE_CULLING = True
+
+# corners of the unit box
+_BOX_CORNERS = numpy.array([[x, y, z] for x in (0,1) for y in (0,1) for z in (0,1)], 'float64')
+
+class InstanceBuffer(object):
+    """
+    streamed buffer with the matrix of each drawn instance.
+    the matrices are in gl (column major) layout, one mat4 attribute
+    with divisor 1 reads them.
+    """
+    def __init__(self):
+        self.glID = None
+        # number of instances in the buffer
+        self.count = 0
+
+    def create(self):
+        self.glID = int(gl.glGenBuffers(1))
+
+    def upload(self, matrices):
+        """
+        replaces the matrices in the buffer.
+        the buffer is orphaned, draws using the old matrices are not waited for.
+        """
+        self.count = len(matrices)
+        if self.count==0: return
+        stateCache.bindBuffer(gl.GL_ARRAY_BUFFER, self.glID)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, matrices.nbytes,
+                        ArrayDatatype.voidDataPointer(matrices), gl.GL_STREAM_DRAW)
+
+    def bind(self):
+        stateCache.bindBuffer(gl.GL_ARRAY_BUFFER, self.glID)
+        for i in range(4):
+            gl.glEnableVertexAttribArray(INSTANCE_MATRIX_LOCATION + i)
+
+    def bindAttributes(self):
+        """
+        each column of the matrix is a vec4 attribute advanced once per instance.
+        """
+        for i in range(4):
+            glVertexAttribPointerRAW(INSTANCE_MATRIX_LOCATION + i, 4, gl.GL_FLOAT, gl.GL_FALSE,
+                                     64, ctypes.c_void_p(16*i))
+            gl.glVertexAttribDivisor(INSTANCE_MATRIX_LOCATION + i, 1)
+
+    def unbind(self):
+        for i in range(4):
+            gl.glDisableVertexAttribArray(INSTANCE_MATRIX_LOCATION + i)
+
+    def delete(self):
+        if self.glID!=None:
+            gl.glDeleteBuffers(1, [self.glID])
+            self.glID = None
+
+class _InstanceBounds(object):
+    """
+    boxes of the instances in model space.
+    """
+    def __init__(self, boxMin, boxMax):
+        self.centers = numpy.ascontiguousarray(0.5*(boxMin + boxMax), 'float32')
+        self.extents = numpy.ascontiguousarray(0.5*(boxMax - boxMin), 'float32')
+        self.radii = numpy.sqrt((self.extents**2).sum(axis=1)).astype('float32')
+        # box of all instances
+        if len(boxMin):
+            self.box = (boxMin.min(axis=0), boxMax.max(axis=0))
+        else:
+            self.box = (numpy.zeros(3), numpy.zeros(3))
+        self.radius = 0.5*numpy.sqrt(((self.box[1] - self.box[0])**2).sum())
+
+class InstancedModel(Model):
+    """
+    a model drawn once for each instance matrix.
+    the segments and their vbos exist once for all instances,
+    each segment is drawn with a single glDrawElementsInstanced call.
+    the matrices of the instances in the view frustum are streamed to
+    the instance buffer each time the model states are enabled.
+    instance matrices are applied before the segment transformations.
+    """
+
+    def __init__(self, segments, params, matrices, segmentLoader=None):
+        self.instances = InstanceBuffer()
+        if segmentLoader!=None:
+            loader = segmentLoader
+            segmentLoader = lambda: self.instanceSegments(loader())
+        Model.__init__(self, self.instanceSegments(segments), params, segmentLoader)
+        self.setInstanceMatrices(matrices)
+
+    def instanceSegments(self, segments):
+        for s in segments:
+            if isinstance(s, VBOSegment):
+                s.setInstances(self.instances)
+            else:
+                print "WARNING: cannot instance segment '%s'" % s.segmentID
+        return segments
+
+    def setInstanceMatrices(self, matrices):
+        """
+        sets the 4x4 matrices of the instances.
+        """
+        self.instanceMatrices = numpy.array(matrices, 'float32').reshape((-1,4,4))
+        # gl matrices are transposed
+        self.glMatrices = numpy.ascontiguousarray(self.instanceMatrices.transpose((0,2,1)))
+        self.instanceBounds = None
+        # mask of the instances in the instance buffer
+        self.uploadedMask = None
+        # the bounds of the segments changed
+        invalidateBounds = getattr(self.app, 'invalidateBounds', None)
+        if invalidateBounds!=None:
+            invalidateBounds()
+
+    def getInstanceBounds(self):
+        """
+        returns the model space boxes of the instances,
+        None if not all segments have bounds.
+        """
+        segments = self.segments
+        if not segments or filter(lambda s: s.boundingBox==None, segments):
+            return None
+        dynamic = filter(lambda s: s.hasDynamicTransformation(), segments)
+        if self.instanceBounds!=None and not dynamic and \
+                self.instanceBoundsSegments==len(segments):
+            return self.instanceBounds
+
+        n = len(self.instanceMatrices)
+        boxMin = numpy.empty((n,3)); boxMin.fill(numpy.inf)
+        boxMax = numpy.empty((n,3)); boxMax.fill(-numpy.inf)
+        for s in segments:
+            (segmentMin, segmentMax) = s.boundingBox
+            corners = numpy.ones((8,4))
+            corners[:,:3] = segmentMin + _BOX_CORNERS*(segmentMax - segmentMin)
+            # instance matrix is applied before the segment transformation
+            mats = numpy.einsum('ij,njk->nik', s.getTransformation(), self.instanceMatrices)
+            points = numpy.einsum('nij,kj->nki', mats, corners)[:,:,:3]
+            boxMin = numpy.minimum(boxMin, points.min(axis=1))
+            boxMax = numpy.maximum(boxMax, points.max(axis=1))
+        self.instanceBounds = _InstanceBounds(boxMin, boxMax)
+        self.instanceBoundsSegments = len(segments)
+        return self.instanceBounds
+
+    def segmentBounds(self, segment):
+        """
+        the box of all instances is used for each segment.
+        """
+        bounds = self.getInstanceBounds()
+        if bounds==None:
+            return None
+        return (self.getTransformation(), bounds.box, bounds.radius)
+
+    def selectLODs(self, app):
+        """
+        all instances are drawn with the same level of detail,
+        the full resolution is used.
+        """
+        pass
+
+    def create(self, app):
+        # segments record the instance buffer in their vertex arrays
+        self.instances.create()
+        Model.create(self, app)
+
+    def updateInstances(self):
+        """
+        streams the matrices of the instances inside the view frustum to
+        the instance buffer. must be called before the model transformation
+        is multiplied to the model view matrix.
+        """
+        bounds = self.getInstanceBounds()
+        if bounds==None or not USE_INSTANCE_CULLING:
+            mask = numpy.ones(len(self.instanceMatrices), 'uint8')
+        else:
+            # test the model space boxes
+            modelView = numpy.dot(self.getTransformation().T,
+                                  gl.glGetFloatv(gl.GL_MODELVIEW_MATRIX)).astype('float32')
+            planes = frustumPlanes(numpy.asarray(gl.glGetFloatv(gl.GL_PROJECTION_MATRIX), 'float32'),
+                                   modelView)
+            mask = visibleBounds(planes, bounds.centers, bounds.radii, bounds.extents)
+        # passes with the same visible instances use the uploaded matrices
+        if self.uploadedMask is not None and numpy.array_equal(self.uploadedMask, mask):
+            return
+        self.instances.upload(self.glMatrices[mask.view('bool')])
+        self.uploadedMask = mask
+
+    def enableStates(self):
+        self.updateInstances()
+        Model.enableStates(self)
+
+    def deleteInstances(self):
+        self.instances.delete()
@@ -13,8 +13,7 @@ from OpenGL.GL import GL_TEXTURE_COMPARE_MODE,\
                       GL_QUADS,\
                       GL_LIGHT0,\
                       GL_TEXTURE_2D_ARRAY
-from OpenGL.GL import glBindTexture,\
-                      glTexParameteri,\
+from OpenGL.GL import glTexParameteri,\
                       glVertex3f,\
                       glViewport,\
                       glEnd,\
@@ -22,6 +21,7 @@ from OpenGL.GL import glBindTexture,\
                       glUniform1f
 
 from core.gl_object import GLObject
+from core.gl_state_cache import stateCache
 from core.shadows.shadow_map import DirectionalShadowCamera,\
                                     SpotShadowCamera,\
                                     DirectionalShadowMap,\
@@ -124,7 +124,7 @@ def drawShadowMaps(lights, layerLoc):
         shadowMapArray = light.shadowMapArray
         shadowMaps = shadowMapArray.shadowMaps
         
-        glBindTexture( GL_TEXTURE_2D_ARRAY, shadowMapArray.texture.glID )
+        stateCache.bindTexture( GL_TEXTURE_2D_ARRAY, shadowMapArray.texture.glID )
         glTexParameteri( GL_TEXTURE_2D_ARRAY, GL_TEXTURE_COMPARE_MODE, GL_NONE )
         
         for j in range(len(shadowMaps)):
@@ -11,20 +11,60 @@ from OpenGL import GL as gl
 
 from core.gl_object import GLObject
 
+import math
+import numpy
+
 class Model(GLObject):
     
-    def __init__(self, segments, params):
+    def __init__(self, segments, params, segmentLoader=None):
         GLObject.__init__(self, params)
         
         # list of segments
         self.segments = segments
         self.lights = []
+        
+        # function returning the segments of a lazy model,
+        # called on first draw or by loadSegments
+        self.segmentLoader = segmentLoader
+        self.app = None
+    
+    def isLoaded(self):
+        """
+        returns False if the segments of the model are not loaded yet.
+        """
+        return self.segmentLoader==None
+    
+    def loadSegments(self):
+        """
+        loads the segments of a lazy model.
+        segments are created too if the model was created before.
+        """
+        if self.segmentLoader==None: return
+        segments = self.segmentLoader()
+        self.segmentLoader = None
+        
+        if self.app!=None:
+            self.app.addSegments(segments)
+        if self.created:
+            for s in segments:
+                s.createGuard(self.app, self.lights)
+        self.segments = self.segments + segments
+    
+    def removeSegments(self, segments):
+        """
+        removes segments from the model and deletes their vbos.
+        """
+        for s in segments:
+            self.segments.remove(s)
+            if s.created and hasattr(s, 'deleteVBOs'):
+                s.deleteVBOs()
     
     def create(self, app):
         """
         creates gl resources of model.
         @param lights: list of gl_helper.light.Light instances
         """
+        self.app = app
         
         GLObject.create(self, app, self.lights)
         
@@ -32,9 +72,9 @@ class Model(GLObject):
         
         for l in self.lights:
             l.createGuard(app, self.lights)
+        # vbo segments save static data in the buffer arena of the app
         for s in self.segments:
             s.createGuard(app, self.lights)
-        # TODO: VBO: create some bigger vbos for vbo segments
         
         self.postCreate()
     
@@ -65,20 +105,74 @@ class Model(GLObject):
         for i in range(len(lights)):
             lights[i].setIndex(i)
     
-    def draw(self, app, _):
+    def segmentBounds(self, segment):
+        """
+        returns the matrix transforming the segment bounds to world space,
+        the (min, max) box and the sphere radius of the segment bounds.
+        None if the segment has no bounds.
+        """
+        if segment.boundingSphere==None or segment.boundingBox==None:
+            return None
+        (_, radius) = segment.boundingSphere
+        return (numpy.dot(self.getTransformation(), segment.getTransformation()),
+                segment.boundingBox, radius)
+    
+    def selectLODs(self, app):
+        """
+        selects the level of detail of each segment.
+        the geometric error of a level projected to the screen
+        at the nearest point of the segment bounding sphere must not
+        exceed the pixel error threshold of the app.
+        """
+        camera = getattr(app, 'sceneCamera', None)
+        if camera==None or camera.position is None:
+            return
+        maxPixelError = getattr(app, 'lodPixelError', 1.0)
+        if maxPixelError <= 0.0:
+            return
+        # pixels covered by one unit in distance one
+        pixelsPerUnit = app.winSize[1] / (2.0*math.tan(math.radians(0.5*app.fov)))
+        cameraPosition = numpy.asarray(camera.position, 'float64')[:3]
+        
+        for segment in self.segments:
+            if not segment.lodErrors:
+                continue
+            bounds = self.segmentBounds(segment)
+            if bounds==None:
+                continue
+            # the sphere transformed by the model and segment states
+            (mat, _, radius) = bounds
+            (center, _) = segment.boundingSphere
+            rot = mat[:3,:3]
+            scale = numpy.sqrt((rot**2).sum(axis=0)).max()
+            center = numpy.dot(rot, numpy.asarray(center, 'float64')[:3]) + mat[:3,3]
+            distance = math.sqrt(((center - cameraPosition)**2).sum()) - radius*scale
+            distance = max(distance, app.nearClip)
+            segment.selectLOD(scale*pixelsPerUnit/distance, maxPixelError)
+    
+    def queueSegments(self, app):
+        """
+        prepares the model for drawing and returns
+        the segments that should be drawn.
+        """
         self.app = app
+        # lazy models load segments when drawn the first time
+        if self.segmentLoader!=None:
+            self.loadSegments()
+        self.selectLODs(app)
+        return filter(lambda s: not s.hidden, self.segments)
+    
+    def draw(self, app, _):
+        # not drawing hidden element,
+        # for example used in reflection by the reflector.
+        segments = self.queueSegments(app)
         
         if self.popTransformations:
             gl.glPushMatrix()
         self.enableStates()
         
         # draw segments of model
-        for segment in self.segments:
-            # not drawing hidden element,
-            # for example used in reflection by the reflector.
-            # TODO: can be done without this if ;)
-            if segment.hidden: continue
-            
+        for segment in segments:
             segment.shader.enable()
             
             if segment.popTransformations:
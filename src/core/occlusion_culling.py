@@ -0,0 +1,339 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+from OpenGL.arrays.arraydatatype import ArrayDatatype
+from OpenGL.raw.GL.VERSION.GL_1_1 import glVertexPointer as glVertexPointerRAW
+
+import random
+import numpy
+
+from core.gl_state_cache import stateCache
+from core.vbo import vertexArraysSupported
+from core.frustum_culling import worldBounds
+
+# set to False for counting the samples passed,
+# any samples queries may finish earlier.
+USE_ANY_SAMPLES = True
+# visible segments are queried again after this number of frames.
+# a random number of frames smaller then the interval is added,
+# so that the queries are spread over the frames.
+VISIBLE_QUERY_INTERVAL = 8
+# boxes closer to the camera are not queried,
+# the near plane may clip the box faces.
+NEAR_MARGIN = 0.1
+
+# names of the counters of the occlusion culler
+OCCLUSION_COUNTERS = ['segments', 'occluded', 'drawQueries', 'boxQueries']
+
+# corners of the six box faces drawn as quads,
+# 0 selects the box minimum and 1 the box maximum.
+_BOX_CORNERS = numpy.array([
+    [0,0,0], [0,0,1], [0,1,1], [0,1,0], # -x
+    [1,0,0], [1,1,0], [1,1,1], [1,0,1], # +x
+    [0,0,0], [1,0,0], [1,0,1], [0,0,1], # -y
+    [0,1,0], [0,1,1], [1,1,1], [1,1,0], # +y
+    [0,0,0], [0,1,0], [1,1,0], [1,0,0], # -z
+    [0,0,1], [1,0,1], [1,1,1], [0,1,1]  # +z
+], 'float32')
+
+_glVersion = None
+
+def _hasGLVersion(major, minor):
+    """
+    returns True if the context supports gl major.minor.
+    needs a gl context.
+    """
+    global _glVersion
+    if _glVersion==None:
+        version = gl.glGetString(gl.GL_VERSION).split()[0].split('.')
+        _glVersion = (int(version[0]), int(version[1]))
+    return _glVersion>=(major, minor)
+
+def _drawCost(segment):
+    """
+    number of indexes drawn for the segment.
+    """
+    lodRanges = getattr(segment, 'lodRanges', None)
+    if lodRanges:
+        cost = lodRanges[min(segment.lodLevel, len(lodRanges)-1)][1]
+    else:
+        cost = getattr(segment, 'numIndexes', 1)
+    if segment.instances!=None:
+        cost *= segment.instances.count
+    return cost
+
+class _OcclusionState(object):
+    """
+    occlusion state of a segment drawn by a model.
+    """
+    def __init__(self, model, segment):
+        self.model = model
+        self.segment = segment
+        self.visible = True
+        # last frame the segment was drawn or skipped in the pass
+        self.frame = -1
+        # query not read yet
+        self.query = None
+        # visible segments are queried in this frame
+        self.nextQueryFrame = 0
+        self.dynamic = model.hasDynamicTransformation() or segment.hasDynamicTransformation()
+        self.box = None
+
+    def getBox(self):
+        """
+        returns the world space box of the segment, None if it has no bounds.
+        """
+        if self.box==None or self.dynamic:
+            bounds = worldBounds(self.model, self.segment)
+            if bounds==None:
+                self.box = None
+            else:
+                (center, _, extents) = bounds
+                self.box = (center - extents, center + extents)
+        return self.box
+
+class OcclusionCuller(object):
+    """
+    skips segments hidden by other segments with hardware occlusion queries.
+    query results of the last frames are used, so waiting for
+    the gpu is never needed (chc++ without the hierarchy):
+        - segments visible in the last frame are drawn, every few frames
+          a query counts the samples of the draw.
+        - segments occluded in the last frame are skipped, their bounding
+          boxes are queried after the visible segments were drawn.
+          they are drawn again after a query passed.
+    the gpu time of the pass is measured with timer queries.
+    """
+    def __init__(self, passName='scene'):
+        # pass using the occlusion queries
+        self.passName = passName
+        # state of each (model, segment) pair
+        self.states = {}
+        self.freeQueries = []
+        # stream buffer for the box vertices
+        self.boxBuffer = None
+        self.frame = 0
+        if USE_ANY_SAMPLES and _hasGLVersion(3, 3):
+            self.samplesTarget = gl.GL_ANY_SAMPLES_PASSED
+        else:
+            self.samplesTarget = gl.GL_SAMPLES_PASSED
+        self.useTimer = _hasGLVersion(3, 3)
+        # (query, drawn indexes, occluded indexes) of passes not read yet
+        self.timerQueries = []
+        # gpu time of the last measured pass and the estimated time saved
+        self.passTime = 0.0
+        self.savedTime = 0.0
+        # states of the pass in the current frame
+        self.drawQueries = {}
+        self.boxStates = []
+        self.drawnCost = 0
+        self.occludedCost = 0
+        # counters of the current frame
+        self.counters = {}
+        # counters of the last frame
+        self.frameCounters = {}
+        self.nextFrame()
+
+    def nextFrame(self):
+        """
+        starts counting for a new frame.
+        """
+        self.frame += 1
+        self.frameCounters = self.counters
+        self.counters = {}
+        for name in OCCLUSION_COUNTERS:
+            self.counters[name] = 0
+
+    def report(self):
+        """
+        returns the counters of the last frame and the gpu time of
+        the last measured pass as string.
+        """
+        return "%s, gpu %.2f ms, saved ~%.2f ms" % (
+                ", ".join(map(lambda name: "%s %d" % (name, self.frameCounters.get(name, 0)),
+                              OCCLUSION_COUNTERS)),
+                self.passTime, self.savedTime)
+
+    def genQuery(self):
+        if not self.freeQueries:
+            self.freeQueries = list(numpy.atleast_1d(gl.glGenQueries(64)))
+        return int(self.freeQueries.pop())
+
+    def readQuery(self, state):
+        """
+        reads the query result of a state if it is available.
+        """
+        query = state.query
+        if not gl.glGetQueryObjectuiv(query, gl.GL_QUERY_RESULT_AVAILABLE):
+            return
+        state.visible = gl.glGetQueryObjectuiv(query, gl.GL_QUERY_RESULT)>0
+        if state.visible:
+            state.nextQueryFrame = self.frame + VISIBLE_QUERY_INTERVAL +\
+                                   random.randint(0, VISIBLE_QUERY_INTERVAL-1)
+        self.freeQueries.append(query)
+        state.query = None
+
+    def readTimers(self):
+        while self.timerQueries:
+            (query, drawnCost, occludedCost) = self.timerQueries[0]
+            if not gl.glGetQueryObjectuiv(query, gl.GL_QUERY_RESULT_AVAILABLE):
+                break
+            # nanoseconds
+            self.passTime = gl.glGetQueryObjectuiv(query, gl.GL_QUERY_RESULT)*1.0e-6
+            # occluded segments would take time like the drawn segments
+            self.savedTime = self.passTime*occludedCost/max(drawnCost, 1)
+            self.freeQueries.append(query)
+            self.timerQueries.pop(0)
+
+    def beginPass(self, pairs):
+        """
+        returns the (model, segment) pairs that should be drawn.
+        must be called before the pairs are drawn, the current
+        model view matrix must be the camera matrix.
+        """
+        self.readTimers()
+        if self.useTimer:
+            query = self.genQuery()
+            gl.glBeginQuery(gl.GL_TIME_ELAPSED, query)
+            self.timerQueries.append( (query, 0, 0) )
+
+        # gl matrices are transposed
+        modelView = numpy.asarray(gl.glGetFloatv(gl.GL_MODELVIEW_MATRIX), 'float32').T
+        eye = numpy.linalg.inv(modelView)[:3,3]
+
+        self.drawQueries = {}
+        self.boxStates = []
+        self.drawnCost = 0
+        self.occludedCost = 0
+        visiblePairs = []
+        for pair in pairs:
+            (model, segment) = pair
+            key = (id(model), id(segment))
+            state = self.states.get(key)
+            if state==None:
+                state = _OcclusionState(model, segment)
+                self.states[key] = state
+            if state.query!=None:
+                self.readQuery(state)
+            if state.frame!=self.frame-1:
+                # segments entering the pass are drawn
+                state.visible = True
+            state.frame = self.frame
+
+            box = state.getBox()
+            if box==None:
+                visiblePairs.append(pair)
+                continue
+            (boxMin, boxMax) = box
+            if (eye>boxMin-NEAR_MARGIN).all() and (eye<boxMax+NEAR_MARGIN).all():
+                # camera inside the box
+                state.visible = True
+                visiblePairs.append(pair)
+                continue
+
+            if state.visible:
+                visiblePairs.append(pair)
+                self.drawnCost += _drawCost(segment)
+                if state.query==None and self.frame>=state.nextQueryFrame:
+                    self.drawQueries[key] = state
+            else:
+                self.occludedCost += _drawCost(segment)
+                self.counters['occluded'] += 1
+                if state.query==None:
+                    self.boxStates.append(state)
+        self.counters['segments'] += len(pairs)
+        return visiblePairs
+
+    def beginDraw(self, model, segment):
+        """
+        starts a query for the draw of a segment if needed.
+        """
+        state = self.drawQueries.get((id(model), id(segment)))
+        if state==None: return
+        state.query = self.genQuery()
+        gl.glBeginQuery(self.samplesTarget, state.query)
+        self.counters['drawQueries'] += 1
+    def endDraw(self, model, segment):
+        if self.drawQueries.get((id(model), id(segment)))==None: return
+        gl.glEndQuery(self.samplesTarget)
+
+    def endPass(self):
+        """
+        queries the boxes of occluded segments, must be called
+        after the visible segments were drawn with the camera matrix loaded.
+        """
+        if self.boxStates:
+            self.drawBoxQueries(self.boxStates)
+            self.counters['boxQueries'] += len(self.boxStates)
+        if self.useTimer:
+            gl.glEndQuery(gl.GL_TIME_ELAPSED)
+            (query, _, _) = self.timerQueries[-1]
+            self.timerQueries[-1] = (query, self.drawnCost, self.occludedCost)
+        self.drawQueries = {}
+        self.boxStates = []
+
+    def drawBoxQueries(self, states):
+        boxMin = numpy.array(map(lambda state: state.box[0], states), 'float32')
+        boxMax = numpy.array(map(lambda state: state.box[1], states), 'float32')
+        vertices = (boxMin[:,None,:] + _BOX_CORNERS[None,:,:]*(boxMax - boxMin)[:,None,:])
+        vertices = numpy.ascontiguousarray(vertices.reshape((-1,3)), 'float32')
+
+        # only depth test the boxes
+        gl.glPushAttrib(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT |
+                        gl.GL_ENABLE_BIT | gl.GL_POLYGON_BIT)
+        gl.glPushClientAttrib(gl.GL_CLIENT_VERTEX_ARRAY_BIT)
+        # the program is not restored by glPopAttrib
+        stateCache.useProgram(0)
+        # states restored by glPopAttrib are set without the cache
+        gl.glColorMask(gl.GL_FALSE, gl.GL_FALSE, gl.GL_FALSE, gl.GL_FALSE)
+        gl.glDepthMask(gl.GL_FALSE)
+        gl.glDisable(gl.GL_CULL_FACE)
+        gl.glDisable(gl.GL_LIGHTING)
+        gl.glDisable(gl.GL_TEXTURE_2D)
+        if vertexArraysSupported():
+            stateCache.bindVertexArray(0)
+        if self.boxBuffer==None:
+            self.boxBuffer = int(gl.glGenBuffers(1))
+        stateCache.bindBuffer(gl.GL_ARRAY_BUFFER, self.boxBuffer)
+        # new storage each pass, the boxes of the last pass may still be in use
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, vertices.nbytes,
+                        ArrayDatatype.voidDataPointer(vertices), gl.GL_STREAM_DRAW)
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        glVertexPointerRAW(3, gl.GL_FLOAT, 0, None)
+        numCorners = len(_BOX_CORNERS)
+        for i in range(len(states)):
+            query = self.genQuery()
+            gl.glBeginQuery(self.samplesTarget, query)
+            gl.glDrawArrays(gl.GL_QUADS, i*numCorners, numCorners)
+            gl.glEndQuery(self.samplesTarget)
+            states[i].query = query
+        gl.glPopClientAttrib()
+        gl.glPopAttrib()
+        # the buffer binding was restored by glPopClientAttrib
+        stateCache.forgetBuffer(gl.GL_ARRAY_BUFFER)
+        stateCache.bindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    def clear(self):
+        """
+        forgets the segment states, must be called if segments were removed.
+        """
+        for state in self.states.values():
+            if state.query!=None:
+                self.freeQueries.append(state.query)
+        self.states = {}
+
+    def delete(self):
+        self.clear()
+        if self.freeQueries:
+            gl.glDeleteQueries(len(self.freeQueries), self.freeQueries)
+            self.freeQueries = []
+        if self.boxBuffer!=None:
+            gl.glDeleteBuffers(1, [self.boxBuffer])
+            self.boxBuffer = None
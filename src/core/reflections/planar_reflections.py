@@ -19,7 +19,7 @@ from numpy import ndarray, array, identity, outer, vdot, float32
 from utils.algebra.vector import crossVec3Float32Normalized
 from utils.algebra.matrix44 import inverseCContiguous
 
-from core.fbo import FBO
+from core.gl_state_cache import stateCache
 from core.textures.texture import DepthTexture2D, Texture2D
 
 from shader.shader_utils import FragShaderFunc,\
@@ -65,25 +65,25 @@ class PlanarReflection(object):
     
     def _setupReflectionPass(self):
         """
-        prepends a rendering pass each frame,
-        rendering the reflected scene to fbo.
+        adds a rendering pass to the frame graph,
+        rendering the reflected scene to the reflection texture
+        read by the scene pass.
         """
         # get configurable map size
         w, h = self.segment.getAttr("reflectionMapSize", (512,512))
         self.reflectionColor = Texture2D(width=w, height=h)
         self.reflectionColor.create()
-        reflectionDepth = DepthTexture2D(width=w, height=h)
-        reflectionDepth.create()
-        
-        reflectionFBO = FBO()
-        reflectionFBO.addColorTexture(self.reflectionColor)
-        reflectionFBO.setDepthTexture(reflectionDepth)
-        reflectionFBO.create()
         
+        name = "reflection %s" % self.segment.segmentID
+        graph = self.app.frameGraph
+        color = graph.importTexture(name + " color", self.reflectionColor)
+        # the depth is only used while drawing the reflection,
+        # reflections with the same size share the depth texture.
+        depth = graph.createTexture(name + " depth", DepthTexture2D, w, h)
         # draw the reflected scene with same camera as scene
-        self.app.prependFBO(reflectionFBO,
-                            self._drawReflectedScene,
-                            self.app.sceneCamera)
+        graph.addPass(name, self._drawReflectedScene, self.app.sceneCamera,
+                      colors=[color], depth=depth, prepend=True)
+        graph.addReads('scene', [color])
     
     def _calcSceneReflectionMatrix(self):
         """
@@ -109,7 +109,7 @@ class PlanarReflection(object):
         #   the reflector could show shadows not visible in depth maps.
         gl.glMatrixMode(gl.GL_TEXTURE)
         for texMatUnit in self.shadowMatrixUnits:
-            gl.glActiveTexture(gl.GL_TEXTURE0 + texMatUnit)
+            stateCache.activeTexture(texMatUnit)
             gl.glPushMatrix()
             # TODO: mv * r^-1 * mv^-1 can be precalculated -> event handler
             gl.glMultMatrixf( self.app.sceneCamera.modelViewMatrix )
@@ -119,10 +119,10 @@ class PlanarReflection(object):
         
         # clip away everything below the plane
         gl.glClipPlane(gl.GL_CLIP_PLANE0, self.clipPlane)
-        gl.glEnable(gl.GL_CLIP_PLANE0)
+        stateCache.enable(gl.GL_CLIP_PLANE0)
         
         # switch culling (since we scaled by -1)
-        gl.glCullFace(gl.GL_FRONT)
+        stateCache.cullFace(gl.GL_FRONT)
         
         # TODO: recursive reflections ?
         #         at least if we see a reflector 'r'
@@ -130,17 +130,17 @@ class PlanarReflection(object):
         #         should allready have reflectionsapplied to it.
         #         there is also the rare case two reflectors reflect each other (maybe infinite),
         self.segment.hidden = True
-        self.app.drawSceneComplete()
+        self.app.drawSceneComplete('reflection')
         self.segment.hidden = False
         
         # switch back some states
-        gl.glDisable(gl.GL_CLIP_PLANE0)
-        gl.glCullFace(gl.GL_BACK)
+        stateCache.disable(gl.GL_CLIP_PLANE0)
+        stateCache.cullFace(gl.GL_BACK)
         
         # reset texture matrices for other passes
         gl.glMatrixMode(gl.GL_TEXTURE)
         for texMatUnit in self.shadowMatrixUnits:
-            gl.glActiveTexture(gl.GL_TEXTURE0 + texMatUnit)
+            stateCache.activeTexture(texMatUnit)
             gl.glPopMatrix()
         gl.glMatrixMode(gl.GL_MODELVIEW)
         
@@ -0,0 +1,197 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+
+# bits of each part of the sort key
+_KEY_BITS = 16
+
+# names of the state changes counted by the render queue
+RENDER_COUNTERS = ['draws', 'models', 'programs', 'textureSets', 'materials', 'vertexBuffers']
+
+def runCommands(commands):
+    """
+    calls the (function, arguments) pairs of a command list.
+    """
+    for (func, args) in commands:
+        func(*args)
+
+class RenderQueue(object):
+    """
+    draws the segments of many models sorted by the states they need.
+    segments are sorted by pass, shader program, material,
+    texture set and vertex buffer, states are only changed
+    if the next segment needs other states.
+    """
+    def __init__(self):
+        # small numbers for objects used in the sort key
+        self.keyIndexes = {}
+        # state changes in the current frame
+        self.counters = {}
+        # state changes in the last frame
+        self.frameCounters = {}
+        self.nextFrame()
+
+    def nextFrame(self):
+        """
+        starts counting state changes for a new frame.
+        """
+        self.frameCounters = self.counters
+        self.counters = {}
+        for name in RENDER_COUNTERS:
+            self.counters[name] = 0
+
+    def report(self):
+        """
+        returns the state changes of the last frame as string.
+        """
+        return ", ".join(map(lambda name: "%s %d" % (name, self.frameCounters.get(name, 0)),
+                             RENDER_COUNTERS))
+
+    def keyIndex(self, obj):
+        if obj==None: return 0
+        try:
+            return self.keyIndexes[id(obj)]
+        except KeyError:
+            index = len(self.keyIndexes) + 1
+            self.keyIndexes[id(obj)] = index
+            return index
+
+    def sortKey(self, segment):
+        """
+        returns the packed sort key of a segment.
+        """
+        vbo = getattr(segment, 'staticVBO', None)
+        # segments in the same arena buffer share the vertex buffer
+        vbo = getattr(vbo, 'buffer', vbo)
+        key = (segment.renderPass << _KEY_BITS) | (segment.shaderProgram + 1)
+        for obj in [segment.material,
+                    segment.shader,
+                    vbo]:
+            key = (key << _KEY_BITS) | self.keyIndex(obj)
+        return key
+
+    def draw(self, app, models, passName='scene'):
+        """
+        draws the visible segments of the models.
+        segments outside the view frustum are skipped
+        if the app has a frustum culler, occluded segments
+        are skipped if the app has an occlusion culler for the pass.
+        """
+        (commands, _) = self.compile(app, models, passName)
+        runCommands(commands)
+
+    def compile(self, app, models, passName='scene'):
+        """
+        returns the gl calls drawing the visible segments of the models
+        as flat list of (function, arguments) and True if the list
+        can be drawn again while the scene and the camera do not change.
+        the list must be drawn before other lists of the pass are compiled.
+        """
+        pairs = []
+        for model in models:
+            for segment in model.queueSegments(app):
+                pairs.append( (model, segment) )
+        # bounds of moving segments change each frame
+        compilable = True
+        for (model, segment) in pairs:
+            if model.hasDynamicTransformation() or segment.hasDynamicTransformation():
+                compilable = False
+                break
+        culler = getattr(app, 'frustumCuller', None)
+        if culler!=None:
+            pairs = culler.cull(pairs, passName)
+        occlusion = getattr(app, 'occlusionCuller', None)
+        if occlusion!=None and occlusion.passName!=passName:
+            occlusion = None
+        if occlusion!=None:
+            # query results change each frame
+            compilable = False
+            pairs = occlusion.beginPass(pairs)
+        items = map(lambda (model, segment):
+                        (self.sortKey(segment), model, segment), pairs)
+        # sort is stable, segments with equal keys keep their order
+        items.sort(key=lambda item: item[0])
+
+        commands = []
+        add = commands.append
+        counters = self.counters
+        currentModel = None
+        currentShader = None
+        currentProgram = None
+        currentMaterial = None
+        currentVBO = None
+        for (key, model, segment) in items:
+            if model is not currentModel:
+                if currentModel!=None:
+                    add( (currentModel.disableStates, ()) )
+                    if currentModel.popTransformations:
+                        add( (gl.glPopMatrix, ()) )
+                if model.popTransformations:
+                    add( (gl.glPushMatrix, ()) )
+                add( (model.enableStates, ()) )
+                currentModel = model
+                counters['models'] += 1
+
+            if segment.shader is not currentShader:
+                if currentShader!=None:
+                    add( (currentShader.disable, ()) )
+                add( (segment.shader.enable, ()) )
+                currentShader = segment.shader
+                counters['textureSets'] += 1
+                if segment.shaderProgram!=currentProgram:
+                    currentProgram = segment.shaderProgram
+                    counters['programs'] += 1
+
+            if segment.material is not currentMaterial:
+                if currentMaterial!=None:
+                    add( (currentMaterial.disableStates, ()) )
+                if segment.material!=None:
+                    add( (segment.material.enableStates, ()) )
+                currentMaterial = segment.material
+                counters['materials'] += 1
+
+            vbo = key & ((1 << _KEY_BITS) - 1)
+            if vbo!=currentVBO:
+                currentVBO = vbo
+                counters['vertexBuffers'] += 1
+
+            if occlusion!=None:
+                add( (occlusion.beginDraw, (model, segment)) )
+            if segment.popTransformations:
+                add( (gl.glPushMatrix, ()) )
+                add( (segment.enableSegmentStates, ()) )
+                # light position must be transformed too
+                for l in model.lights:
+                    add( (l.enableLightPosition, ()) )
+                add( (segment.drawSegment, ()) )
+                add( (segment.disableSegmentStates, ()) )
+                add( (gl.glPopMatrix, ()) )
+                # light position must be transformed back
+                for l in model.lights:
+                    add( (l.disableLightPosition, ()) )
+            else:
+                add( (segment.enableSegmentStates, ()) )
+                add( (segment.drawSegment, ()) )
+                add( (segment.disableSegmentStates, ()) )
+            if occlusion!=None:
+                add( (occlusion.endDraw, (model, segment)) )
+            counters['draws'] += 1
+
+        if currentMaterial!=None:
+            add( (currentMaterial.disableStates, ()) )
+        if currentShader!=None:
+            add( (currentShader.disable, ()) )
+        if currentModel!=None:
+            add( (currentModel.disableStates, ()) )
+            if currentModel.popTransformations:
+                add( (gl.glPopMatrix, ()) )
+        if occlusion!=None:
+            add( (occlusion.endPass, ()) )
+        return (commands, compilable)
@@ -0,0 +1,213 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+import numpy
+
+from utils.algebra.bvh import buildBVH, refitBVH,\
+                              frustumQueryBVH, rayQueryBVH, overlapQueryBVH
+
+from core.frustum_culling import worldBounds
+
+def _primitivesBox(boxMin, boxMax, primitives):
+    """
+    returns the (min, max) box around the boxes of the primitives,
+    None if there are no primitives.
+    """
+    if len(primitives)==0:
+        return None
+    return (boxMin[primitives].min(axis=0), boxMax[primitives].max(axis=0))
+
+def _joinBoxes(box0, box1):
+    if box0 is None: return box1
+    if box1 is None: return box0
+    return (numpy.minimum(box0[0], box1[0]), numpy.maximum(box0[1], box1[1]))
+
+def _sameBoxes(box0, box1):
+    if box0 is None or box1 is None:
+        return box0 is box1
+    return (box0[0]==box1[0]).all() and (box0[1]==box1[1]).all()
+
+class SceneBVH(object):
+    """
+    bounding volume hierarchy over the world space boxes
+    of the segments of all models.
+    the hierarchy is built again if segments are added or removed,
+    boxes of segments with dynamic transformations are refitted each update.
+    the boxes around all segments and around the segments casting
+    shadows are kept for cropping shadow maps.
+    """
+    def __init__(self):
+        # all (model, segment) pairs of the scene
+        self.pairs = []
+        # index of each pair in self.pairs
+        self.pairIndexes = {}
+        # pair index of each primitive in the hierarchy,
+        # segments without bounds are not in the hierarchy.
+        self.primitivePairs = numpy.zeros(0, 'int32')
+        self.boxMin = numpy.zeros((0,3), 'float32')
+        self.boxMax = numpy.zeros((0,3), 'float32')
+        # primitives with bounds that may change each frame
+        self.dynamicPrimitives = []
+        # dynamic primitives of segments casting shadows
+        self.dynamicCasters = []
+        self.tree = buildBVH(self.boxMin, self.boxMax)
+
+        # boxes around all primitives and around the primitives
+        # of segments casting shadows, None if there are none.
+        self.sceneBox = None
+        self.casterBox = None
+        # boxes around the static primitives
+        self.staticSceneBox = None
+        self.staticCasterBox = None
+        # increased each time the scene or caster box changes
+        self.boundsVersion = 0
+
+        self.needsRebuild = True
+        # increased each time the hierarchy is built
+        self.version = 0
+
+    def invalidate(self):
+        """
+        the hierarchy is built again with the next update.
+        """
+        self.needsRebuild = True
+
+    def update(self, models):
+        """
+        builds the hierarchy if needed, else refits moving segments.
+        """
+        if self.needsRebuild:
+            self.build(models)
+        elif self.dynamicPrimitives:
+            for i in self.dynamicPrimitives:
+                self.updateBox(i)
+            refitBVH(*(self.tree + (self.boxMin, self.boxMax)))
+            self.updateBounds()
+
+    def build(self, models):
+        pairs = []
+        for model in models:
+            for segment in model.segments:
+                pairs.append( (model, segment) )
+        self.pairs = pairs
+        self.pairIndexes = {}
+        for i in range(len(pairs)):
+            (model, segment) = pairs[i]
+            self.pairIndexes[(id(model), id(segment))] = i
+
+        primitivePairs = []
+        boxMin = []
+        boxMax = []
+        self.dynamicPrimitives = []
+        self.dynamicCasters = []
+        staticPrimitives = []
+        staticCasters = []
+        for i in range(len(pairs)):
+            (model, segment) = pairs[i]
+            bounds = worldBounds(model, segment)
+            if bounds==None: continue
+            (center, _, extents) = bounds
+            primitive = len(primitivePairs)
+            if model.hasDynamicTransformation() or segment.hasDynamicTransformation():
+                self.dynamicPrimitives.append(primitive)
+                if segment.castsShadows: self.dynamicCasters.append(primitive)
+            else:
+                staticPrimitives.append(primitive)
+                if segment.castsShadows: staticCasters.append(primitive)
+            primitivePairs.append(i)
+            boxMin.append(center - extents)
+            boxMax.append(center + extents)
+        self.primitivePairs = numpy.array(primitivePairs, 'int32')
+        self.boxMin = numpy.array(boxMin, 'float32').reshape((-1,3))
+        self.boxMax = numpy.array(boxMax, 'float32').reshape((-1,3))
+
+        self.tree = buildBVH(self.boxMin, self.boxMax)
+        self.needsRebuild = False
+        self.version += 1
+
+        # only the dynamic primitives are joined again after refitting
+        self.staticSceneBox = _primitivesBox(self.boxMin, self.boxMax, staticPrimitives)
+        self.staticCasterBox = _primitivesBox(self.boxMin, self.boxMax, staticCasters)
+        self.updateBounds()
+
+    def updateBounds(self):
+        """
+        joins the static boxes with the boxes of the dynamic primitives.
+        """
+        sceneBox = _joinBoxes(self.staticSceneBox,
+                _primitivesBox(self.boxMin, self.boxMax, self.dynamicPrimitives))
+        casterBox = _joinBoxes(self.staticCasterBox,
+                _primitivesBox(self.boxMin, self.boxMax, self.dynamicCasters))
+        if _sameBoxes(sceneBox, self.sceneBox) and _sameBoxes(casterBox, self.casterBox):
+            return
+        self.sceneBox = sceneBox
+        self.casterBox = casterBox
+        self.boundsVersion += 1
+
+    def updateBox(self, primitive):
+        (model, segment) = self.pairs[self.primitivePairs[primitive]]
+        (center, _, extents) = worldBounds(model, segment)
+        self.boxMin[primitive] = center - extents
+        self.boxMax[primitive] = center + extents
+
+    def indexOf(self, pair):
+        """
+        returns the index of a (model, segment) pair or -1
+        if the segment is not known by the hierarchy.
+        """
+        (model, segment) = pair
+        return self.pairIndexes.get((id(model), id(segment)), -1)
+
+    def _pairs(self, primitives):
+        return map(lambda i: self.pairs[self.primitivePairs[i]], primitives)
+
+    def frustumMask(self, planes):
+        """
+        returns 1 for each pair with a box intersecting the frustum planes,
+        segments without bounds are always visible.
+        """
+        mask = numpy.ones(len(self.pairs), 'uint8')
+        mask[self.primitivePairs] = frustumQueryBVH(planes,
+                *(self.tree + (self.boxMin, self.boxMax)))
+        return mask
+
+    def frustumQuery(self, planes):
+        """
+        returns the pairs with boxes intersecting the frustum planes.
+        """
+        return map(self.pairs.__getitem__, numpy.flatnonzero(self.frustumMask(planes)))
+
+    def rayQuery(self, origin, direction, maxDistance=1.0e30):
+        """
+        returns (distance, model, segment) for each segment box hit
+        by the ray, sorted by the distance.
+        """
+        (primitives, distances) = rayQueryBVH(
+                numpy.asarray(origin, 'float32')[:3],
+                numpy.asarray(direction, 'float32')[:3],
+                maxDistance, *(self.tree + (self.boxMin, self.boxMax)))
+        hits = map(lambda (distance, (model, segment)): (distance, model, segment),
+                   zip(distances, self._pairs(primitives)))
+        hits.sort(key=lambda hit: hit[0])
+        return hits
+
+    def sphereQuery(self, center, radius):
+        """
+        returns the pairs with boxes overlapping the sphere.
+        """
+        center = numpy.asarray(center, 'float32')[:3]
+        return self._pairs(overlapQueryBVH(center, center, radius,
+                *(self.tree + (self.boxMin, self.boxMax))))
+
+    def boxQuery(self, boxMin, boxMax):
+        """
+        returns the pairs with boxes overlapping the box.
+        """
+        return self._pairs(overlapQueryBVH(
+                numpy.asarray(boxMin, 'float32')[:3],
+                numpy.asarray(boxMax, 'float32')[:3], -1.0,
+                *(self.tree + (self.boxMin, self.boxMax))))
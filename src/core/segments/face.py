@@ -6,6 +6,33 @@ Created on 01.07.2010
 '''
 from utils.algebra.vector import almostEqual, crossVec3Float32
 
+import numpy
+
+def faceIndexArrays(faces):
+    """
+    returns the indexes of all faces as flat array and
+    the number of indexes of each face.
+    """
+    faceLengths = numpy.array(map(lambda f: len(f.indexes), faces), 'int32')
+    if len(faceLengths)==0:
+        return (numpy.zeros(0, 'int64'), faceLengths)
+    indexes = numpy.concatenate(map(lambda f: f.indexes, faces)).astype('int64')
+    return (indexes, faceLengths)
+
+def faceCornerNeighbors(faceLengths):
+    """
+    returns the first corner of each face and the previous and
+    next corner in the same face for the flat index array of faces.
+    """
+    ends = numpy.cumsum(faceLengths)
+    starts = ends - faceLengths
+    corners = numpy.arange(faceLengths.sum())
+    nextCorners = corners+1
+    nextCorners[ends-1] = starts
+    prevCorners = corners-1
+    prevCorners[starts] = ends-1
+    return (starts, prevCorners, nextCorners)
+
 class VArrayFace(object):
     def __init__(self, params):
         # indexes of vertexes in array
@@ -78,19 +105,23 @@ class VArrayFace(object):
             
             for i in range(len(indexes)):
                 j = indexes[i]
-                for k in self.indexes:
-                    if k==j: break
+                # lookup position of the vertex in this face
+                for k in range(len(self.indexes)):
+                    if self.indexes[k]==j: break
                 
                 # set params
-                if bool(self.uv):
-                    if not bool(uv): uv = [None]*numIndexes
-                    uv[i] = self.uv[j]
-                if bool(self.col):
-                    if not bool(col): col = [None]*numIndexes
-                    col[i] = self.col[j]
-                if bool(self.nor):
-                    if not bool(nor): nor = [None]*numIndexes
-                    nor[i] = self.nor[j]
+                if self.uv is not None:
+                    if uv==None: uv = [None]*numIndexes
+                    uv[i] = self.uv[k]
+                if self.colors is not None:
+                    if col==None: col = [None]*numIndexes
+                    col[i] = self.colors[k]
+                if self.normals is not None:
+                    if nor==None: nor = [None]*numIndexes
+                    nor[i] = self.normals[k]
+            params['uv'] = uv
+            params['col'] = col
+            params['nor'] = nor
             
             face = VArrayFace(params)
             groupFaces.append(face)
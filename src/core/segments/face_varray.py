@@ -5,10 +5,46 @@ Created on 18.07.2010
 @author: Daniel Beßler <daniel@orgizm.net>
 '''
 
-from utils.util import listGet
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+
 from core.gl_vertex_attribute import uvAttribute, colorAttribute, normalAttribute
 from core.segments.vbo_segment import VBOSegment
-from utils.algebra.vector import almostEqual
+from core.segments.face import faceIndexArrays
+from core.segments.normal_generator import NORMAL_WEIGHTING_AREA
+from core.segments.vertex_cache import VERTEX_CACHE_SIZE, optimizeTriangleOrder
+from core.segments.mesh_simplify import simplifyTriangles
+
+import numpy
+
+# per face corner data is compared with this precision
+_CORNER_PRECISION = 1.0e6
+
+# default number of simplified levels of detail per segment
+LOD_LEVELS = 3
+# segments with less triangles are not simplified
+LOD_MIN_TRIANGLES = 64
+
+def _splitCorners(data, faceLengths):
+    """
+    splits a per face corner array into views for each face.
+    """
+    if len(faceLengths)==0:
+        return []
+    return numpy.split(data, numpy.cumsum(faceLengths)[:-1])
+
+def _faceCornerData(faces, faceLengths, name, size):
+    """
+    returns per face corner data of all faces as (numCorners, size) array
+    and a flag for each corner telling if the face has the data set.
+    """
+    hasFaceData = numpy.array(map(lambda f: getattr(f, name) is not None, faces), bool)
+    hasData = numpy.repeat(hasFaceData, faceLengths)
+    data = numpy.zeros((len(hasData), size), 'float32')
+    faceData = [getattr(f, name) for f in faces if getattr(f, name) is not None]
+    data[hasData] = numpy.concatenate(faceData).reshape((-1, size))
+    return (data, hasData)
 
 class FaceVArray(VBOSegment):
     """
@@ -18,8 +54,29 @@ class FaceVArray(VBOSegment):
     def __init__(self, name, params):
         # list of segment faces
         (self.faces, self.faceType, self.numFaceVertices) = params['faces']
+        # weighting of face normals used for generated normals
+        self.normalWeighting = params.get('normalWeighting', NORMAL_WEIGHTING_AREA)
+        # flat index array of all faces and the number of indexes per face
+        self.faceIndexes = params.get('faceIndexes')
+        # number of entries in the post transform vertex cache,
+        # index order is optimized for it if the segment supports it.
+        self.vertexCacheSize = params.get('vertexCacheSize', VERTEX_CACHE_SIZE)
+        # average cache miss ratio before and after optimizing the index order
+        self.acmr = None
+        # number of simplified levels of detail generated for the segment
+        self.lodLevels = params.get('lodLevels', LOD_LEVELS)
         
         VBOSegment.__init__(self, name, params)
+        
+        # triangle index arrays of the levels of detail and
+        # the geometric error of each level in object space
+        lodIndexes = params.get('lodIndexes')
+        if lodIndexes is not None:
+            self.lodIndexes = _splitCorners(lodIndexes, params['lodLengths'])
+            self.lodErrors = list(params['lodErrors'])
+        else:
+            self.lodIndexes = []
+            self.lodErrors = []
     
     def createResources(self):
         """
@@ -41,86 +98,75 @@ class FaceVArray(VBOSegment):
         depending on the per face data.
         """
         
-        VBOSegment.createResourcesPost(self)
+        if self.isCachedGeometry:
+            # cached vertex data was split before
+            VBOSegment.createResourcesPost(self)
+            return
+        
+        (corners, faceLengths) = self.getFaceIndexArrays()
         
-        faceCol = self.hasFaceCol()
-        faceUV  = self.hasFaceUV()
-        faceNor = self.hasFaceNor()
+        # per face corner data (normals, uv, colors) set on any face
+        faceAttributes = []
+        if self.hasFaceNor():
+            faceAttributes.append( ('normals', 3) )
+        if self.hasFaceUV():
+            faceAttributes.append( ('uv', 2) )
+        if self.hasFaceCol():
+            faceAttributes.append( ('colors', 4) )
         
-        groupIndexes = []
-        if faceNor:
-            groupNormals = [None]*self.numVertices
-        if faceUV:
-            groupUV = [None]*self.numVertices
-        if faceCol:
-            groupColors = [None]*self.numVertices
+        # each face corner gets a key of the vertex index and the quantized
+        # per face data, corners with equal keys share one vertex.
+        keys = [corners[:,numpy.newaxis]]
+        cornerData = []
+        for (name, size) in faceAttributes:
+            (data, hasData) = _faceCornerData(self.faces, faceLengths, name, size)
+            cornerData.append(data)
+            keys.append(hasData[:,numpy.newaxis].astype('int64'))
+            keys.append(numpy.rint(data*_CORNER_PRECISION).astype('int64'))
+        keys = numpy.ascontiguousarray(numpy.hstack(keys))
+        keys = keys.view(numpy.dtype((numpy.void, keys.dtype.itemsize*keys.shape[1]))).ravel()
+        (_, firstCorners, cornerKeys) = numpy.unique(keys, return_index=True, return_inverse=True)
         
-        # remember processed vertices and per face data
-        processedVertices = {}
+        # keys in order of their first occurrence, the first key of a vertex
+        # keeps the vertex index, the others are appended to the vertex list.
+        keyOrder = numpy.argsort(firstCorners)
+        keyVertices = corners[firstCorners[keyOrder]]
+        isFirstKey = numpy.zeros(len(keyOrder), bool)
+        isFirstKey[numpy.unique(keyVertices, return_index=True)[1]] = True
+        duplicatedVertices = keyVertices[~isFirstKey]
         
-        for f in self.faces:
-            for i in range(len(f.indexes)):
-                # get the index to per vertex lists
-                j = f.indexes[i]
-                
-                # vertex index processed before?
-                data = processedVertices.get(j)
-                if data==None:
-                    # if not set the data
-                    processedVertices[j] = [(listGet(f.normals, i),
-                                             listGet(f.uv, i),
-                                             listGet(f.colors, i))]
-                    if faceNor:
-                        groupNormals[j] = f.normals[i]
-                    if faceUV:
-                        groupUV[j] = f.uv[i]
-                    if faceCol:
-                        groupColors[j] = f.colors[i]
+        keyIndexes = numpy.empty(len(keyOrder), 'int64')
+        keyIndexes[keyOrder[isFirstKey]] = keyVertices[isFirstKey]
+        keyIndexes[keyOrder[~isFirstKey]] = self.numVertices + numpy.arange(len(duplicatedVertices))
+        
+        # let the class hierarchy push back the vertex attributes.
+        # for example a class may want to add a tangent now to the end of
+        # its tangent list.
+        self.duplicatePerVertexAttributes(duplicatedVertices)
+        
+        indexes = keyIndexes[cornerKeys]
+        self.setFaceIndexes(indexes, faceLengths)
+        
+        # per face data is per vertex data now
+        for i in range(len(faceAttributes)):
+            (name, size) = faceAttributes[i]
+            data = numpy.zeros((self.numVertices, size), 'float32')
+            data[keyIndexes] = cornerData[i][firstCorners]
+            if name == 'normals':
+                if bool(self.normals):
+                    self.normals.data = data
                 else:
-                    # if this vertex index was processed before,
-                    # check if per face data equals,
-                    # else we need to add this vertex to the list.
-                    # the vertex data will then be multiple times in the list.
-                    (n0,u0,c0) = (listGet(f.normals, i),
-                                  listGet(f.uv, i),
-                                  listGet(f.colors, i))
-                    
-                    # check if face vertex equals saved vertex
-                    isEqualVertex = True
-                    for d in data:
-                        (n1,u1,c1) = d
-                        if almostEqual(n0,n1) and almostEqual(u0,u1) and almostEqual(c0,c1):
-                            # if per face data is equal, do nothing
-                            pass
-                        else:
-                            isEqualVertex = False
-                            break
-                    
-                    if not isEqualVertex:
-                        # let the class hierarchy push back one vertex attribute.
-                        # for example a class may want to add a tangent now to the end of
-                        # its tangent list.
-                        self.duplicatePerVertexAttribute(j)
-                        # face vertex index changed.
-                        f.indexes[i] = self.numVertices-1
-                        # remember this vertex.
-                        processedVertices[j].append( (n0,u0,c0) )
-                        if faceNor:
-                            groupNormals.append( f.normals[i] )
-                        if faceUV:
-                            groupUV.append( f.uv[i] )
-                        if faceCol:
-                            groupColors.append( f.colors[i] )
-            
-            groupIndexes += list(f.indexes)
-        
-        self.indexes = groupIndexes
-        if faceNor:
-            self.normals.data = groupNormals
-        if faceUV:
-            self.uvs = uvAttribute(groupUV)
-        if faceCol:
-            self.colors = colorAttribute(groupColors)
+                    self.normals = normalAttribute(data)
+            elif name == 'uv':
+                self.uvs = uvAttribute(data)
+            else:
+                self.colors = colorAttribute(data)
+        
+        self.optimizeIndexes()
+        self.generateLODs()
+        
+        # index type depends on the number of vertices after the split
+        VBOSegment.createResourcesPost(self)
     
     def addShaderAttributes(self, shaderFunc):
         VBOSegment.addShaderAttributes(self, shaderFunc)
@@ -131,6 +177,104 @@ class FaceVArray(VBOSegment):
         if self.hasFaceNor():
             shaderFunc.addAttribute(type="vec3", name="vertexNormal")
     
+    def optimizeIndexes(self):
+        """
+        reorders faces and vertices for the post transform vertex cache.
+        faces are not reordered by default.
+        """
+        pass
+    
+    def generateLODs(self):
+        """
+        simplifies the triangles of the segment for each level of detail.
+        levels reference the vertices of the full resolution segment.
+        """
+        if self.lodLevels <= 0:
+            return
+        (indexes, faceLengths) = self.getFaceIndexArrays()
+        if self.faceType == gl.GL_TRIANGLES and (faceLengths==3).all():
+            triangles = indexes
+        elif self.faceType == gl.GL_QUADS and (faceLengths==4).all():
+            quads = indexes.reshape((-1, 4))
+            triangles = numpy.hstack((quads[:,[0,1,2]], quads[:,[0,2,3]])).ravel()
+        else:
+            # strips, fans and polygons are drawn at full resolution
+            return
+        numTriangles = len(triangles)/3
+        if numTriangles < LOD_MIN_TRIANGLES:
+            return
+        
+        # split vertices are collapsed into the copy with similar attributes
+        attributes = []
+        for attribute in [self.normals, self.uvs, self.colors]:
+            if bool(attribute):
+                attributes.append(numpy.asarray(attribute.data, 'float64'))
+        if attributes:
+            attributes = numpy.hstack(attributes)
+        else:
+            attributes = None
+        targets = map(lambda i: numTriangles >> (i+1), range(self.lodLevels))
+        levels = simplifyTriangles(self.vertices.data, triangles, targets, attributes)
+        
+        self.lodIndexes = []
+        self.lodErrors = []
+        for (lodIndexes, error) in levels:
+            if self.vertexCacheSize > 0:
+                order = optimizeTriangleOrder(lodIndexes, self.numVertices, self.vertexCacheSize)
+                lodIndexes = lodIndexes.reshape((-1, 3))[order].ravel()
+            self.lodIndexes.append(lodIndexes)
+            self.lodErrors.append(error)
+    
+    def getGeometry(self):
+        geometry = VBOSegment.getGeometry(self)
+        if self.lodIndexes:
+            geometry['lodIndexes'] = numpy.concatenate(self.lodIndexes).astype('uint32')
+            geometry['lodLengths'] = numpy.array(map(len, self.lodIndexes), 'int64')
+            geometry['lodErrors'] = numpy.array(self.lodErrors, 'float32')
+        return geometry
+    
+    def reorderFaces(self, order):
+        """
+        reorders the faces, face i is the old face at @order[i].
+        """
+        (indexes, faceLengths) = self.getFaceIndexArrays()
+        starts = numpy.cumsum(faceLengths) - faceLengths
+        newFaceLengths = faceLengths[order]
+        newStarts = numpy.cumsum(newFaceLengths) - newFaceLengths
+        corners = numpy.repeat(starts[order] - newStarts, newFaceLengths) + \
+                  numpy.arange(len(indexes))
+        self.faces = map(lambda i: self.faces[i], order)
+        self.setFaceIndexes(indexes[corners], newFaceLengths)
+    
+    def reorderVertices(self, order):
+        """
+        reorders the vertex list, vertex i is the old vertex at @order[i].
+        the face indexes are remapped to the new vertex order.
+        """
+        newIndexes = self.reorderPerVertexAttributes(order)
+        (indexes, faceLengths) = self.getFaceIndexArrays()
+        self.setFaceIndexes(newIndexes[indexes], faceLengths)
+    
+    def setFaceIndexes(self, indexes, faceLengths):
+        """
+        sets the flat index array of all faces.
+        """
+        faceIndexes = _splitCorners(indexes, faceLengths)
+        for i in range(len(self.faces)):
+            self.faces[i].indexes = faceIndexes[i]
+        self.faceIndexes = (indexes, faceLengths)
+        self.indexes = indexes
+    
+    def getFaceIndexArrays(self):
+        """
+        returns the indexes of all faces as flat array and
+        the number of indexes of each face.
+        """
+        if self.faceIndexes==None:
+            self.faceIndexes = faceIndexArrays(self.faces)
+        (indexes, faceLengths) = self.faceIndexes
+        return (numpy.asarray(indexes, 'int64'), numpy.asarray(faceLengths, 'int32'))
+    
     def updateNormalsArray(self):
         if bool(self.normals):
             self.normals.data = self.generateNormals()
@@ -147,7 +291,7 @@ class FaceVArray(VBOSegment):
         per face color used?
         """
         for f in self.faces:
-            if bool(f.colors):
+            if f.colors is not None:
                 return True
         return False
     def hasCol(self):
@@ -158,7 +302,7 @@ class FaceVArray(VBOSegment):
         per face uv used?
         """
         for f in self.faces:
-            if bool(f.uv):
+            if f.uv is not None:
                 return True
         return False
     def hasFaceNor(self):
@@ -166,6 +310,6 @@ class FaceVArray(VBOSegment):
         per face normal used?
         """
         for f in self.faces:
-            if bool(f.normals):
+            if f.normals is not None:
                 return True
         return False
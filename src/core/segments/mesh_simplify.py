@@ -0,0 +1,256 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+"""
+mesh simplification with the quadric error metric.
+vertices are collapsed into one of their neighbors (half edge collapse),
+so simplified index arrays reference the vertices of the full mesh.
+@see: http://mgarland.org/files/papers/quadrics.pdf
+"""
+
+import heapq
+
+import numpy
+
+# weight of the planes keeping boundary edges in place
+BOUNDARY_WEIGHT = 100.0
+# collapses may not rotate face normals more then this (cosine)
+MIN_NORMAL_COS = 0.2
+
+def _planeQuadrics(planes, weights):
+    """
+    returns the 10 unique coefficients of the weighted
+    quadric a*a, a*b, a*c, a*d, b*b, b*c, b*d, c*c, c*d, d*d
+    of each plane (a,b,c,d).
+    """
+    (a, b, c, d) = (planes[:,0], planes[:,1], planes[:,2], planes[:,3])
+    return numpy.column_stack((a*a, a*b, a*c, a*d, b*b, b*c, b*d, c*c, c*d, d*d)) * \
+           weights[:,numpy.newaxis]
+
+def _sumVertexQuadrics(corners, quadrics, numVertices):
+    vertexQuadrics = numpy.empty((numVertices, 10))
+    for k in range(10):
+        vertexQuadrics[:,k] = numpy.bincount(corners, quadrics[:,k], numVertices)
+    return vertexQuadrics
+
+def _vertexQuadrics(positions, triangles):
+    """
+    returns the area weighted quadrics of the face planes around
+    each vertex, the area sums and the quadrics of the boundary edges.
+    """
+    numVertices = len(positions)
+    (p0, p1, p2) = (positions[triangles[:,0]], positions[triangles[:,1]], positions[triangles[:,2]])
+    normals = numpy.cross(p1 - p0, p2 - p0)
+    areas = numpy.sqrt((normals*normals).sum(axis=1))
+    normals /= numpy.maximum(areas, 1e-20)[:,numpy.newaxis]
+    areas *= 0.5
+    planes = numpy.column_stack((normals, -(normals*p0).sum(axis=1)))
+    corners = triangles.T.ravel()
+    faceQuadrics = _sumVertexQuadrics(corners,
+        numpy.tile(_planeQuadrics(planes, areas), (3, 1)), numVertices)
+    vertexAreas = numpy.bincount(corners, numpy.tile(areas, 3), numVertices)
+
+    # boundary edges are used by one triangle only,
+    # a plane perpendicular to the face keeps them in place.
+    edges = numpy.vstack((triangles[:,[0,1]], triangles[:,[1,2]], triangles[:,[2,0]]))
+    edgeFaces = numpy.tile(numpy.arange(len(triangles)), 3)
+    keys = numpy.sort(edges, axis=1)
+    keys = keys[:,0]*numVertices + keys[:,1]
+    (_, edgeIds, edgeCounts) = numpy.unique(keys, return_inverse=True, return_counts=True)
+    isBoundary = edgeCounts[edgeIds]==1
+    (e0, e1) = (edges[isBoundary,0], edges[isBoundary,1])
+    edgeVecs = positions[e1] - positions[e0]
+    edgeNormals = numpy.cross(edgeVecs, normals[edgeFaces[isBoundary]])
+    lengths = numpy.sqrt((edgeNormals*edgeNormals).sum(axis=1))
+    edgeNormals /= numpy.maximum(lengths, 1e-20)[:,numpy.newaxis]
+    edgePlanes = numpy.column_stack((edgeNormals, -(edgeNormals*positions[e0]).sum(axis=1)))
+    edgeQuadrics = _planeQuadrics(edgePlanes, BOUNDARY_WEIGHT*(edgeVecs*edgeVecs).sum(axis=1))
+    boundaryQuadrics = _sumVertexQuadrics(numpy.concatenate((e0, e1)),
+        numpy.tile(edgeQuadrics, (2, 1)), numVertices)
+
+    return (faceQuadrics, vertexAreas, boundaryQuadrics)
+
+def _quadricError(q, w, p):
+    """
+    mean squared distance of point @p to the planes of quadric @q
+    with weight sum @w.
+    """
+    (x, y, z) = p
+    e = q[0]*x*x + 2.0*q[1]*x*y + 2.0*q[2]*x*z + 2.0*q[3]*x + \
+        q[4]*y*y + 2.0*q[5]*y*z + 2.0*q[6]*y + \
+        q[7]*z*z + 2.0*q[8]*z + q[9]
+    return max(e, 0.0)/max(w, 1e-20)
+
+def _faceNormal(p0, p1, p2):
+    (ux, uy, uz) = (p1[0]-p0[0], p1[1]-p0[1], p1[2]-p0[2])
+    (vx, vy, vz) = (p2[0]-p0[0], p2[1]-p0[1], p2[2]-p0[2])
+    return (uy*vz - uz*vy, uz*vx - ux*vz, ux*vy - uy*vx)
+
+def _weldPositions(positions):
+    """
+    returns the welded vertex of each vertex and the vertex copies
+    of each welded vertex, vertices at the same position are welded.
+    """
+    keys = numpy.ascontiguousarray(positions, 'float64')
+    keys = keys.view(numpy.dtype((numpy.void, keys.dtype.itemsize*3))).ravel()
+    (_, firstVertices, welded) = numpy.unique(keys, return_index=True, return_inverse=True)
+    copies = map(lambda i: [], range(len(firstVertices)))
+    for (i, w) in enumerate(welded.tolist()):
+        copies[w].append(i)
+    return (welded, firstVertices, copies)
+
+def simplifyTriangles(positions, indexes, targets, attributes=None):
+    """
+    simplifies a triangle mesh for each number of triangles in @targets.
+    vertices at the same position are collapsed together, the vertex
+    of a corner is replaced by the copy with the most similar @attributes.
+    returns a list of (indexes, error) tuples, error is the largest
+    root mean squared distance of a collapsed vertex to its face planes.
+    levels that cannot be simplified further are not returned.
+    """
+    positions = numpy.asarray(positions, 'float64')[:,:3]
+    triangles = numpy.asarray(indexes, 'int64').reshape((-1, 3))
+    if attributes is not None:
+        attributes = numpy.asarray(attributes, 'float64')
+
+    (welded, firstVertices, copies) = _weldPositions(positions)
+    weldedTriangles = welded[triangles]
+    isValid = (weldedTriangles[:,0]!=weldedTriangles[:,1]) & \
+              (weldedTriangles[:,1]!=weldedTriangles[:,2]) & \
+              (weldedTriangles[:,2]!=weldedTriangles[:,0])
+    (triangles, weldedTriangles) = (triangles[isValid], weldedTriangles[isValid])
+    weldedPositions = positions[firstVertices]
+    numVertices = len(weldedPositions)
+
+    # collapses are ordered by the error including boundary planes,
+    # the error of a level is measured with the face planes only.
+    (faceQuadrics, areas, boundaryQuadrics) = _vertexQuadrics(weldedPositions, weldedTriangles)
+    quadrics = (faceQuadrics + boundaryQuadrics).tolist()
+    faceQuadrics = faceQuadrics.tolist()
+    areas = areas.tolist()
+    points = map(tuple, weldedPositions.tolist())
+
+    # corners reference vertex copies, faces welded vertices
+    corners = triangles.tolist()
+    faces = weldedTriangles.tolist()
+    isAlive = [True]*len(faces)
+    numAlive = len(faces)
+    vertexFaces = map(lambda i: set(), range(numVertices))
+    for (f, face) in enumerate(faces):
+        for v in face:
+            vertexFaces[v].add(f)
+    generations = [0]*numVertices
+
+    def collapseCost(u, v):
+        """ cost of collapsing welded vertex u into v. """
+        q = map(lambda (a, b): a+b, zip(quadrics[u], quadrics[v]))
+        return _quadricError(q, areas[u]+areas[v], points[v])
+
+    def edgeCollapses(v):
+        """ cheapest collapse direction of the edges around v. """
+        neighbors = set()
+        for f in vertexFaces[v]:
+            neighbors.update(faces[f])
+        neighbors.discard(v)
+        collapses = []
+        for w in neighbors:
+            costWV = collapseCost(w, v)
+            costVW = collapseCost(v, w)
+            if costWV <= costVW:
+                collapses.append((costWV, w, v, generations[w], generations[v]))
+            else:
+                collapses.append((costVW, v, w, generations[v], generations[w]))
+        return collapses
+
+    heap = []
+    for v in range(numVertices):
+        heap += edgeCollapses(v)
+    heapq.heapify(heap)
+
+    def isValidCollapse(u, v):
+        facesU = vertexFaces[u]
+        facesV = vertexFaces[v]
+        sharedFaces = facesU & facesV
+        # link condition, u and v may only share the neighbors
+        # opposite to their common edge.
+        neighborsU = set()
+        for f in facesU:
+            neighborsU.update(faces[f])
+        neighborsV = set()
+        for f in facesV:
+            neighborsV.update(faces[f])
+        opposite = set()
+        for f in sharedFaces:
+            opposite.update(faces[f])
+        if len((neighborsU & neighborsV) - opposite) > 0:
+            return False
+        # faces moved to v must not flip
+        pv = points[v]
+        for f in facesU - sharedFaces:
+            p = map(lambda i: points[i], faces[f])
+            n0 = _faceNormal(*p)
+            p[faces[f].index(u)] = pv
+            n1 = _faceNormal(*p)
+            dot = n0[0]*n1[0] + n0[1]*n1[1] + n0[2]*n1[2]
+            len0 = n0[0]*n0[0] + n0[1]*n0[1] + n0[2]*n0[2]
+            len1 = n1[0]*n1[0] + n1[1]*n1[1] + n1[2]*n1[2]
+            if dot <= MIN_NORMAL_COS*(len0*len1)**0.5:
+                return False
+        return True
+
+    def copyFor(vertex, w):
+        """ copy of welded vertex w with attributes most similar to vertex. """
+        candidates = copies[w]
+        if len(candidates)==1 or attributes is None:
+            return candidates[0]
+        a = attributes[vertex]
+        d = ((attributes[candidates] - a)**2).sum(axis=1)
+        return candidates[int(d.argmin())]
+
+    levels = []
+    targets = sorted(targets, reverse=True)
+    maxError = 0.0
+    lastNumAlive = numAlive
+    for target in targets:
+        while numAlive > target and heap:
+            (cost, u, v, genU, genV) = heapq.heappop(heap)
+            if genU!=generations[u] or genV!=generations[v]: continue
+            if not isValidCollapse(u, v): continue
+
+            sharedFaces = vertexFaces[u] & vertexFaces[v]
+            for f in sharedFaces:
+                isAlive[f] = False
+                numAlive -= 1
+                for w in faces[f]:
+                    if w!=u: vertexFaces[w].discard(f)
+            for f in vertexFaces[u] - sharedFaces:
+                i = faces[f].index(u)
+                faces[f][i] = v
+                corners[f][i] = copyFor(corners[f][i], v)
+                vertexFaces[v].add(f)
+            vertexFaces[u] = set()
+
+            quadrics[v] = map(lambda (a, b): a+b, zip(quadrics[u], quadrics[v]))
+            faceQuadrics[v] = map(lambda (a, b): a+b, zip(faceQuadrics[u], faceQuadrics[v]))
+            areas[v] += areas[u]
+            generations[u] += 1
+            generations[v] += 1
+            maxError = max(maxError, _quadricError(faceQuadrics[v], areas[v], points[v]))
+
+            for collapse in edgeCollapses(v):
+                heapq.heappush(heap, collapse)
+
+        if numAlive==0 or numAlive==lastNumAlive:
+            # no further simplification possible
+            break
+        lastNumAlive = numAlive
+        levelIndexes = [corners[f] for f in range(len(faces)) if isAlive[f]]
+        levels.append((numpy.array(levelIndexes, 'int64').ravel(), maxError**0.5))
+        if numAlive > target:
+            break
+
+    return levels
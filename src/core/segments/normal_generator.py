@@ -4,54 +4,96 @@ Created on 18.07.2010
 
 @author: Daniel Beßler <daniel@orgizm.net>
 '''
-from numpy import zeros, float32
-from utils.algebra.vector import crossVec3Float32, normalize
+import numpy
+from numpy import float32
 
-def _genPlaneFaceNormals(segment, face, normals):
-    v = map(lambda i: segment.vertices.data[i], face.indexes)
-    
-    # Calculate plane face normal
-    # v[0] and left neighbor v[-1] and right neighbor v[1] are used.
-    edge1 = v[ 1] - v[0]
-    edge2 = v[-1] - v[0]
-    normal = crossVec3Float32( edge1, edge2 )
+from core.segments.face import faceCornerNeighbors
 
-    # Accumulate the normals.
-    for i in face.indexes:
-        normals[i] = normals[i]+normal
+# weighting of face normals accumulated per vertex
+NORMAL_WEIGHTING_AREA = "area"
+NORMAL_WEIGHTING_ANGLE = "angle"
+NORMAL_WEIGHTING_NONE = "none"
 
-def genVertexNormalsPlane(segment):
+def _normalizeRows(vecs):
     """
-    generate per vertex normals.
-    segment must consist of plane polygon faces.
+    normalizes the rows of a (N,3) array in place,
+    rows with zero length are left untouched.
     """
-    normals = [ zeros( 3, float32 ) ]*segment.numVertices
-    
-    # Calculate the vertex normals.
-    for face in segment.faces:
-        _genPlaneFaceNormals(segment, face, normals)
+    lengths = numpy.sqrt(numpy.einsum('ij,ij->i', vecs, vecs))
+    lengths[lengths==0.0] = 1.0
+    vecs /= lengths[:,numpy.newaxis]
+    return vecs
 
-    # Normalize the vertex normals.
-    for i in range(segment.numVertices):
-        normalize( normals[i] )
-    
-    return normals
+def _cornerAngles(edge1, edge2):
+    """
+    returns the angles between the rows of two edge arrays.
+    """
+    cosAngles = numpy.einsum('ij,ij->i',
+                             _normalizeRows(edge1.copy()), _normalizeRows(edge2.copy()))
+    return numpy.arccos(numpy.clip(cosAngles, -1.0, 1.0))
 
+def _cornerEdges(v, vNext, prevCorners):
+    """
+    returns the edges to the next and previous corner of each face corner.
+    """
+    return (vNext - v, v.take(prevCorners, axis=0) - v)
 
-def genVertexNormalsUnplane(segment):
+def _genVertexNormals(segment, planeFaces, weighting):
     """
-    generate normals for not plane faces.
+    generates per vertex normals for all faces at once.
+    each face corner adds the face normal (plane faces) or the normal
+    of the plane spanned by its neighbors (unplane faces) to its vertex.
+    with area weighting the normals are scaled by the face (corner) area,
+    with angle weighting by the angle at the corner.
     """
-    normals = [ zeros(3,float32) ]*segment.numVertices
+    vertices = numpy.asarray(segment.vertices.data, float32)
+    (indexes, faceLengths) = segment.getFaceIndexArrays()
+    if len(indexes)==0:
+        return numpy.zeros((segment.numVertices, 3), float32)
+    (starts, prevCorners, nextCorners) = faceCornerNeighbors(faceLengths)
+    
+    # take() is faster than fancy indexing for large index arrays
+    v = vertices.take(indexes, axis=0)
+    vNext = v.take(nextCorners, axis=0)
     
-    # Calculate the vertex normals.
-    for face in segment.faces:
-        planeFaces = face.getPlaneFaces(segment)
-        for face in planeFaces:
-            _genPlaneFaceNormals(segment, face, normals)
+    # face normals with the length of the doubled face area (newell's method)
+    faceNormals = numpy.add.reduceat(numpy.cross(v, vNext), starts)
+    faceNormals = numpy.repeat(faceNormals, faceLengths, axis=0)
     
-    # Normalize the vertex normals.
-    for i in range(segment.numVertices):
-        normalize( normals[i] )
+    if planeFaces:
+        normals = faceNormals
+    else:
+        (edge1, edge2) = _cornerEdges(v, vNext, prevCorners)
+        # concave corners span a plane facing backwards
+        normals = numpy.cross(edge1, edge2)
+        normals[numpy.einsum('ij,ij->i', normals, faceNormals) < 0.0] *= -1.0
     
-    return normals
+    if weighting == NORMAL_WEIGHTING_ANGLE:
+        if planeFaces:
+            (edge1, edge2) = _cornerEdges(v, vNext, prevCorners)
+        normals = _normalizeRows(normals)*_cornerAngles(edge1, edge2)[:,numpy.newaxis]
+    elif weighting == NORMAL_WEIGHTING_NONE:
+        normals = _normalizeRows(normals)
+    elif weighting != NORMAL_WEIGHTING_AREA:
+        print "WARNING: unknown normal weighting '%s'." % weighting
+    
+    # accumulate the corner normals per vertex,
+    # bincount per component is a lot faster than numpy.add.at.
+    vertexNormals = numpy.empty((segment.numVertices, 3), float32)
+    for k in range(3):
+        vertexNormals[:,k] = numpy.bincount(indexes, normals[:,k], segment.numVertices)
+    
+    return _normalizeRows(vertexNormals)
+
+def genVertexNormalsPlane(segment, weighting=NORMAL_WEIGHTING_AREA):
+    """
+    generate per vertex normals.
+    segment must consist of plane polygon faces.
+    """
+    return _genVertexNormals(segment, True, weighting)
+
+def genVertexNormalsUnplane(segment, weighting=NORMAL_WEIGHTING_AREA):
+    """
+    generate normals for not plane faces.
+    """
+    return _genVertexNormals(segment, False, weighting)
@@ -21,4 +21,4 @@ class PolygonSegment(TSpaceSegment):
     def generateTangents(self):
         return genVertexTangentsUnplane(self)
     def generateNormals(self):
-        return genVertexNormalsUnplane(self)
+        return genVertexNormalsUnplane(self, self.normalWeighting)
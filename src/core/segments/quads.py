@@ -21,4 +21,4 @@ class QuadSegment(TSpaceSegment):
     def generateTangents(self):
         return genVertexTangentsUnplane(self)
     def generateNormals(self):
-        return genVertexNormalsUnplane(self)
+        return genVertexNormalsUnplane(self, self.normalWeighting)
@@ -13,7 +13,8 @@ from shader.shader_utils import combineShader,\
                                 compileProgram,\
                                 ShaderWrapper, \
                                 NORMAL_VARYING, VertShaderFunc, ShaderData,\
-    FRAG_SHADER, VERT_SHADER, GEOM_SHADER
+    FRAG_SHADER, VERT_SHADER, GEOM_SHADER,\
+    INSTANCE_MATRIX, INSTANCE_MATRIX_LOCATION
 
 from shader.blending_shader import Brightness,\
                                    Invert,\
@@ -64,11 +65,27 @@ class ModelSegment(GLObject):
         else:
             pass
         self.reflectionHandler = None
+        # segments not casting shadows are not drawn to shadow maps
+        self.castsShadows = self.getAttr("castsShadows", True)
         
         self.vertexPositionName = "vec4(vertexPosition, 1.0)"
         self.vertexNormalName = "vertexNormal"
         self.vertexColorName = "vertexColor"
         self.vertexUVName = "vertexUV"
+        
+        # (center, radius) of the segment geometry, None if unknown
+        self.boundingSphere = None
+        # (min, max) corners of the segment geometry, None if unknown
+        self.boundingBox = None
+        # geometric error of each simplified level of detail,
+        # level 0 is the full resolution segment.
+        self.lodErrors = []
+        self.lodLevel = 0
+        # segments of lower passes are drawn first by the render queue
+        self.renderPass = 0
+        # instance buffer of an instanced model,
+        # the segment is drawn once for each instance in the buffer.
+        self.instances = None
     
     def create(self, app, lights):
         """
@@ -91,10 +108,21 @@ class ModelSegment(GLObject):
         # splits up creation
         self.createResources()
         self.createResourcesPost()
+        self.cacheResources()
         self.createShader()
         self.createDrawFunction()
         self.postCreate()
     
+    def setInstances(self, instances):
+        """
+        lets the segment draw the instances in the buffer,
+        must be called before create.
+        the instance matrix is applied before the segment transformation.
+        """
+        self.instances = instances
+        self.vertexPositionName = "(%s * %s)" % (INSTANCE_MATRIX, self.vertexPositionName)
+        self.vertexNormalName = "(%s * vec4(%s, 0.0)).xyz" % (INSTANCE_MATRIX, self.vertexNormalName)
+    
     def createResources(self):
         """
         create gl resources and vertex data.
@@ -105,6 +133,11 @@ class ModelSegment(GLObject):
         do calculations depending on gl resources or complete vertex data.
         """
         pass
+    def cacheResources(self):
+        """
+        save processed vertex data, so it does not need to be calculated again.
+        """
+        pass
     
     def createBaseShaders(self, textures):
         """
@@ -384,8 +417,13 @@ class ModelSegment(GLObject):
             self.shader = ShaderWrapper()
         else:
             # ready to compile...
+            if self.instances!=None:
+                # the instance buffer binds the matrix at a fixed location
+                attributeLocations = {INSTANCE_MATRIX: INSTANCE_MATRIX_LOCATION}
+            else:
+                attributeLocations = {}
             self.shaderProgram = compileProgram(
-                        vertShader, geomShader, fragShader)
+                        vertShader, geomShader, fragShader, attributeLocations)
             
             # self.shader handles enabling/disabling the shader
             self.shader = SegmentShader(self,
@@ -401,6 +439,8 @@ class ModelSegment(GLObject):
         shaderFunc.addAttribute(type="vec3", name="vertexPosition")
         if bool(self.enabledLights):
             shaderFunc.addAttribute(type="vec3", name="vertexNormal")
+        if self.instances!=None:
+            shaderFunc.addAttribute(type="mat4", name=INSTANCE_MATRIX)
     
     def createDrawFunction(self):
         """
@@ -408,14 +448,26 @@ class ModelSegment(GLObject):
         """
         GLObject.createDrawFunction(self)
         if self.material!=None:
-            # let material create the draw function and
-            # include the material state setter/unsetter
+            # let material create the draw function,
+            # material states are enabled after the segment states.
             self.material.createDrawFunction()
-            
-            self.joinStaticStates(enable=self.material.enableStaticStates,
-                                  disable=self.material.disableStaticStates)
-            self.joinDynamicStates(enable=self.material.enableDynamicStates,
-                                   disable=self.material.disableDynamicStates)
+    
+    def enableSegmentStates(self):
+        """
+        enables the segment states without the material states.
+        """
+        GLObject.enableStates(self)
+    def disableSegmentStates(self):
+        GLObject.disableStates(self)
+    
+    def enableStates(self):
+        self.enableSegmentStates()
+        if self.material!=None:
+            self.material.enableStates()
+    def disableStates(self):
+        self.disableSegmentStates()
+        if self.material!=None:
+            self.material.disableStates()
     
     def drawSegment(self):
         """
@@ -424,6 +476,19 @@ class ModelSegment(GLObject):
         """
         raise NotImplementedError
     
+    def selectLOD(self, pixelsPerUnit, maxPixelError):
+        """
+        selects the coarsest level of detail with a projected
+        error below @maxPixelError pixels.
+        @param pixelsPerUnit: pixels covered by one unit at the segment distance
+        """
+        self.lodLevel = 0
+        for i in range(len(self.lodErrors)):
+            if self.lodErrors[i]*pixelsPerUnit > maxPixelError:
+                break
+            self.lodLevel = i+1
+        return self.lodLevel
+    
     def hasCol(self):
         # returns if a color array should be used
         return False
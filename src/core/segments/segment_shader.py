@@ -11,11 +11,9 @@ from OpenGL.GL import glGetUniformLocation, \
                       glUniform1i, \
                       glUniform1fv, glUniform2fv, glUniform3fv, glUniform4fv,\
                       glUniformMatrix4fv
-from OpenGL.GL import glUseProgram, \
-                      glActiveTexture, glBindTexture,\
-                      GL_TEXTURE0
 
 from shader.shader_utils import ShaderWrapper
+from core.gl_state_cache import stateCache
 
 from numpy import array, float32
 
@@ -64,14 +62,14 @@ class SegmentShader(ShaderWrapper):
     
     def enable(self):
         # replace fixed function pipeline
-        glUseProgram(self.glHandle)
+        stateCache.useProgram(self.glHandle)
         
-        # activate and bind textures
+        # activate and bind textures,
+        # textures already bound to their unit are skipped
         def _bindTexture((tex,loc)):
             (tex, target, _, _, i) = tex
-            glActiveTexture(GL_TEXTURE0 + i)
-            glUniform1i(loc, i)
-            glBindTexture(target, tex)
+            stateCache.uniform1i(self.glHandle, loc, i)
+            stateCache.bindTexture(target, tex, i)
         map( _bindTexture, self.textures )
         
         # enable shadow maps far uniforms
@@ -88,5 +86,5 @@ class SegmentShader(ShaderWrapper):
         
     def disable(self):
         # TODO: needed to switch unit ?
-        glActiveTexture( GL_TEXTURE0 )
+        stateCache.activeTexture( 0 )
 
@@ -16,10 +16,11 @@ from utils.gl_config import importGL
 OpenGL = importGL()
 from OpenGL import GL as gl
 
-from numpy import array, vdot
-from utils.algebra.vector import scalarCopy
+import numpy
+from numpy import float32
 
 from core.gl_vertex_attribute import GLVertexAttribute
+from core.segments.face import faceCornerNeighbors
 
 def tangentAttribute(tangents):
     return GLVertexAttribute(name="vertexTangent",
@@ -28,41 +29,105 @@ def tangentAttribute(tangents):
                             normalize=False,
                             dataType=gl.GL_FLOAT)
 
+def _rowDot(a, b):
+    return numpy.einsum('ij,ij->i', a, b)
 
-def generateFaceTangent(segment, face):
+def generateCornerTangents(edge1, edge2, texEdge1, texEdge2):
     """
-    generates tangent and binormal based on
-    uv coordinates and vertex positions.
-    the face is expected to be in plane.
-    only the first three coordinates are used.
+    generates tangents and binormals based on uv coordinates
+    and vertex positions, for each row of the (M,3) edge arrays
+    and the (M,2) uv edge arrays.
+    rows with degenerated uv coordinates get default tangent space.
     """
-    v = map(lambda i: segment.vertices.data[i], face.indexes)
-    uv = face.uv
+    det = texEdge1[:,0]*texEdge2[:,1] - texEdge2[:,0]*texEdge1[:,1]
+    isDegenerated = numpy.abs(det) < 0.00001
+    det[isDegenerated] = 1.0
+    det = (1.0/det)[:,numpy.newaxis]
     
-    # TODO: problem for faces with more then 3 vertices?
-    edge1 = v[ 1] - v[0]
-    edge2 = v[-1] - v[0]
-    texEdge1 = uv[ 1] - uv[0]
-    texEdge2 = uv[-1] - uv[0]
+    tangents = (texEdge2[:,1:2]*edge1 - texEdge1[:,1:2]*edge2)*det
+    binormals = (texEdge1[:,0:1]*edge2 - texEdge2[:,0:1]*edge1)*det
+    tangents[isDegenerated] = (1.0, 0.0, 0.0)
+    binormals[isDegenerated] = (0.0, 1.0, 0.0)
     
-    det = texEdge1[0] * texEdge2[1] - texEdge2[0] * texEdge1[1]
-    if abs(det) < 0.00001:
-        tangent  = array((1.0, 0.0, 0.0))
-        binormal = array((0.0, 1.0, 0.0))
+    return (tangents, binormals)
+
+def _genVertexTangents(segment, planeFaces):
+    """
+    generates per vertex tangents for all faces at once.
+    plane faces use one tangent space per face, calculated from the first
+    corner and its neighbors. for unplane faces each corner
+    uses the plane spanned by its neighbors.
+    the handedness of the tangent space is saved in the w component.
+    """
+    vertices = numpy.asarray(segment.vertices.data, float32)
+    normals = numpy.asarray(segment.normals.data, float32)
+    (indexes, faceLengths) = segment.getFaceIndexArrays()
+    (starts, prevCorners, nextCorners) = faceCornerNeighbors(faceLengths)
+    
+    if planeFaces:
+        # only the first corner of each face is used
+        (corners, nextCorners, prevCorners) = (starts, nextCorners[starts], prevCorners[starts])
+    else:
+        corners = numpy.arange(len(indexes))
+    i0 = indexes.take(corners)
+    i1 = indexes.take(nextCorners)
+    i2 = indexes.take(prevCorners)
+    
+    if segment.hasOrco():
+        uvs = numpy.asarray(segment.uvs.data, float32)
+        texEdge1 = uvs.take(i1, axis=0) - uvs.take(i0, axis=0)
+        texEdge2 = uvs.take(i2, axis=0) - uvs.take(i0, axis=0)
     else:
-        det = 1.0 / det
-        tangent = array((
-            (texEdge2[1] * edge1[0] - texEdge1[1] * edge2[0]) * det,
-            (texEdge2[1] * edge1[1] - texEdge1[1] * edge2[1]) * det,
-            (texEdge2[1] * edge1[2] - texEdge1[1] * edge2[2]) * det
-        ))
-        binormal = array((
-            (-texEdge2[0] * edge1[0] + texEdge1[0] * edge2[0]) * det,
-            (-texEdge2[0] * edge1[1] + texEdge1[0] * edge2[1]) * det,
-            (-texEdge2[0] * edge1[2] + texEdge1[0] * edge2[2]) * det
-        ))
-        
-    return (tangent, binormal)
+        # no uv coordinates, all tangents get the default tangent space
+        texEdge1 = texEdge2 = numpy.zeros((len(corners), 2), float32)
+    (tangents, binormals) = generateCornerTangents(
+            vertices.take(i1, axis=0) - vertices.take(i0, axis=0),
+            vertices.take(i2, axis=0) - vertices.take(i0, axis=0),
+            texEdge1, texEdge2)
+    if planeFaces:
+        tangents = numpy.repeat(tangents, faceLengths, axis=0)
+        binormals = numpy.repeat(binormals, faceLengths, axis=0)
+    
+    # accumulate the tangents and binormals per vertex
+    vertexTangents = numpy.zeros((segment.numVertices, 4), float32)
+    vertexBinormals = numpy.empty((segment.numVertices, 3), float32)
+    for k in range(3):
+        vertexTangents[:,k] = numpy.bincount(indexes, tangents[:,k], segment.numVertices)
+        vertexBinormals[:,k] = numpy.bincount(indexes, binormals[:,k], segment.numVertices)
+    tangents = vertexTangents[:,:3]
+    
+    # Gram-Schmidt orthogonalize tangent with normal.
+    tangents -= normals*_rowDot(normals, tangents)[:,numpy.newaxis]
+    lengths = numpy.sqrt(_rowDot(tangents, tangents))
+    lengths[lengths==0.0] = 1.0
+    tangents /= lengths[:,numpy.newaxis]
+    
+    """
+    // Calculate the handedness of the local tangent space.
+    // The bitangent vector is the cross product between the triangle face
+    // normal vector and the calculated tangent vector. The resulting
+    // bitangent vector should be the same as the bitangent vector
+    // calculated from the set of linear equations above. If they point in
+    // different directions then we need to invert the cross product
+    // calculated bitangent vector. We store this scalar multiplier in the
+    // tangent vector's 'w' component so that the correct bitangent vector
+    // can be generated in the normal mapping shader's vertex shader.
+    //
+    // Normal maps have a left handed coordinate system with the origin
+    // located at the top left of the normal map texture. The x coordinates
+    // run horizontally from left to right. The y coordinates run
+    // vertically from top to bottom. The z coordinates run out of the
+    // normal map texture towards the viewer. Our handedness calculations
+    // must take this fact into account as well so that the normal mapping
+    // shader's vertex shader will generate the correct bitangent vectors.
+    // Some normal map authoring tools such as Crazybump
+    // (http://www.crazybump.com/) includes options to allow you to control
+    // the orientation of the normal map normal's y-axis.
+    """
+    bDotB = _rowDot(numpy.cross(normals, tangents), vertexBinormals)
+    vertexTangents[:,3] = numpy.where(bDotB < 0.0, 1.0, -1.0)
+    
+    return tangentAttribute(vertexTangents)
 
 def genVertexTangentsPlane(segment):
     """
@@ -71,70 +136,16 @@ def genVertexTangentsPlane(segment):
     @param segment: must be a vertex array segment,
     @see: http://www.terathon.com/code/tangent.html
     @precondition: self.normals calculated
-    @precondition: self.faces set and uv coordinates set on each face
+    @precondition: self.faces set and per vertex uv coordinates set
     """
-    
-    tangents = [None]*segment.numVertices
-    vtb = {}
-    
-    # Calculate the triangle face tangent and binormal.
-    for face in segment.faces:
-        (t,b) = generateFaceTangent(segment, face)
-        # Accumulate the tangents and binormals.
-        for i in face.indexes:
-            try:
-                vtb[i].append((t,b))
-            except:
-                vtb[i] = [(t,b)]
-    
-    # Orthogonalize and normalize the vertex tangents.
-    for i in vtb.keys():
-        tbs = vtb[i]
-        ts, bs = zip(*tbs)
-        
-        # sum tangents and binormals
-        tangent  = reduce( lambda x, y: x+y, ts )
-        binormal = reduce( lambda x, y: x+y, bs )
-        normal   = segment.normals.data[i]
-        
-        # Gram-Schmidt orthogonalize tangent with normal.
-        nDotT = vdot( normal, tangent )
-        tangent -= scalarCopy( normal, nDotT )
-        tangent.normalize()
-        
-        """
-        // Calculate the handedness of the local tangent space.
-        // The bitangent vector is the cross product between the triangle face
-        // normal vector and the calculated tangent vector. The resulting
-        // bitangent vector should be the same as the bitangent vector
-        // calculated from the set of linear equations above. If they point in
-        // different directions then we need to invert the cross product
-        // calculated bitangent vector. We store this scalar multiplier in the
-        // tangent vector's 'w' component so that the correct bitangent vector
-        // can be generated in the normal mapping shader's vertex shader.
-        //
-        // Normal maps have a left handed coordinate system with the origin
-        // located at the top left of the normal map texture. The x coordinates
-        // run horizontally from left to right. The y coordinates run
-        // vertically from top to bottom. The z coordinates run out of the
-        // normal map texture towards the viewer. Our handedness calculations
-        // must take this fact into account as well so that the normal mapping
-        // shader's vertex shader will generate the correct bitangent vectors.
-        // Some normal map authoring tools such as Crazybump
-        // (http://www.crazybump.com/) includes options to allow you to control
-        // the orientation of the normal map normal's y-axis.
-        """
-        
-        bDotB = normal.cross( tangent ).dot( binormal )
-        if bDotB < 0.0:
-            tangents[i] = array((tangent[0], tangent[1], tangent[2], 1.0))
-        else:
-            tangents[i] = array((tangent[0], tangent[1], tangent[2], -1.0))
-    
-    return tangentAttribute(tangents)
-
+    return _genVertexTangents(segment, True)
 
 def genVertexTangentsUnplane(segment):
-    # FIXME: TSPACE: each face could have multiple planes!
-    # FIXME: TSPACE: face groups! will have problems with per face attributes
-    return genVertexTangentsPlane(segment)
+    """
+    generates per vertex tangents for faces that may not be plane.
+    each face corner contributes the tangent space of the plane
+    spanned by its neighbors.
+    @precondition: self.normals calculated
+    @precondition: self.faces set and per vertex uv coordinates set
+    """
+    return _genVertexTangents(segment, False)
@@ -5,7 +5,13 @@ Created on 18.07.2010
 @author: Daniel Beßler <daniel@orgizm.net>
 '''
 
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+
 from core.segments.tspace_varray import TSpaceSegment
+from core.segments.vertex_cache import averageCacheMissRatio,\
+    optimizeTriangleOrder, vertexFetchOrder
 from core.segments.normal_generator import genVertexNormalsPlane
 from core.segments.tangent_generator import genVertexTangentsPlane
 
@@ -21,5 +27,22 @@ class TriangleSegment(TSpaceSegment):
     def generateTangents(self):
         return genVertexTangentsPlane(self)
     def generateNormals(self):
-        return genVertexNormalsPlane(self)
-    
\ No newline at end of file
+        return genVertexNormalsPlane(self, self.normalWeighting)
+    
+    def optimizeIndexes(self):
+        """
+        reorders triangles for the post transform vertex cache
+        and vertices in order of their first use.
+        """
+        if self.faceType != gl.GL_TRIANGLES or self.vertexCacheSize <= 0:
+            # strips and fans depend on the face order
+            return
+        (indexes, faceLengths) = self.getFaceIndexArrays()
+        if (faceLengths!=3).any():
+            print "WARNING: segment '%s' has faces that are not triangles." % self.segmentID
+            return
+        
+        acmr = averageCacheMissRatio(indexes, self.vertexCacheSize)
+        self.reorderFaces(optimizeTriangleOrder(indexes, self.numVertices, self.vertexCacheSize))
+        self.reorderVertices(vertexFetchOrder(self.indexes, self.numVertices))
+        self.acmr = (acmr, averageCacheMissRatio(self.indexes, self.vertexCacheSize))
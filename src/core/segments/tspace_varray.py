@@ -11,6 +11,7 @@ from core.textures.texture import Texture2D
 from core.segments.face_varray import FaceVArray
 from shader.shader_utils import NORMAL_VARYING
 from core.gl_vertex_attribute import GLVertexAttribute
+import numpy
 
 class TSpaceSegment(FaceVArray):
     """
@@ -31,9 +32,35 @@ class TSpaceSegment(FaceVArray):
     
     def createResources(self):
         FaceVArray.createResources(self)
-        if self.needTangents():
+        if self.isCachedGeometry:
+            # cached tangents are only used if the material needs them
+            if not self.needTangents():
+                self.tangents = None
+            elif self.tangents==None:
+                print "WARNING: no tangents cached for segment '%s'." % self.segmentID
+    
+    def createResourcesPost(self):
+        FaceVArray.createResourcesPost(self)
+        if not self.isCachedGeometry and self.needTangents():
+            # generated after vertices were split by per face data,
+            # so faces with different uv coordinates do not share tangents.
             self.tangents = self.generateTangents()
     
+    def getGeometry(self):
+        geometry = FaceVArray.getGeometry(self)
+        tangents = self.tangents
+        try:
+            if tangents==None and self.hasOrco() and not self.isCachedGeometry:
+                # tangents depend on the material of the segment,
+                # generate them for the cache anyway.
+                tangents = self.generateTangents()
+            if tangents!=None:
+                geometry['vertexTangent'] = numpy.asarray(tangents.data, 'float32')
+        except (TypeError, ValueError):
+            # some faces or vertices without tangent
+            pass
+        return geometry
+    
     def isDynamicAttribute(self, attribute):
         if self.tangents==attribute:
             return self.dynamicTangents
@@ -78,7 +105,7 @@ class TSpaceSegment(FaceVArray):
                 bumpVert.setArgs(["n"])
                 data[VERT_SHADER].functions.append(bumpVert)
         
-        data[VERT_SHADER].localVars["n"] = ("vec3", "normalize( gl_NormalMatrix * vertexNormal )")
+        data[VERT_SHADER].localVars["n"] = ("vec3", "normalize( gl_NormalMatrix * %s )" % self.vertexNormalName)
         data[VERT_SHADER].exports[NORMAL_VARYING] = "n"
         
         return data
@@ -94,9 +121,18 @@ class TSpaceSegment(FaceVArray):
     def duplicatePerVertexAttribute(self, index):
         FaceVArray.duplicatePerVertexAttribute(self, index)
         if self.hasTangents():
-            # FIXME: TSPACE: for different per face uv tangents cant be duplicated like this,
-            #                    because their calculation depends on the uv values
-            self.tangents.data.append(self.tangents.data[index])
+            self.tangents.duplicateElement(index)
+    
+    def duplicatePerVertexAttributes(self, indexes):
+        FaceVArray.duplicatePerVertexAttributes(self, indexes)
+        if self.hasTangents():
+            self.tangents.duplicateElements(indexes)
+    
+    def reorderPerVertexAttributes(self, order):
+        newIndexes = FaceVArray.reorderPerVertexAttributes(self, order)
+        if self.hasTangents():
+            self.tangents.reorderElements(order)
+        return newIndexes
     
     # abstract generation methods
     def generateTangents(self):
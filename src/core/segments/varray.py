@@ -10,6 +10,7 @@ OpenGL = importGL()
 from OpenGL import GL as gl
 
 from segment import ModelSegment
+import numpy
 
 class VArraySegment(ModelSegment):
     def __init__(self, name, params):
@@ -18,6 +19,11 @@ class VArraySegment(ModelSegment):
         
         # Note: vertex data here maybe deleted later (after create) to save some ram
         
+        # vertex data was processed before and loaded from a cache
+        self.isCachedGeometry = params.get('cachedGeometry', False)
+        # (cache, name) tuple, processed vertex data is saved there
+        self.geometryCache = params.get('geometryCache')
+        
         self.vertices = params['cos']
         conf = params.get('verticesConf')
         if conf!=None and conf.dynamic:
@@ -83,13 +89,101 @@ class VArraySegment(ModelSegment):
         self.numVertices += 1
         
         # duplicate vertex data
-        self.vertices.data.append(self.vertices.data[index])
+        self.vertices.duplicateElement(index)
         if self.hasNor():
-            self.normals.data.append(self.normals.data[index])
+            self.normals.duplicateElement(index)
         if self.hasOrco():
-            self.uvs.data.append(self.uvs.data[index])
+            self.uvs.duplicateElement(index)
         if self.hasCol():
-            self.colors.data.append(self.colors.data[index])
+            self.colors.duplicateElement(index)
+    
+    def duplicatePerVertexAttributes(self, indexes):
+        """
+        adds the vertices at @indexes to the end of the vertex list,
+        like duplicatePerVertexAttribute for multiple vertices at once.
+        """
+        # remember duplication for animations
+        for i in range(len(indexes)):
+            try:
+                self.duplicatedIndexes[indexes[i]].append(self.numVertices + i)
+            except:
+                self.duplicatedIndexes[indexes[i]] = [self.numVertices + i]
+        
+        self.numVertices += len(indexes)
+        
+        # duplicate vertex data
+        self.vertices.duplicateElements(indexes)
+        if bool(self.normals):
+            self.normals.duplicateElements(indexes)
+        if bool(self.uvs):
+            self.uvs.duplicateElements(indexes)
+        if bool(self.colors):
+            self.colors.duplicateElements(indexes)
+    
+    def reorderPerVertexAttributes(self, order):
+        """
+        reorders the vertex list, vertex i is the old vertex at @order[i].
+        returns the new index of each old vertex,
+        indexes referencing the vertices must be remapped by the caller.
+        """
+        newIndexes = numpy.empty(len(order), 'int64')
+        newIndexes[order] = numpy.arange(len(order))
+        
+        # remember duplication for animations
+        duplicatedIndexes = {}
+        for (index, duplicates) in self.duplicatedIndexes.items():
+            duplicatedIndexes[newIndexes[index]] = map(lambda i: newIndexes[i], duplicates)
+        self.duplicatedIndexes = duplicatedIndexes
+        
+        self.vertices.reorderElements(order)
+        if bool(self.normals):
+            self.normals.reorderElements(order)
+        if bool(self.uvs):
+            self.uvs.reorderElements(order)
+        if bool(self.colors):
+            self.colors.reorderElements(order)
+        
+        return newIndexes
+    
+    def getGeometry(self):
+        """
+        returns the vertex data as dictionary of arrays.
+        """
+        geometry = { 'cos': numpy.asarray(self.vertices.data, 'float32') }
+        if self.normals!=None:
+            geometry['nos'] = numpy.asarray(self.normals.data, 'float32')
+        if self.uvs!=None:
+            geometry['uvco'] = numpy.asarray(self.uvs.data, 'float32')
+        if self.colors!=None:
+            geometry['cols'] = numpy.asarray(self.colors.data, 'float32')
+        return geometry
+    
+    def getBoundingSphere(self):
+        """
+        returns center and radius of a sphere around the vertices.
+        """
+        vertices = numpy.asarray(self.vertices.data, 'float64')[:,:3]
+        if len(vertices)==0:
+            return None
+        center = 0.5*(vertices.min(axis=0) + vertices.max(axis=0))
+        radius = numpy.sqrt(((vertices - center)**2).sum(axis=1).max())
+        return (center, float(radius))
+    
+    def getBoundingBox(self):
+        """
+        returns the min and max corner of a box around the vertices.
+        """
+        vertices = numpy.asarray(self.vertices.data, 'float64')[:,:3]
+        if len(vertices)==0:
+            return None
+        return (vertices.min(axis=0), vertices.max(axis=0))
+    
+    def cacheResources(self):
+        ModelSegment.cacheResources(self)
+        if self.geometryCache==None: return
+        (cache, name) = self.geometryCache
+        cache.save(name, self.getGeometry())
+        self.geometryCache = None
     
     def addShaderAttributes(self, shaderFunc):
         """
@@ -131,6 +225,11 @@ class IndexedSegment(VArraySegment):
         self.numIndexes = params.get('numIndexes')
         self.faceType = params.get('primitive')
     
+    def getGeometry(self):
+        geometry = VArraySegment.getGeometry(self)
+        geometry['indexes'] = numpy.asarray(self.indexes, 'uint32')
+        return geometry
+    
     def createResourcesPost(self):
         VArraySegment.createResourcesPost(self)
         
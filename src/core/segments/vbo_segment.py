@@ -10,7 +10,8 @@ OpenGL = importGL()
 from OpenGL import GL as gl
 
 from core.vbo import DynamicIntervealedVBO,\
-                     StaticIntervealedVBO, VBO
+                     StaticIntervealedVBO, VBO, ArenaVBO, intervealedData,\
+                     VertexArray, vertexArraysSupported
 from core.segments.varray import IndexedSegment
 import numpy
 
@@ -22,6 +23,16 @@ class VBOSegment(IndexedSegment):
         self.dynamicVBO = None
         # and static data for vertex indexes
         self.indexVBO = None
+        # bindings and attribute pointers of the vbos,
+        # None if vertex array objects are not used.
+        self.vertexArray = None
+        # triangle indexes of simplified levels of detail
+        self.lodIndexes = []
+        # (byte offset, number of indexes) of each level of detail in the index vbo
+        self.lodRanges = []
+        # merges the static vertex data with the data of other segments,
+        # set by a static batcher before create.
+        self.staticBatcher = None
         
         self.staticAttributes = []
         self.dynamicAttributes = []
@@ -50,6 +61,11 @@ class VBOSegment(IndexedSegment):
         self.addAttribute(self.uvs)
         self.addAttribute(self.colors)
         
+        # needed for selecting the level of detail and culling,
+        # vertex data is deleted when the vbos are created.
+        self.boundingSphere = self.getBoundingSphere()
+        self.boundingBox = self.getBoundingBox()
+        
         # vertex data is supposed to be set up now,
         # and the segment shader created.
         # we can create the vbos now.
@@ -60,6 +76,7 @@ class VBOSegment(IndexedSegment):
         del self.dynamicAttributes
         
         del self.indexes
+        del self.lodIndexes
         
         del self.vertices
         del self.normals
@@ -69,43 +86,138 @@ class VBOSegment(IndexedSegment):
     def createVBOs(self):
         # vbo containing the index data
         # the index data cannot be changed after creation.
-        self.indexVBO = VBO(data=numpy.array( self.indexes, dtype=self.dtype ),
-                            attributes=[],
-                            segment=self,
-                            bufferSize=self.indexBufferSize,
-                            target=gl.GL_ELEMENT_ARRAY_BUFFER,
-                            usage=gl.GL_STATIC_DRAW)
-        # vbo containing static vertex data that cannot be changed
-        self.staticVBO = StaticIntervealedVBO(
-                            attributes=self.staticAttributes,
-                            segment=self,
-                            target=gl.GL_ARRAY_BUFFER)
+        # indexes of the levels of detail follow the segment indexes.
+        indexData = numpy.concatenate(
+                [numpy.asarray(self.indexes).ravel()] + self.lodIndexes).astype(self.dtype)
+        self.lodRanges = [(0, self.numIndexes)]
+        offset = self.numIndexes*indexData.itemsize
+        for indexes in self.lodIndexes:
+            self.lodRanges.append( (offset, len(indexes)) )
+            offset += len(indexes)*indexData.itemsize
+        
+        arena = getattr(self.app, 'bufferArena', None)
+        if arena!=None:
+            staticData = intervealedData(self.staticAttributes, self.numVertices)
+            if self.staticBatcher!=None and \
+                    self.staticBatcher.addSegment(self, indexData, staticData):
+                # the batcher uploads the data together with other segments
+                return
+            self.createArenaVBOs(arena, indexData, staticData,
+                                 self.staticAttributes, self.dynamicAttributes)
+        else:
+            self.indexVBO = VBO(data=indexData,
+                                attributes=[],
+                                segment=self,
+                                bufferSize=indexData.nbytes,
+                                target=gl.GL_ELEMENT_ARRAY_BUFFER,
+                                usage=gl.GL_STATIC_DRAW)
+            # vbo containing static vertex data that cannot be changed
+            self.staticVBO = StaticIntervealedVBO(
+                                attributes=self.staticAttributes,
+                                segment=self,
+                                target=gl.GL_ARRAY_BUFFER)
+            self.createDynamicVBOs(self.dynamicAttributes)
+    
+    def createArenaVBOs(self, arena, indexData, staticData,
+                        staticAttributes, dynamicAttributes):
+        """
+        saves static data in buffers shared with other segments.
+        """
+        self.indexVBO = ArenaVBO(arena=arena,
+                                 data=indexData,
+                                 attributes=[],
+                                 segment=self,
+                                 target=gl.GL_ELEMENT_ARRAY_BUFFER,
+                                 alignment=max(4, indexData.itemsize))
+        self.staticVBO = ArenaVBO(arena=arena,
+                                  data=staticData,
+                                  attributes=staticAttributes,
+                                  segment=self,
+                                  target=gl.GL_ARRAY_BUFFER,
+                                  alignment=16)
+        self.createDynamicVBOs(dynamicAttributes)
+    
+    def createDynamicVBOs(self, dynamicAttributes):
+        """
+        creates the vbo for animations and the vertex array
+        after the static vbos were created.
+        """
         # vertex data for animations
         self.dynamicVBO = DynamicIntervealedVBO(
-                            attributes=self.dynamicAttributes,
+                            attributes=dynamicAttributes,
                             segment=self,
                             target=gl.GL_ARRAY_BUFFER)
+        
+        if vertexArraysSupported():
+            # the attribute pointers are set once here
+            # instead of each time the segment is drawn.
+            vbos = [self.indexVBO, self.staticVBO, self.dynamicVBO]
+            if self.instances!=None:
+                vbos.append(self.instances)
+            self.vertexArray = VertexArray(vbos)
+    
+    def deleteVBOs(self):
+        """
+        deletes the vbos of the segment,
+        ranges in shared buffers can be used by other segments then.
+        """
+        for vbo in [self.vertexArray, self.indexVBO, self.staticVBO, self.dynamicVBO]:
+            if vbo!=None:
+                vbo.delete()
+        self.vertexArray = None
+        self.indexVBO = None
+        self.staticVBO = None
+        self.dynamicVBO = None
     
     def enableStaticStates(self):
         IndexedSegment.enableStaticStates(self)
-        self.indexVBO.bind()
-        self.staticVBO.bind()
-        self.staticVBO.bindAttributes()
+        if self.vertexArray!=None:
+            self.vertexArray.bind()
+        else:
+            self.indexVBO.bind()
+            self.staticVBO.bind()
+            self.staticVBO.bindAttributes()
+            if self.instances!=None:
+                self.instances.bind()
+                self.instances.bindAttributes()
+    def disableStaticStates(self):
+        IndexedSegment.disableStaticStates(self)
+        if self.vertexArray!=None:
+            # other code must not change the vertex array
+            self.vertexArray.unbind()
+        elif self.instances!=None:
+            # segments drawn next must not read the instance attributes
+            self.instances.unbind()
     def enableDynamicStates(self):
         IndexedSegment.enableDynamicStates(self)
-        self.dynamicVBO.bind()
-        self.dynamicVBO.bindAttributes()
+        # upload animated vertex data changed since the last draw
+        self.dynamicVBO.doSetSlices()
+        # the uploaded data may be in an other region of the vbo
+        if self.vertexArray==None or self.dynamicVBO.regionChanged:
+            self.dynamicVBO.bind()
+            self.dynamicVBO.bindAttributes()
     
     def drawSegment(self):
-        gl.glDrawElements(self.faceType,
-                          self.numIndexes,
-                          self.indextype,
-                          self.indexVBO)
-        # usefull if one vbo manages multiple segments
-        #gl.glDrawRangeElements(self.faceType,
-        #                       0, self.numVertices-1,
-        #                       self.numIndexes,
-        #                       self.indextype,
-        #                       self.indexVBO)
-
-
+        # vertices of the segment may be stored in a buffer
+        # shared with other segments, the range of used vertices
+        # tells gl which part of the buffer is accessed.
+        if self.lodLevel > 0:
+            # levels of detail are triangle lists
+            (offset, numIndexes) = self.lodRanges[self.lodLevel]
+            faceType = gl.GL_TRIANGLES
+        else:
+            (offset, numIndexes) = (0, self.numIndexes)
+            faceType = self.faceType
+        if self.instances!=None:
+            if self.instances.count>0:
+                gl.glDrawElementsInstanced(faceType,
+                                           numIndexes,
+                                           self.indextype,
+                                           self.indexVBO + offset,
+                                           self.instances.count)
+            return
+        gl.glDrawRangeElements(faceType,
+                               0, self.numVertices-1,
+                               numIndexes,
+                               self.indextype,
+                               self.indexVBO + offset)
@@ -0,0 +1,129 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+"""
+reordering of triangle index arrays for the post transform vertex cache.
+triangles are ordered with the linear speed tipsify algorithm,
+vertices in order of their first use by the triangles.
+@see: http://gfx.cs.princeton.edu/pubs/Sander_2007_%3ETR/tipsy.pdf
+"""
+
+import numpy
+
+# default number of vertices in the post transform cache
+VERTEX_CACHE_SIZE = 32
+
+def averageCacheMissRatio(indexes, cacheSize=VERTEX_CACHE_SIZE):
+    """
+    simulates a fifo vertex cache and returns the
+    average number of cache misses per triangle (ACMR).
+    """
+    numTriangles = len(indexes)/3
+    if numTriangles==0:
+        return 0.0
+    indexes = numpy.asarray(indexes).tolist()
+
+    # a vertex is cached until @cacheSize other vertices missed
+    misses = 0
+    missStamps = [-cacheSize-1]*(max(indexes)+1)
+    for v in indexes:
+        if misses - missStamps[v] > cacheSize:
+            missStamps[v] = misses
+            misses += 1
+
+    return float(misses)/numTriangles
+
+def _vertexTriangles(indexes, numVertices):
+    """
+    returns a list of adjacent triangles for each vertex.
+    """
+    corners = numpy.argsort(indexes, kind='mergesort')
+    ends = numpy.cumsum(numpy.bincount(indexes, minlength=numVertices))
+    triangles = (corners/3).tolist()
+    return map(lambda (start, end): triangles[start:end],
+               zip([0] + ends[:-1].tolist(), ends.tolist()))
+
+def optimizeTriangleOrder(indexes, numVertices, cacheSize=VERTEX_CACHE_SIZE):
+    """
+    returns the new order of the triangles in the index array
+    for a vertex cache with @cacheSize entries.
+    triangles are emitted in fans around vertices that are likely
+    in the cache, in linear time of the number of triangles.
+    """
+    indexes = numpy.asarray(indexes, 'int64')
+    numTriangles = len(indexes)/3
+    if numTriangles==0:
+        return numpy.zeros(0, 'int64')
+
+    adjacency = _vertexTriangles(indexes, numVertices)
+    triangleIndexes = indexes.reshape((numTriangles, 3)).tolist()
+    # number of not emitted triangles per vertex
+    liveTriangles = map(len, adjacency)
+    # time stamps of vertices entering the cache
+    cacheTimes = [0]*numVertices
+    isEmitted = [False]*numTriangles
+    # vertices of emitted triangles, used to leave dead ends
+    deadEndStack = []
+
+    time = cacheSize+1
+    cursor = 0
+    order = []
+    fanVertex = 0
+    while fanVertex >= 0:
+        candidates = []
+        for t in adjacency[fanVertex]:
+            if isEmitted[t]: continue
+            isEmitted[t] = True
+            order.append(t)
+            for v in triangleIndexes[t]:
+                deadEndStack.append(v)
+                candidates.append(v)
+                liveTriangles[v] -= 1
+                if time - cacheTimes[v] > cacheSize:
+                    cacheTimes[v] = time
+                    time += 1
+
+        # next fan around the candidate that stays longest in the cache,
+        # as long as its triangles do not push it out of the cache.
+        fanVertex = -1
+        bestPriority = -1
+        for v in candidates:
+            if liveTriangles[v] > 0:
+                priority = 0
+                if time - cacheTimes[v] + 2*liveTriangles[v] <= cacheSize:
+                    priority = time - cacheTimes[v]
+                if priority > bestPriority:
+                    bestPriority = priority
+                    fanVertex = v
+
+        if fanVertex == -1:
+            # dead end, use the most recent vertex with live triangles
+            while deadEndStack:
+                v = deadEndStack.pop()
+                if liveTriangles[v] > 0:
+                    fanVertex = v
+                    break
+        if fanVertex == -1:
+            while cursor < numVertices:
+                if liveTriangles[cursor] > 0:
+                    fanVertex = cursor
+                    break
+                cursor += 1
+
+    return numpy.array(order, 'int64')
+
+def vertexFetchOrder(indexes, numVertices):
+    """
+    returns the old vertex index for each new vertex index,
+    vertices are sorted by their first use in the index array.
+    unused vertices are moved to the end.
+    """
+    (usedVertices, firstUses) = numpy.unique(indexes, return_index=True)
+    isUnused = numpy.ones(numVertices, bool)
+    isUnused[usedVertices] = False
+    return numpy.concatenate((usedVertices[numpy.argsort(firstUses)],
+                              numpy.nonzero(isUnused)[0])).astype('int64')
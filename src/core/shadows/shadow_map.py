@@ -11,13 +11,14 @@ OpenGL = importGL()
 import OpenGL.GL as gl
 from OpenGL.GL import glLoadMatrixf, glMultMatrixf, glMatrixMode,glGetFloatv,\
                       glLoadIdentity, GL_PROJECTION, GL_MODELVIEW, glViewport,\
-                      GL_LINEAR, glUseProgram, GL_DEPTH_BUFFER_BIT, glDrawBuffer, glClear, GL_NONE
+                      GL_LINEAR, GL_DEPTH_BUFFER_BIT, glDrawBuffer, glClear, GL_NONE
 from OpenGL.GL import GL_CLAMP_TO_EDGE, GL_LEQUAL, GL_COMPARE_R_TO_TEXTURE, GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MATRIX, GL_DEPTH_COMPONENT24, GL_FLOAT
 from OpenGL.GL.framebufferobjects import \
         glGenFramebuffers, glBindFramebuffer, glFramebufferTextureLayer, GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT
 from OpenGL.GLU import gluLookAt
 
 from shader.shader_utils import compileProgram
+from core.gl_state_cache import stateCache
 
 from core.camera import DirectionalCamera, Camera
 from core.textures.texture import DepthTexture3D
@@ -272,9 +273,9 @@ class VisualizeDepthShader(object):
     def __init__(self):
         self.program = compileProgram(VisualizeDepthShaderVert, None, VisualizeDepthShaderFrag)
     def enable(self):
-        glUseProgram(self.program)
+        stateCache.useProgram(self.program)
     def disable(self):
-        glUseProgram(0)
+        stateCache.useProgram(0)
 
 #### SPOT LIGHTS: Simple Shadow Mapping ####
 
@@ -369,6 +370,9 @@ class DirectionalShadowCamera(ShadowCamera):
                            self.updateProjectionMatrix )
         app.sceneCamera.signalConnect( Camera.CAMERA_MODELVIEW_SIGNAL,
                                        self.updateProjectionMatrix )
+        # and on the scene and caster bounds
+        app.signalConnect( GLApp.APP_SCENE_BOUNDS_CHANGED,
+                           self.updateProjectionMatrix )
     
     def enable(self):
         # setup projection and model view matrix
@@ -406,6 +410,8 @@ class DirectionalShadowCamera(ShadowCamera):
         
         # make sure we do not update multiple times per frame
         if self._projectionUpdatedThisFrame: return
+        # the crop needs the scene bounds
+        if self.app.sceneBounds==None: return
         self._projectionUpdatedThisFrame = True
         
         self.projectionCropMatrix,\
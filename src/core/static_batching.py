@@ -0,0 +1,325 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+from utils.gl_config import importGL
+OpenGL = importGL()
+from OpenGL import GL as gl
+from OpenGL.raw.GL.VERSION.GL_1_4 import glMultiDrawElements as glMultiDrawElementsRAW
+
+import ctypes
+import numpy
+
+from core.model import Model
+from core.vbo import ArenaVBO, VertexArray, vertexArraysSupported, intervealedType
+from core.segments.segment import ModelSegment
+from utils.algebra.culling import frustumPlanes, visibleBounds
+
+# set to False for drawing all members of a batch without testing them against the frustum
+USE_MEMBER_CULLING = True
+
+# states that are baked into the vertices of batched segments
+_TRANSFORMATION_STATES = ['translation', 'rotation', 'scaling']
+
+def _hasOnlyStaticTransformation(obj):
+    """
+    returns True if the object has no states besides
+    a static translation, rotation and scaling.
+    """
+    if obj.stateGroups or obj.hasDynamicTransformation():
+        return False
+    for name in obj.states.keys():
+        if name not in _TRANSFORMATION_STATES:
+            return False
+    return True
+
+def _transformVertices(records, mat):
+    """
+    transforms positions, normals and tangents of the vertex records to world space.
+    """
+    names = records.dtype.names
+    rot = mat[:3,:3]
+    positions = records['vertexPosition'].astype('float64')
+    records['vertexPosition'] = numpy.dot(positions, rot.T) + mat[:3,3]
+    if 'vertexNormal' in names:
+        normals = numpy.dot(records['vertexNormal'].astype('float64'), numpy.linalg.inv(rot))
+        lengths = numpy.sqrt((normals**2).sum(axis=1))
+        lengths[lengths==0.0] = 1.0
+        records['vertexNormal'] = normals / lengths[:,numpy.newaxis]
+    if 'vertexTangent' in names:
+        tangents = records['vertexTangent']
+        directions = numpy.dot(tangents[:,:3].astype('float64'), rot.T)
+        lengths = numpy.sqrt((directions**2).sum(axis=1))
+        lengths[lengths==0.0] = 1.0
+        tangents[:,:3] = directions / lengths[:,numpy.newaxis]
+
+class _BatchMember(object):
+    """
+    vertex data of a segment waiting to be merged.
+    """
+    def __init__(self, model, segment, indexData, staticData):
+        self.model = model
+        self.segment = segment
+        self.indexData = indexData
+        self.staticData = staticData
+        # the segment deletes its attribute lists after create
+        self.attributes = segment.staticAttributes
+        self.dynamicAttributes = segment.dynamicAttributes
+
+class BatchSegment(ModelSegment):
+    """
+    static segments with the same shader, material and vertex layout
+    merged into one vertex and index range.
+    vertices are transformed to world space on load, the index range
+    of each member is kept, so members outside the view frustum
+    are skipped by the glMultiDrawElements call.
+    """
+    def __init__(self, name, members, arena):
+        first = members[0].segment
+        ModelSegment.__init__(self, name, {'material': first.material})
+        # the merged segments share the generated shader
+        self.app = first.app
+        self.lights = first.lights
+        self.enabledLights = first.enabledLights
+        self.shaderProgram = first.shaderProgram
+        self.shader = first.shader
+        self.renderPass = first.renderPass
+        self.castsShadows = first.castsShadows
+        self.faceType = first.faceType
+        self.hidden = False
+        self.created = True
+        self.segmentIDs = map(lambda m: m.segment.segmentID, members)
+
+        # merge the vertex data
+        vertexCounts = map(lambda m: m.segment.numVertices, members)
+        self.numVertices = sum(vertexCounts)
+        if self.numVertices<0xFFFF:
+            self.dtype = 'uint16'
+            self.indextype = gl.GL_UNSIGNED_SHORT
+        else:
+            self.dtype = 'uint32'
+            self.indextype = gl.GL_UNSIGNED_INT
+        attributes = members[0].attributes
+        recordType = intervealedType(attributes)
+        records = []
+        indexes = []
+        vertexOffset = 0
+        for i in range(len(members)):
+            member = members[i]
+            data = member.staticData.view(recordType).copy()
+            _transformVertices(data, numpy.dot(member.model.getTransformation(),
+                                               member.segment.getTransformation()))
+            records.append(data)
+            # only the full resolution indexes are merged
+            memberIndexes = member.indexData[:member.segment.numIndexes]
+            indexes.append(memberIndexes.astype(self.dtype) + vertexOffset)
+            vertexOffset += vertexCounts[i]
+        records = numpy.concatenate(records)
+        indexData = numpy.concatenate(indexes).astype(self.dtype)
+
+        # (index, count) range of each member
+        indexCounts = map(len, indexes)
+        self.memberCounts = numpy.array(indexCounts, 'int32')
+        self.memberOffsets = numpy.cumsum([0] + indexCounts[:-1]).astype('int64')
+        self.numIndexes = int(self.memberCounts.sum())
+
+        # world space bounds of the members
+        positions = records['vertexPosition']
+        boxMin = numpy.empty((len(members),3))
+        boxMax = numpy.empty((len(members),3))
+        start = 0
+        for i in range(len(members)):
+            memberPositions = positions[start:start+vertexCounts[i]]
+            boxMin[i] = memberPositions.min(axis=0)
+            boxMax[i] = memberPositions.max(axis=0)
+            start += vertexCounts[i]
+        self.centers = numpy.ascontiguousarray(0.5*(boxMin + boxMax), 'float32')
+        self.extents = numpy.ascontiguousarray(0.5*(boxMax - boxMin), 'float32')
+        self.radii = numpy.sqrt((self.extents**2).sum(axis=1)).astype('float32')
+        self.boundingBox = (boxMin.min(axis=0), boxMax.max(axis=0))
+        center = 0.5*(self.boundingBox[0] + self.boundingBox[1])
+        self.boundingSphere = (center,
+                float(numpy.sqrt(((positions - center)**2).sum(axis=1).max())))
+
+        self.indexVBO = ArenaVBO(arena=arena,
+                                 data=indexData,
+                                 attributes=[],
+                                 segment=self,
+                                 target=gl.GL_ELEMENT_ARRAY_BUFFER,
+                                 alignment=4)
+        self.staticVBO = ArenaVBO(arena=arena,
+                                  data=records.view('uint8'),
+                                  attributes=attributes,
+                                  segment=self,
+                                  target=gl.GL_ARRAY_BUFFER,
+                                  alignment=16)
+        if vertexArraysSupported():
+            self.vertexArray = VertexArray([self.indexVBO, self.staticVBO])
+        else:
+            self.vertexArray = None
+        self.postCreate()
+
+    def deleteVBOs(self):
+        for vbo in [self.vertexArray, self.indexVBO, self.staticVBO]:
+            if vbo!=None:
+                vbo.delete()
+        self.vertexArray = None
+        self.indexVBO = None
+        self.staticVBO = None
+
+    def enableStaticStates(self):
+        ModelSegment.enableStaticStates(self)
+        if self.vertexArray!=None:
+            self.vertexArray.bind()
+        else:
+            self.indexVBO.bind()
+            self.staticVBO.bind()
+            self.staticVBO.bindAttributes()
+    def disableStaticStates(self):
+        ModelSegment.disableStaticStates(self)
+        if self.vertexArray!=None:
+            self.vertexArray.unbind()
+
+    def visibleMembers(self):
+        """
+        returns the index ranges of the members intersecting the view frustum.
+        """
+        if not USE_MEMBER_CULLING:
+            return (self.memberCounts, self.memberOffsets)
+        # vertices are in world space, the model view matrix is the view matrix
+        planes = frustumPlanes(numpy.asarray(gl.glGetFloatv(gl.GL_PROJECTION_MATRIX), 'float32'),
+                               numpy.asarray(gl.glGetFloatv(gl.GL_MODELVIEW_MATRIX), 'float32'))
+        visible = numpy.flatnonzero(visibleBounds(planes, self.centers, self.radii, self.extents))
+        if len(visible)==len(self.memberCounts):
+            return (self.memberCounts, self.memberOffsets)
+        return (self.memberCounts[visible], self.memberOffsets[visible])
+
+    def drawSegment(self):
+        (counts, offsets) = self.visibleMembers()
+        if len(counts)==0: return
+        itemSize = numpy.dtype(self.dtype).itemsize
+        pointers = (self.indexVBO.offset + offsets*itemSize).astype('uint64')
+        glMultiDrawElementsRAW(self.faceType,
+                               counts,
+                               self.indextype,
+                               pointers.ctypes.data_as(ctypes.POINTER(ctypes.c_void_p)),
+                               len(counts))
+
+class StaticBatchModel(Model):
+    """
+    model drawing the static batches of segments with the same lights.
+    the merged segments were removed from their models,
+    the batch model owns them now.
+    """
+    def __init__(self, segments, lights):
+        Model.__init__(self, segments, {})
+        self.lights = lights
+
+    def selectLODs(self, app):
+        """
+        batches are drawn with the full resolution.
+        """
+        pass
+
+class StaticBatcher(object):
+    """
+    collects the vertex data of static segments while models are created
+    and merges segments with the same shader, material and vertex layout.
+    segments with levels of detail are merged at full resolution.
+    models must not be moved after batching.
+    """
+    def __init__(self, arena):
+        self.arena = arena
+        # the model of each segment that may be batched
+        self.segmentModels = {}
+        # members of each batch key
+        self.groups = {}
+        self.groupKeys = []
+
+    def addModel(self, model):
+        """
+        lets the static segments of the model join batches,
+        must be called before the model is created.
+        """
+        if hasattr(model, 'instances') or not model.isLoaded():
+            return
+        if not _hasOnlyStaticTransformation(model):
+            return
+        for segment in model.segments:
+            if not hasattr(segment, 'staticBatcher'):
+                continue
+            if segment.isPlanar or not _hasOnlyStaticTransformation(segment):
+                continue
+            segment.staticBatcher = self
+            self.segmentModels[id(segment)] = (model, segment)
+
+    def batchKey(self, model, segment):
+        return (segment.shaderProgram,
+                id(segment.shader),
+                id(segment.material),
+                segment.faceType,
+                segment.renderPass,
+                segment.castsShadows,
+                str(intervealedType(segment.staticAttributes).descr),
+                tuple(map(id, model.lights)))
+
+    def addSegment(self, segment, indexData, staticData):
+        """
+        called by segments when their vbos are created.
+        returns False if the segment must create its own vbos.
+        """
+        try:
+            (model, _) = self.segmentModels[id(segment)]
+        except KeyError:
+            return False
+        if segment.dynamicAttributes or \
+                segment.instances!=None or not segment.staticAttributes or \
+                segment.isReflecting() or segment.usesProjectiveTexture():
+            return False
+        key = self.batchKey(model, segment)
+        if key not in self.groups:
+            self.groups[key] = []
+            self.groupKeys.append(key)
+        self.groups[key].append( _BatchMember(model, segment, indexData, staticData) )
+        return True
+
+    def createBatches(self):
+        """
+        merges the collected segments and removes them from their models.
+        segments without other segments to merge with get their own vbos.
+        returns a model for each set of lights drawing the batches.
+        """
+        batchModels = []
+        modelLights = {}
+        numBatches = 0
+        for key in self.groupKeys:
+            members = self.groups[key]
+            if len(members)==1:
+                member = members[0]
+                member.segment.createArenaVBOs(self.arena, member.indexData, member.staticData,
+                                               member.attributes, member.dynamicAttributes)
+                continue
+            batch = BatchSegment("batch%d" % numBatches, members, self.arena)
+            numBatches += 1
+            for member in members:
+                member.model.segments.remove(member.segment)
+                # the batch draws the full resolution indexes only
+                member.segment.lodErrors = []
+                member.segment.lodRanges = []
+                member.segment.lodLevel = 0
+            lights = members[0].model.lights
+            batchModel = modelLights.get(key[-1])
+            if batchModel==None:
+                batchModel = StaticBatchModel([], lights)
+                modelLights[key[-1]] = batchModel
+                batchModels.append(batchModel)
+            batchModel.segments.append(batch)
+        for (_, segment) in self.segmentModels.values():
+            segment.staticBatcher = None
+        self.segmentModels = {}
+        self.groups = {}
+        self.groupKeys = []
+        return batchModels
@@ -9,6 +9,8 @@ from utils.gl_config import importGL
 OpenGL = importGL()
 from OpenGL import GL as gl
 
+from core.gl_state_cache import stateCache
+
 from numpy import matrix as NumpyMatrix
 
 class ProjectiveTextureMatrix(object):
@@ -50,7 +52,7 @@ class ProjectiveTextureMatrix(object):
         in the scene rendering pass.
         """
         gl.glMatrixMode(gl.GL_TEXTURE)
-        gl.glActiveTexture(gl.GL_TEXTURE0 + texUnit)
+        stateCache.activeTexture(texUnit)
         self.loadMatrix()
         gl.glMatrixMode(gl.GL_MODELVIEW)
 
@@ -9,6 +9,8 @@ from utils.gl_config import importGL
 OpenGL = importGL()
 from OpenGL import GL as gl
 
+from core.gl_state_cache import stateCache
+
 from pygame import image
 
 # TODO: textures could define states for texture matrix manipulation.
@@ -140,14 +142,23 @@ class Texture(object):
         self.mapTo = [self.MAP_TO_COL]
     
     def __del__(self):
+        self.delete()
+    
+    def delete(self):
+        """
+        deletes the gl texture, create() can be called again afterwards.
+        """
+        if self.glID==-1: return
         gl.glDeleteTextures([self.glID])
+        self.glID = -1
+        # the name may be used by a new texture
+        stateCache.forgetTextures(self.targetType)
     
     def create(self):
-        if self.glID!=-1:
-            gl.glDeleteTextures([self.glID])
+        self.delete()
         
         self.glID = gl.glGenTextures(1)
-        gl.glBindTexture(self.targetType, self.glID)
+        stateCache.bindTexture(self.targetType, self.glID)
         
         gl.glTexEnvf(gl.GL_TEXTURE_ENV,
                      gl.GL_TEXTURE_ENV_MODE,
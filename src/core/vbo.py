@@ -9,12 +9,71 @@ from utils.gl_config import importGL
 OpenGL = importGL()
 from OpenGL import GL as gl
 from OpenGL.arrays.arraydatatype import ArrayDatatype
-from OpenGL.arrays.vbo import VBO as GLVBO
+from OpenGL.arrays.vbo import VBO as GLVBO, VBOOffset
 from OpenGL.raw.GL.VERSION.GL_1_5 import glBindBuffer as glBindBufferRAW
 
 import numpy
 
 from utils.util import doNothing
+from core.gl_state_cache import stateCache
+
+# set to False for binding vbos and attribute pointers for each draw
+USE_VERTEX_ARRAYS = True
+_vertexArraysSupported = None
+
+def vertexArraysSupported():
+    """
+    returns True if vertex array objects should be used.
+    needs a gl context.
+    """
+    global _vertexArraysSupported
+    if not USE_VERTEX_ARRAYS:
+        return False
+    if _vertexArraysSupported==None:
+        _vertexArraysSupported = bool(gl.glGenVertexArrays)
+        if not _vertexArraysSupported:
+            print "WARNING: vertex array objects not supported."
+    return _vertexArraysSupported
+
+def _attributeLocations(segment, attributes):
+    """
+    looks up the shader locations of the attributes,
+    returns the attributes used by the shader.
+    """
+    usedAttributes = []
+    for att in attributes:
+        att.location = gl.glGetAttribLocation(segment.shaderProgram, att.name)
+        if att.location!=-1:
+            usedAttributes.append(att)
+        else:
+            print "WARNING: cannot find attribute %s in shader" % att.name
+    return usedAttributes
+
+# dynamic updates changing less then this fraction of the data
+# are copied to the buffer in use with glBufferSubData.
+SUB_DATA_FRACTION = 0.1
+# dynamic updates changing more then this fraction of the data
+# orphan the buffer, gl allocates new storage for it then.
+ORPHAN_FRACTION = 0.5
+# dirty ranges closer then this number of bytes are uploaded as one range
+MERGE_GAP = 64
+# number of regions in the buffer of dynamic vbos,
+# updates in between the fractions above go to the next region.
+DYNAMIC_RING_SIZE = 3
+
+def mergeRanges(ranges, gap=0):
+    """
+    merges overlapping (start, end) byte ranges and ranges
+    with less then @gap bytes in between, returns sorted ranges.
+    """
+    merged = []
+    for (start, end) in sorted(ranges):
+        if merged and start <= merged[-1][1] + gap:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append( (start, end) )
+    return merged
 
 class VBO(GLVBO):
     def __init__(self,
@@ -23,65 +82,148 @@ class VBO(GLVBO):
                  segment,
                  bufferSize,
                  target=gl.GL_ARRAY_BUFFER,
-                 usage=gl.GL_STATIC_DRAW):
+                 usage=gl.GL_STATIC_DRAW,
+                 ringSize=1):
         self.target = target
         self.usage = usage
+        # queued dirty ranges
+        self.slices = []
+        # True if the attribute pointers must be set again
+        self.regionChanged = False
         
         if data==None or data.size==0:
             self.bind = doNothing
             self.bindAttributes = doNothing
             self.unbind = doNothing
+            self.delete = doNothing
+            self.doSetSlices = doNothing
             return
         
+        # the buffer has @ringSize regions of the data size,
+        # the attribute pointers point to the region written last.
+        self.ringSize = ringSize
+        self.regionSize = bufferSize
+        self.region = 0
+        self.regionOffset = 0
+        # ranges changed since each region was written the last time
+        self.pendingRanges = map(lambda i: [], range(ringSize))
+        # copy of the data in the region used for drawing
+        self.shadowData = data
+        if ringSize>1:
+            data = numpy.tile(data, ringSize)
+        
         GLVBO.__init__(self,
                        data=data,
                        usage=usage,
                        target=target,
-                       size=bufferSize)
+                       size=bufferSize*ringSize)
         
         self.segment = segment
         
         # GLVertexAttribute instances
         self.attributes = []
         
-        # queued slices
-        self.slices = []
-        
         self.DUMMY = False
         
         # remember attribute locations in the shader
-        for att in attributes:
-            att.location = gl.glGetAttribLocation(segment.shaderProgram, att.name)
-            if att.location!=-1:
-                self.attributes.append(att)
-            else:
-                print "WARNING: cannot find attribute %s in shader" % att.name
+        self.attributes = _attributeLocations(segment, attributes)
     
     def queueSetSlice(self, start, size, data):
         """
         adds a data slice for later uploading to gl.
         """
-        self.slices.append( (start, size, data) )
+        data = numpy.ascontiguousarray(data).view('uint8').ravel()
+        self.shadowData[start:start+size] = data[:size]
+        self.slices.append( (start, start+size) )
     def doSetSlices(self):
         """
         insert previously queued slice data into vbo.
+        overlapping and close slices are uploaded together.
+        depending on the changed fraction of the data the slices are
+        copied to the region in use, to the next region of the buffer
+        or the buffer is orphaned.
         """
-        for (start, size, data) in self.slices:
-            self.setSlice(start, size, data)
+        if not self.slices: return
+        ranges = mergeRanges(self.slices, MERGE_GAP)
         self.slices = []
+        
+        dirtySize = sum(map(lambda (start, end): end-start, ranges))
+        fraction = float(dirtySize)/self.regionSize
+        
+        GLVBO.bind(self)
+        stateCache.forgetBuffer(self.target)
+        if fraction >= ORPHAN_FRACTION:
+            self.orphan()
+            return
+        
+        if fraction < SUB_DATA_FRACTION or self.ringSize==1:
+            # small update, gl may have to wait for draws using the region
+            region = self.region
+        else:
+            # the next region was not used for the last draws
+            region = (self.region+1) % self.ringSize
+        # all other regions, also the one used before, miss the ranges
+        for i in range(self.ringSize):
+            if i!=region:
+                self.pendingRanges[i] = mergeRanges(
+                        self.pendingRanges[i] + ranges, MERGE_GAP)
+        if region==self.region:
+            for (start, end) in ranges:
+                self.uploadRange(self.regionOffset, start, end)
+        else:
+            # the region gets the ranges changed since it was written
+            self.region = region
+            self.regionOffset = self.region*self.regionSize
+            for (start, end) in mergeRanges(self.pendingRanges[self.region] + ranges, MERGE_GAP):
+                self.uploadRange(self.regionOffset, start, end)
+            self.pendingRanges[self.region] = []
+            self.regionChanged = True
+    
+    def orphan(self):
+        """
+        lets gl allocate new storage for the buffer and
+        copies all data into the first region.
+        draws using the old storage do not block the upload.
+        """
+        gl.glBufferData(self.target, self.regionSize*self.ringSize, None, self.usage)
+        self.uploadRange(0, 0, self.regionSize)
+        self.regionChanged = self.regionChanged or self.region!=0
+        self.region = 0
+        self.regionOffset = 0
+        self.pendingRanges = [[]] + map(lambda i: [(0, self.regionSize)],
+                                        range(self.ringSize-1))
+    
+    def uploadRange(self, regionOffset, start, end):
+        """
+        copies a range of the data to the region at @regionOffset.
+        the buffer must be bound.
+        """
+        gl.glBufferSubData(self.target, regionOffset + start, end - start,
+                           ArrayDatatype.voidDataPointer(self.shadowData[start:end]))
     
     def setSlice(self, start, size, data):
         """
-        sets a slice of data.
+        sets a slice of data now, queued slices are uploaded too.
+        the shadow copy is updated, so regions written later get the slice.
+        """
+        self.queueSetSlice(start, size, data)
+        self.doSetSlices()
+    
+    def attributeRange(self, att):
+        """
+        returns the (start, end) byte range of an attribute.
         """
-        dataptr = ArrayDatatype.voidDataPointer( data )
-        gl.glBufferSubData( self.target, start, size, dataptr )
+        raise NotImplementedError
     
     def setAttributeData(self, attributeIndex, data):
         """
         updates data for one attribute only.
+        the data is uploaded with the next doSetSlices call.
         """
-        raise NotImplementedError
+        att = self.attributes[attributeIndex]
+        records = self.shadowData.view(self.recordType)
+        records[att.name] = numpy.asarray(data).reshape(records[att.name].shape)
+        self.slices.append( self.attributeRange(att) )
     
     def bindAttributes(self):
         """
@@ -98,7 +240,8 @@ class VBO(GLVBO):
                                      att.dataType,
                                      normalize,
                                      att.stride,          # offset in data array to the next attribute
-                                     self + att.offset)   # offset in data array to the first attribute
+                                     self + (self.regionOffset + att.offset)) # offset in data array to the first attribute
+        self.regionChanged = False
     
     def bind(self):
         """
@@ -106,51 +249,59 @@ class VBO(GLVBO):
         needs to be done before accessing the vbo.
         """
         GLVBO.bind(self)
+        stateCache.forgetBuffer(self.target)
         for att in self.attributes:
             gl.glEnableVertexAttribArray( att.location )
 
 
+def _attributeBuffer(dtype, attributes, numRecords):
+    """
+    returns the bytes of a structured array with the attribute data in its fields.
+    """
+    if len(attributes)==0:
+        return numpy.zeros(0, 'uint8')
+    data = numpy.empty(numRecords, dtype)
+    for att in attributes:
+        data[att.name] = att.getArray().reshape(data[att.name].shape)
+    return data.view('uint8')
+
 class SerializedVBO(VBO):
     def __init__(self,
                  attributes,
                  segment,
                  target=gl.GL_ARRAY_BUFFER,
-                 usage=gl.GL_STATIC_DRAW):
-        vertexData = []
-        currOffset = 0
+                 usage=gl.GL_STATIC_DRAW,
+                 ringSize=1):
+        # all attributes of a type come one after another in the array,
+        # one record holds the data of all attributes.
+        dtype = numpy.dtype(map(lambda att:
+                (att.name, att.getDtype(), (segment.numVertices,)), attributes))
         for att in attributes:
-            # all attributes of this type come one after another in the array
             att.stride = 0
-            
             # offset in the serialized array where this attribute starts
-            att.offset = currOffset
-            currOffset += segment.numVertices * att.elementSize
-            
+            att.offset = dtype.fields[att.name][1]
             # calc size used by this attribute
-            att.size = att.elementSize * segment.numVertices
-            
-            # add the attribute data, att.data not needed afterwards
-            for d in att.data:
-                for i in range(len(d)):
-                    vertexData.append(d[i])
+            att.size = dtype.fields[att.name][0].itemsize
+        
+        # att.data not needed afterwards
+        data = _attributeBuffer(dtype, attributes, 1)
+        for att in attributes:
             del att.data
         
         VBO.__init__(self,
                      attributes=attributes,
                      segment=segment,
-                     data=numpy.array( vertexData, dtype='float32' ),
-                     bufferSize=currOffset,
+                     data=data,
+                     bufferSize=data.nbytes,
                      target=target,
-                     usage=usage)
+                     usage=usage,
+                     ringSize=ringSize)
         
-        self.bufferSize = currOffset
+        self.bufferSize = data.nbytes
+        self.recordType = dtype
     
-    def setAttributeData(self, attriuteIndex, data):
-        """
-        cheanges data for only one attribute.
-        """
-        att = self.attributes[attriuteIndex]
-        self.setSlice(start=att.offset, stop=att.size, data=data)
+    def attributeRange(self, att):
+        return (att.offset, att.offset + att.size)
     
 class DynamicSerializedVBO(SerializedVBO):
     def __init__(self,
@@ -161,7 +312,8 @@ class DynamicSerializedVBO(SerializedVBO):
                      attributes=attributes,
                      segment=segment,
                      target=target,
-                     usage=gl.GL_DYNAMIC_DRAW)
+                     usage=gl.GL_DYNAMIC_DRAW,
+                     ringSize=DYNAMIC_RING_SIZE)
 class StaticSerializedVBO(SerializedVBO):
     def __init__(self,
                  attributes,
@@ -173,43 +325,52 @@ class StaticSerializedVBO(SerializedVBO):
                      target=target,
                      usage=gl.GL_STATIC_DRAW)
 
+def intervealedType(attributes):
+    """
+    returns the record type of one vertex with a field for each attribute.
+    """
+    return numpy.dtype(map(lambda att: (att.name, att.getDtype()), attributes))
+
+def intervealedData(attributes, numVertices):
+    """
+    returns the bytes of the intervealed attribute data
+    and sets offset and stride of the attributes.
+    """
+    dtype = intervealedType(attributes)
+    for att in attributes:
+        # offset to the next attribute of this type (from start of this element).
+        att.stride = dtype.itemsize
+        # offset in the intervealed array where this attribute starts
+        att.offset = dtype.fields[att.name][1]
+    
+    # att.data will not be used anymore
+    data = _attributeBuffer(dtype, attributes, numVertices)
+    for att in attributes:
+        del att.data
+    return data
+
 class IntervealedVBO(VBO):
     def __init__(self,
                  attributes,
                  segment,
                  target=gl.GL_ARRAY_BUFFER,
-                 usage=gl.GL_STATIC_DRAW):
-        # add the attribute data
-        data = []
-        for i in range(segment.numVertices):
-            for att in attributes:
-                for d in att.data[i]:
-                    data.append(d)
-        
-        # get the attribute struct size
-        attributeStructSize = 0
-        for att in attributes:
-            attributeStructSize += att.elementSize
-        
-        attSize = 0
-        bufferSize = 0
-        for att in attributes:
-            # offset to the next attribute of this type (from start of this element).
-            att.stride = attributeStructSize
-            # offset in the intervealed array where this attribute starts
-            att.offset = attSize
-            attSize += att.elementSize
-            bufferSize += segment.numVertices * att.elementSize
-            # att.data will not be used anymore
-            del att.data
-        
+                 usage=gl.GL_STATIC_DRAW,
+                 ringSize=1):
+        self.recordType = intervealedType(attributes)
+        data = intervealedData(attributes, segment.numVertices)
         VBO.__init__(self,
                      attributes=attributes,
                      segment=segment,
-                     data=numpy.array( data, dtype='float32' ),
-                     bufferSize=bufferSize,
+                     data=data,
+                     bufferSize=data.nbytes,
                      target=target,
-                     usage=usage)
+                     usage=usage,
+                     ringSize=ringSize)
+    
+    def attributeRange(self, att):
+        # the attribute is spread over all vertices
+        size = self.recordType.fields[att.name][0].itemsize
+        return (att.offset, self.regionSize - self.recordType.itemsize + att.offset + size)
 
         
 class DynamicIntervealedVBO(IntervealedVBO):
@@ -221,7 +382,8 @@ class DynamicIntervealedVBO(IntervealedVBO):
                      attributes=attributes,
                      segment=segment,
                      target=target,
-                     usage=gl.GL_DYNAMIC_DRAW)
+                     usage=gl.GL_DYNAMIC_DRAW,
+                     ringSize=DYNAMIC_RING_SIZE)
 class StaticIntervealedVBO(IntervealedVBO):
     def __init__(self,
                  attributes,
@@ -232,3 +394,88 @@ class StaticIntervealedVBO(IntervealedVBO):
                      segment=segment,
                      target=target,
                      usage=gl.GL_STATIC_DRAW)
+
+class ArenaVBO(VBO):
+    """
+    vbo data in a range of a buffer shared with other segments.
+    """
+    def __init__(self,
+                 arena,
+                 data,
+                 attributes,
+                 segment,
+                 target=gl.GL_ARRAY_BUFFER,
+                 alignment=4):
+        self.target = target
+        self.arena = arena
+        self.buffer = None
+        self.regionOffset = 0
+        self.regionChanged = False
+        
+        if data is None or data.size==0:
+            self.bind = doNothing
+            self.bindAttributes = doNothing
+            self.unbind = doNothing
+            return
+        
+        self.segment = segment
+        self.slices = []
+        (self.buffer, self.offset) = arena.allocate(target, data, alignment)
+        self.size = data.nbytes
+        
+        # remember attribute locations in the shader
+        self.attributes = _attributeLocations(segment, attributes)
+    
+    def __add__(self, offset):
+        """
+        pointer to @offset in the range of the vbo.
+        """
+        return VBOOffset(self, self.offset + offset)
+    
+    def setSlice(self, start, size, data):
+        self.buffer.bind()
+        gl.glBufferSubData( self.target, self.offset + start, size,
+                            ArrayDatatype.voidDataPointer( data ) )
+    
+    def bind(self):
+        self.buffer.bind()
+        for att in self.attributes:
+            gl.glEnableVertexAttribArray( att.location )
+    
+    def unbind(self):
+        pass
+    
+    def delete(self):
+        """
+        frees the range for other segments.
+        """
+        if self.buffer==None: return
+        self.arena.free(self.buffer, self.offset, self.size)
+        self.buffer = None
+
+class VertexArray(object):
+    """
+    records the buffer bindings and attribute pointers of some vbos,
+    binding the vertex array replaces binding the vbos and
+    setting the attribute pointers.
+    """
+    def __init__(self, vbos):
+        self.glID = gl.glGenVertexArrays(1)
+        self.bind()
+        for vbo in vbos:
+            vbo.bind()
+            vbo.bindAttributes()
+        self.unbind()
+    
+    def bind(self):
+        # the element buffer binding is part of the vertex array state
+        stateCache.bindVertexArray(self.glID)
+    
+    def unbind(self):
+        stateCache.bindVertexArray(0)
+    
+    def delete(self):
+        gl.glDeleteVertexArrays(1, [self.glID])
+        # a bound vertex array is unbound
+        stateCache.forget(['vertexArray'])
+        stateCache.forgetBuffer(gl.GL_ELEMENT_ARRAY_BUFFER)
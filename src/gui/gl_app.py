@@ -11,13 +11,14 @@ from utils.gl_config import importGL, printGLInfo
 OpenGL = importGL()
 from OpenGL.GL import GL_CULL_FACE,\
                       GL_COMPILE,\
+                      GL_COLOR_MATERIAL,\
+                      GL_TEXTURE_2D,\
                       GL_PERSPECTIVE_CORRECTION_HINT,\
                       GL_NICEST
 from OpenGL.GL import glGenLists,\
                       glNewList,\
                       glCallList,\
                       glEndList,\
-                      glEnable,\
                       glHint
 
 import pygame
@@ -26,10 +27,13 @@ from pygame import image
 from pygame.display import flip as flipDisplay
 from pygame.event import get as getEvents
 
+from numpy import ones, float32
+
 from utils.algebra.matrix44 import getProjectionMatrix, getOrthogonalProjectionMatrix
 
 from core.free_type import FontData
 from core.gl_object import GLObject
+from core.gl_state_cache import stateCache
 
 from gui.input import JoyStick
 
@@ -41,6 +45,16 @@ isFullscreenEvent = \
 isQuitEvent = lambda e: e.type == KEYDOWN and \
     e.key == K_F4 and bool(e.mod & KMOD_ALT)
 
+def _boxPoints((boxMin, boxMax)):
+    """
+    returns the homogeneous corner points of a box.
+    """
+    points = ones((8,4), float32)
+    for i in range(8):
+        for k in range(3):
+            points[i,k] = boxMax[k] if (i>>k)&1 else boxMin[k]
+    return points
+
 class GLApp(GLObject):
     '''
     creates gl window and handles event management and drawing.
@@ -48,6 +62,7 @@ class GLApp(GLObject):
     
     APP_SIZE_SIGNAL = GLObject.signalCreate()
     APP_PROJECTION_CHANGED = GLObject.signalCreate()
+    APP_SCENE_BOUNDS_CHANGED = GLObject.signalCreate()
 
     def __init__(self,
                  winSize=(1024,768),
@@ -55,6 +70,7 @@ class GLApp(GLObject):
                  nearClip=1.0,
                  farClip=200.0,
                  fov=45.0,
+                 lodPixelError=1.0,
                  caption='OpenGL fun',
                  iconName=None,
                  useJoysticks=[0],
@@ -67,6 +83,7 @@ class GLApp(GLObject):
         # signal stuff
         self.signalRegister( GLApp.APP_SIZE_SIGNAL )
         self.signalRegister( GLApp.APP_PROJECTION_CHANGED )
+        self.signalRegister( GLApp.APP_SCENE_BOUNDS_CHANGED )
         
         self.modes = modes
         self.winSize = winSize
@@ -78,8 +95,14 @@ class GLApp(GLObject):
         self.nearClip = nearClip
         self.fov      = fov
         
+        # maximal screen space error of segment levels of detail in pixels,
+        # levels of detail are not used if this is zero.
+        self.lodPixelError = lodPixelError
+        
         self.caption = caption
         
+        # corner points of the scene box and of the shadow caster box,
+        # None until setSceneBounds() is called.
         self.sceneBounds = None
         
         # save the projection for faster calculations
@@ -137,11 +160,21 @@ class GLApp(GLObject):
         
         self.initGL()
     
-    def setSceneBounds(self, bounds, radius):
-        self.sceneBounds = ( bounds, radius )
+    def setSceneBounds(self, sceneBox, casterBox=None):
+        """
+        sets the (min, max) world space boxes around the scene and
+        around the shadow casters, shadow maps are cropped to them.
+        the caster box defaults to the scene box.
+        """
+        if casterBox is None:
+            casterBox = sceneBox
+        self.sceneBounds = ( _boxPoints(sceneBox), _boxPoints(casterBox) )
+        self.signalQueueEmit( GLApp.APP_SCENE_BOUNDS_CHANGED )
     
     def initGL(self):
-        glEnable(GL_CULL_FACE)
+        stateCache.enable(GL_CULL_FACE)
+        # material parameters are not changed by the current color
+        stateCache.disable(GL_COLOR_MATERIAL)
         glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)
     
     def __del__(self):
@@ -277,6 +310,9 @@ class GLApp(GLObject):
         
         # we expect to be in orthogonal projection now
         glCallList(self.fpsDisplayList)
+        # the list binds the glyph textures
+        stateCache.forgetTextures(GL_TEXTURE_2D)
+        stateCache.forget(['blendFunc'])
         
     def processEvent(self, event):
         """ process one event in queue """
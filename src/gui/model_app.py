@@ -17,21 +17,18 @@ from OpenGL.GL import GL_FRONT,\
                       GL_TEXTURE,\
                       GL_QUADS,\
                       GL_POLYGON_OFFSET_FILL,\
-                      GL_TEXTURE_2D
-from OpenGL.GL import glEnable, glDisable
+                      GL_TEXTURE_2D,\
+                      GL_BLEND
 from OpenGL.GL import glPushAttrib, glPopAttrib
 from OpenGL.GL import glPushMatrix,\
                       glPopMatrix,\
                       glMatrixMode,\
                       glLoadMatrixf,\
                       glLoadIdentity
-from OpenGL.GL import glCullFace
 from OpenGL.GL import glBegin, glEnd,\
                       glTexCoord2f,\
                       glVertex3f,\
                       glGetUniformLocation,\
-                      glBindTexture,\
-                      glUseProgram,\
                       glViewport,\
                       glClearColor,\
                       glPolygonOffset
@@ -54,6 +51,15 @@ from core.textures.texture import Texture2D, DepthTexture2D
 from core.shadows.shadow_map import VisualizeDepthShader
 from core.light.light import drawShadowMaps, Light
 from core.gl_object import GLObject
+from core.buffer_arena import BufferArena
+from core.render_queue import RenderQueue
+from core.frustum_culling import FrustumCuller
+from core.scene_bvh import SceneBVH
+from core.occlusion_culling import OcclusionCuller
+from core.static_batching import StaticBatcher
+from core.frame_compiler import FrameCompiler
+from core.frame_graph import FrameGraph
+from core.gl_state_cache import stateCache
 
 from utils.util import unique
 
@@ -77,17 +83,17 @@ def _drawSegmentGeometry(segment):
         segment.enableStates()
         segment.drawSegment()
         segment.disableStates()
-def _drawModelGeometry(model):
+def _drawModelGeometry(model, segments):
     # TODO: only handle geometry related states here !
     if model.popTransformations:
         glPushMatrix()
         model.enableStates()
-        map(_drawSegmentGeometry, model.segments)
+        map(_drawSegmentGeometry, segments)
         model.disableStates()
         glPopMatrix()
     else:
         model.enableStates()
-        map(_drawSegmentGeometry, model.segments)
+        map(_drawSegmentGeometry, segments)
         model.disableStates()
 
 
@@ -99,8 +105,8 @@ class ModelApp(GLApp):
     def __init__(self):
         self.models = []
         self.lights = []
-        # render to texture scenes
-        self.sceneFBOS = []
+        # render to texture passes drawn before the scene is drawn to the screen
+        self.frameGraph = FrameGraph()
         # all units <self.textureCounter are reserved
         self.textureCounter = 0
         self.textureMatrixCounter = 0
@@ -119,8 +125,29 @@ class ModelApp(GLApp):
         
         GLApp.__init__(self)
         
+        # static vertex data of all vbo segments
+        self.bufferArena = BufferArena()
+        # sorts segments of all models by the states they need,
+        # counts state changes per frame.
+        self.renderQueue = RenderQueue()
+        # hierarchy of the segment bounds for culling and scene queries
+        self.sceneBVH = SceneBVH()
+        # bounds version of the hierarchy the scene bounds were set for
+        self.sceneBoundsVersion = -1
+        # skips segments outside the frustum of each pass
+        self.frustumCuller = FrustumCuller(self.sceneBVH)
+        # skips occluded segments of the scene pass,
+        # only used after enableOcclusionCulling() was called.
+        self.occlusionCuller = None
+        # draws the render queue passes of the last frame again
+        # while the scene and the camera do not change.
+        self.frameCompiler = FrameCompiler(self.renderQueue, self.frustumCuller)
+        
         # camera for user movement
         self.sceneCamera = UserCamera(self)
+        self.sceneCamera.signalConnect( Camera.CAMERA_MODELVIEW_SIGNAL,
+                                        self.frameCompiler.invalidate )
+        self.signalConnect( GLApp.APP_PROJECTION_CHANGED, self.frameCompiler.invalidate )
         
         # create screen textures
         self.sceneTexture = Texture2D(width=self.winSize[0], height=self.winSize[1])
@@ -130,6 +157,8 @@ class ModelApp(GLApp):
         
         # a shader that only handles the depth
         self.depthShader = DepthShader()
+        # and one for instanced models
+        self.instancedDepthShader = DepthShader(instanced=True)
         self.visualizeDepthShader = VisualizeDepthShader()
         
         ### TESTING ###
@@ -160,6 +189,15 @@ class ModelApp(GLApp):
         self.signalConnect( GLApp.APP_PROJECTION_CHANGED, _loadProjectiveTextureMatrix )
         self.sceneCamera.signalConnect( Camera.CAMERA_MODELVIEW_SIGNAL, _loadProjectiveTextureMatrix )
     
+    def enableOcclusionCulling(self, passName='scene'):
+        """
+        skips segments of the pass that were occluded in the last frames.
+        """
+        if self.occlusionCuller!=None:
+            return
+        self.occlusionCuller = OcclusionCuller(passName)
+        self.frameCompiler.invalidate()
+    
     def addModel(self, model):
         """
         adds a model to this application.
@@ -167,8 +205,70 @@ class ModelApp(GLApp):
         self.models.append(model)
         self.lights += model.lights
         self.lights = unique( self.lights )
-        
-        for s in model.segments:
+        self.addSegments(model.segments)
+    def addStaticModels(self, models):
+        """
+        adds and creates models that are not moved anymore.
+        static segments with the same shader, material and vertex layout
+        are merged into batches drawn by new models, models without
+        segments left are not drawn. returns the batch models.
+        """
+        batcher = StaticBatcher(self.bufferArena)
+        for model in models:
+            batcher.addModel(model)
+            self.addModel(model)
+            model.create(self)
+        batchModels = batcher.createBatches()
+        for model in models:
+            if not model.segments:
+                self.models.remove(model)
+        for model in batchModels:
+            self.addModel(model)
+            model.create(self)
+        self.invalidateBounds()
+        return batchModels
+    def removeModel(self, model):
+        """
+        removes a model from this application,
+        buffer ranges of its segments are freed.
+        """
+        self.models.remove(model)
+        model.removeSegments(list(model.segments))
+        if hasattr(model, 'deleteInstances'):
+            model.deleteInstances()
+        self.invalidateBounds()
+    def invalidateBounds(self):
+        """
+        must be called if static segments were moved or states
+        changing the drawn segments were set, the bounds used
+        for culling and the compiled frame are calculated again.
+        """
+        self.frustumCuller.clear()
+        self.sceneBVH.invalidate()
+        self.frameCompiler.invalidate()
+        if self.occlusionCuller!=None:
+            self.occlusionCuller.clear()
+    def updateSceneBounds(self):
+        """
+        sets the scene bounds to the boxes around all segments
+        and around the segments casting shadows.
+        called each frame after the hierarchy was updated,
+        the bounds only change if the boxes changed.
+        """
+        if self.sceneBoundsVersion==self.sceneBVH.boundsVersion:
+            return
+        self.sceneBoundsVersion = self.sceneBVH.boundsVersion
+        if self.sceneBVH.sceneBox is None:
+            return
+        self.setSceneBounds(self.sceneBVH.sceneBox, self.sceneBVH.casterBox)
+    def addSegments(self, segments):
+        """
+        adds segments of a model to this application.
+        lazy models add their segments when they are loaded.
+        """
+        self.sceneBVH.invalidate()
+        self.frameCompiler.invalidate()
+        for s in segments:
             if s.usesProjectiveTexture():
                 self.enableProjectiveTextures()
                 break
@@ -177,30 +277,54 @@ class ModelApp(GLApp):
         """
         prepends a render to texture operation before scene rendering is done.
         """
-        self.sceneFBOS = [(sceneFBO, drawScene, sceneCamera)] + self.sceneFBOS
+        self.frameGraph.addFBOPass(sceneFBO, drawScene, sceneCamera, prepend=True)
     def appendFBO(self, sceneFBO, drawScene, sceneCamera):
         """
         appends a render to texture operation before scene rendering is done.
         """
-        self.sceneFBOS.append((sceneFBO, drawScene, sceneCamera))
+        self.frameGraph.addFBOPass(sceneFBO, drawScene, sceneCamera)
     
     def setDefaultSceneFBO(self):
-        """ set the default fbo for offscreen scene rendering. """
-        drawSceneFBO = FBO()
-        drawSceneFBO.addColorTexture(self.sceneTexture)
-        drawSceneFBO.setDepthTexture(self.sceneDepthTexture)
-        drawSceneFBO.create()
-        self.appendFBO(drawSceneFBO, self.drawSceneComplete, self.sceneCamera)
+        """
+        adds the scene pass drawing to the scene texture,
+        passes reading their results from the 'scene' pass are drawn before.
+        """
+        sceneColor = self.frameGraph.importTexture('sceneColor',
+                                                   self.sceneTexture, output=True)
+        sceneDepth = self.frameGraph.importTexture('sceneDepth',
+                                                   self.sceneDepthTexture)
+        self.frameGraph.addPass('scene', self.drawSceneComplete, self.sceneCamera,
+                                colors=[sceneColor], depth=sceneDepth)
     
-    def drawSceneComplete(self):
+    def drawSceneComplete(self, passName='scene'):
         """ draws scene with color.  """
-        map(lambda m: m.draw(self, m), self.models)
-    def drawSceneGeometry(self):
+        self.frameCompiler.draw(self, self.models, passName)
+    def drawSceneGeometry(self, passName='shadow'):
         """
         draws the scene geometry only.
         usefull for depth value rendering.
         """
-        map(_drawModelGeometry, self.models)
+        pairs = []
+        for model in self.models:
+            for segment in model.segments:
+                if segment.castsShadows:
+                    pairs.append( (model, segment) )
+        pairs = self.frustumCuller.cull(pairs, passName)
+        
+        # draw the visible segments of each model
+        start = 0
+        for i in range(1, len(pairs)+1):
+            if i==len(pairs) or pairs[i][0] is not pairs[start][0]:
+                model = pairs[start][0]
+                segments = map(lambda (_, segment): segment, pairs[start:i])
+                if getattr(model, 'instances', None)!=None:
+                    # vertices are transformed by the instance matrix
+                    self.instancedDepthShader.enable()
+                    _drawModelGeometry(model, segments)
+                    self.depthShader.enable()
+                else:
+                    _drawModelGeometry(model, segments)
+                start = i
     
     def setWindowSize(self, size):
         """
@@ -224,12 +348,12 @@ class ModelApp(GLApp):
         ### DRAW THE SCENE ###
         
         # TODO: post shader magic !
-        glUseProgram(0)
+        stateCache.useProgram(0)
         
         # enable the scene texture
         # Note that texture unit 0 should be active now.
-        glEnable(GL_TEXTURE_2D)
-        glBindTexture (GL_TEXTURE_2D, self.sceneTexture.glID)
+        stateCache.enable(GL_TEXTURE_2D)
+        stateCache.bindTexture(GL_TEXTURE_2D, self.sceneTexture.glID, 0)
         # make sure texture matrix is set to identity
         glMatrixMode(GL_TEXTURE)
         glLoadIdentity()
@@ -253,10 +377,10 @@ class ModelApp(GLApp):
             
             # reset viewport and reset to ffp
             glViewport(0, 0, self.winSize[0], self.winSize[1])
-            glUseProgram( 0 )
+            stateCache.useProgram( 0 )
         
-        glBindTexture (GL_TEXTURE_2D, 0)
-        glDisable(GL_TEXTURE_2D)
+        stateCache.bindTexture(GL_TEXTURE_2D, 0, 0)
+        stateCache.disable(GL_TEXTURE_2D)
         
         GLApp.orthogonalPass(self)
     
@@ -284,6 +408,16 @@ class ModelApp(GLApp):
     def processFrame(self, timePassedSecs):
         """ draws a scene """
         
+        self.renderQueue.nextFrame()
+        self.frustumCuller.nextFrame()
+        self.frameCompiler.nextFrame()
+        self.frameGraph.nextFrame()
+        stateCache.nextFrame()
+        if self.occlusionCuller!=None:
+            self.occlusionCuller.nextFrame()
+        self.sceneBVH.update(self.models)
+        self.updateSceneBounds()
+        
         # update the model view matrix
         self.sceneCamera.updateKeys()
         self.sceneCamera.update()
@@ -292,18 +426,18 @@ class ModelApp(GLApp):
         GLObject.signalsEmit()
         
         # enable some default scene states
-        glEnable(GL_DEPTH_TEST)
+        stateCache.enable(GL_DEPTH_TEST)
         
         ######## SHADOW MAP RENDERING START ########
         
         # offset the geometry slightly to prevent z-fighting
         # note that this introduces some light-leakage artifacts
-        glEnable( GL_POLYGON_OFFSET_FILL )
+        stateCache.enable( GL_POLYGON_OFFSET_FILL )
         glPolygonOffset( 1.1, 4096.0 )
         
         # cull front faces for shadow rendering,
         # this moves z-fighting to backfaces.
-        glCullFace(GL_FRONT)
+        stateCache.cullFace(GL_FRONT)
         # enable depth rendering shader.
         # FIXME: support segment geometry shader!
         #          geometry shader could change the shadow shape!
@@ -312,11 +446,11 @@ class ModelApp(GLApp):
         map( _updateLightShadowMap, self.lights )
         glBindFramebuffer( GL_FRAMEBUFFER, 0 )
         
-        glDisable( GL_POLYGON_OFFSET_FILL )
+        stateCache.disable( GL_POLYGON_OFFSET_FILL )
         ######## SHADOW MAP RENDERING STOP ########
         
         #### TODO: FOG: integrate FOG ####
-        glEnable(GL_FOG)
+        stateCache.enable(GL_FOG)
         glFogi (GL_FOG_MODE, GL_EXP2)
         # approximate the atmosphere's filtering effect as a linear function
         sunDir = array( [4.0, 4.0, 4.0, 0.0], float32 ) # TODO: FOG: what is the sun dir ?
@@ -336,22 +470,17 @@ class ModelApp(GLApp):
         glMatrixMode( GL_MODELVIEW )
         
         # draw stuff in 3d projection
-        lastCam = None
         glPushAttrib(GL_COLOR_BUFFER_BIT)
-        for (fbo, draw, cam) in self.sceneFBOS:
-            # render to fbo
-            fbo.enable()
-            if cam!=lastCam:
-                cam.enable()
-                lastCam = cam
-            draw()
+        self.frameGraph.draw()
         # disable render to texture
         FBO.disable()
         glPopAttrib()
+        # blending states were restored
+        stateCache.forget([('cap', GL_BLEND), 'blendFunc'])
         glViewport(0, 0, self.winSize[0], self.winSize[1])
         
         #### TODO: FOG: integrate FOG ####
-        glDisable(GL_FOG)
+        stateCache.disable(GL_FOG)
         
         # change to orthogonal projection
         glMatrixMode( GL_PROJECTION )
@@ -360,7 +489,7 @@ class ModelApp(GLApp):
         glLoadIdentity()
         
         # no depth test needed in orthogonal rendering
-        glDisable(GL_DEPTH_TEST)
+        stateCache.disable(GL_DEPTH_TEST)
         
         # draw orthogonal to the screen
         self.orthogonalPass()
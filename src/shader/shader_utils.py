@@ -24,6 +24,7 @@ except ImportError:
 from OpenGL.GL import *
 
 from utils.util import unique
+from core.gl_state_cache import stateCache
 
 """
 # TODO: include some more aspects of the fixed function pipeline
@@ -93,6 +94,11 @@ FRAG_SHADER = 2
 
 NORMAL_VARYING = "normalVarying"
 
+# location of the per instance matrix attribute of instanced shaders,
+# the mat4 attribute uses this and the 3 following locations.
+INSTANCE_MATRIX_LOCATION = 12
+INSTANCE_MATRIX = "instanceMatrix"
+
 def compileShader(source, shader_type):
     shader = glCreateShader(shader_type)
     source = c_char_p(source)
@@ -108,8 +114,12 @@ def compileShader(source, shader_type):
         raise ValueError, 'Shader compilation failed'
     return shader
  
-def compileProgram(vertex_source, geometry_source, fragment_source):
-    """ compiles shader sources and returns program handle """
+def compileProgram(vertex_source, geometry_source, fragment_source, attributeLocations={}):
+    """
+    compiles shader sources and returns program handle.
+    @param attributeLocations: locations of attributes by name,
+            must be given for attributes shared by different programs.
+    """
     vertex_shader = None
     fragment_shader = None
     geometry_shader = None
@@ -124,7 +134,9 @@ def compileProgram(vertex_source, geometry_source, fragment_source):
     if fragment_source:
         fragment_shader = compileShader(fragment_source.code(), GL_FRAGMENT_SHADER)
         glAttachShader(program, fragment_shader)
- 
+    
+    for (name, location) in attributeLocations.items():
+        glBindAttribLocation(program, location, name)
     glLinkProgram(program)
  
     if geometry_shader:
@@ -479,6 +491,7 @@ class ShaderWrapper(object):
     def __del__(self):
         if self.glHandle!=None:
             glDeleteProgram(self.glHandle)
+            stateCache.forgetProgram(self.glHandle)
     def setGLHandle(self, glHandle):
         self.glHandle = glHandle
     def enable(self):
@@ -493,6 +506,14 @@ class DepthShaderVert(object):
                    void main() {
                       gl_Position = gl_ModelViewProjectionMatrix * vec4(vertexPosition, 1.0);
                    } """
+class InstancedDepthShaderVert(object):
+    @staticmethod
+    def code():
+        return """ attribute vec3 vertexPosition;
+                   attribute mat4 %s;
+                   void main() {
+                      gl_Position = gl_ModelViewProjectionMatrix * (%s * vec4(vertexPosition, 1.0));
+                   } """ % (INSTANCE_MATRIX, INSTANCE_MATRIX)
 class DepthShaderFrag(object):
     @staticmethod
     def code():
@@ -509,12 +530,17 @@ class DepthShaderFrag(object):
        gl_FragDepth = max(0.0f, (gl_FragCoord.z * scale_offset.x) + scale_offset.y);
     } """
 class DepthShader(object):
-    def __init__(self):
-        self.program = compileProgram(DepthShaderVert, None, DepthShaderFrag)
+    def __init__(self, instanced=False):
+        if instanced:
+            # transforms the vertices by the instance matrix
+            self.program = compileProgram(InstancedDepthShaderVert, None, DepthShaderFrag,
+                                          {INSTANCE_MATRIX: INSTANCE_MATRIX_LOCATION})
+        else:
+            self.program = compileProgram(DepthShaderVert, None, DepthShaderFrag)
     def enable(self):
-        glUseProgram(self.program)
+        stateCache.useProgram(self.program)
     def disable(self):
-        glUseProgram(0)
+        stateCache.useProgram(0)
 
 def combineShader(vertShaderFuncs, geomShaderFuncs, fragShaderFuncs):
     if vertShaderFuncs==None or len(vertShaderFuncs)==0:
@@ -0,0 +1,446 @@
+from __future__ import division
+
+import numpy as np
+cimport numpy as np
+
+DTYPE = np.float32
+ctypedef np.float32_t DTYPE_t
+ITYPE = np.int32
+ctypedef np.int32_t ITYPE_t
+
+cimport cython
+
+# number of bins for the surface area heuristic
+DEF NUM_BINS = 16
+# nodes with less primitives are not split
+DEF MIN_LEAF_SIZE = 2
+# nodes with more primitives are always split
+DEF MAX_LEAF_SIZE = 8
+# cost of a node traversal relative to a primitive test
+DEF TRAVERSAL_COST = 1.0
+
+cdef inline float maxFloat(float a, float b): return a if a >= b else b
+cdef inline float minFloat(float a, float b): return a if a <= b else b
+
+@cython.profile(False)
+cdef inline float halfArea(float *lo, float *hi):
+    cdef float dx = hi[0]-lo[0], dy = hi[1]-lo[1], dz = hi[2]-lo[2]
+    if dx<0.0 or dy<0.0 or dz<0.0: return 0.0
+    return dx*dy + dy*dz + dz*dx
+
+#### BUILDING ####
+
+@cython.profile(False)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def buildBVH(np.ndarray[DTYPE_t, ndim=2, mode="c"] boxMin,
+             np.ndarray[DTYPE_t, ndim=2, mode="c"] boxMax):
+    """
+    builds a bounding volume hierarchy over the boxes using
+    the binned surface area heuristic.
+    returns (nodeMin, nodeMax, nodeChild, nodeStart, nodeCount, order).
+    children of node i are nodeChild[i] and nodeChild[i]+1,
+    nodeChild is -1 for leafs. node i contains the primitives
+    order[nodeStart[i]:nodeStart[i]+nodeCount[i]].
+    children always have higher indexes then their parents.
+    """
+    cdef int n = boxMin.shape[0]
+    cdef int maxNodes = max(2*n - 1, 1)
+    cdef np.ndarray[DTYPE_t, ndim=2, mode="c"] nodeMin = np.zeros( (maxNodes,3), DTYPE )
+    cdef np.ndarray[DTYPE_t, ndim=2, mode="c"] nodeMax = np.zeros( (maxNodes,3), DTYPE )
+    cdef np.ndarray[ITYPE_t, ndim=1] nodeChild = np.empty( maxNodes, ITYPE )
+    cdef np.ndarray[ITYPE_t, ndim=1] nodeStart = np.zeros( maxNodes, ITYPE )
+    cdef np.ndarray[ITYPE_t, ndim=1] nodeCount = np.zeros( maxNodes, ITYPE )
+    cdef np.ndarray[ITYPE_t, ndim=1] order = np.arange( n, dtype=ITYPE )
+    cdef np.ndarray[DTYPE_t, ndim=2, mode="c"] centroids = 0.5*(boxMin + boxMax)
+    cdef np.ndarray[ITYPE_t, ndim=1] stack = np.empty( maxNodes, ITYPE )
+
+    cdef int binCount[NUM_BINS]
+    cdef float binMin[NUM_BINS][3]
+    cdef float binMax[NUM_BINS][3]
+    cdef float rightArea[NUM_BINS]
+    cdef float lo[3]
+    cdef float hi[3]
+    cdef float cmin[3]
+    cdef float cmax[3]
+
+    cdef int numNodes = 1, stackSize = 0
+    cdef int node, start, count, end, i, j, k, a, b, axis, bestAxis, bestBin
+    cdef int leftCount, rightCount, prim, tmp
+    cdef float cost, bestCost, leafCost, scale, extent, area
+
+    nodeChild[0] = -1
+    nodeStart[0] = 0
+    nodeCount[0] = n
+    if n==0:
+        return (nodeMin[:0], nodeMax[:0], nodeChild[:0], nodeStart[:0], nodeCount[:0], order)
+
+    stack[0] = 0
+    stackSize = 1
+    while stackSize > 0:
+        stackSize -= 1
+        node = stack[stackSize]
+        start = nodeStart[node]
+        count = nodeCount[node]
+        end = start + count
+
+        # bounds of the node and of the primitive centroids
+        for k in range(3):
+            lo[k] = 1.0e38; hi[k] = -1.0e38
+            cmin[k] = 1.0e38; cmax[k] = -1.0e38
+        for i in range(start, end):
+            prim = order[i]
+            for k in range(3):
+                lo[k] = minFloat(lo[k], boxMin[prim,k])
+                hi[k] = maxFloat(hi[k], boxMax[prim,k])
+                cmin[k] = minFloat(cmin[k], centroids[prim,k])
+                cmax[k] = maxFloat(cmax[k], centroids[prim,k])
+        for k in range(3):
+            nodeMin[node,k] = lo[k]
+            nodeMax[node,k] = hi[k]
+
+        if count <= MIN_LEAF_SIZE: continue
+
+        # find the split with the lowest surface area heuristic cost
+        bestCost = 1.0e38
+        bestAxis = -1
+        bestBin = 0
+        for axis in range(3):
+            extent = cmax[axis] - cmin[axis]
+            if extent <= 0.0: continue
+            scale = NUM_BINS / extent
+            for j in range(NUM_BINS):
+                binCount[j] = 0
+                for k in range(3):
+                    binMin[j][k] = 1.0e38; binMax[j][k] = -1.0e38
+            for i in range(start, end):
+                prim = order[i]
+                j = <int>((centroids[prim,axis] - cmin[axis])*scale)
+                if j >= NUM_BINS: j = NUM_BINS-1
+                binCount[j] += 1
+                for k in range(3):
+                    binMin[j][k] = minFloat(binMin[j][k], boxMin[prim,k])
+                    binMax[j][k] = maxFloat(binMax[j][k], boxMax[prim,k])
+            # sweep from the right for the areas right of each split
+            for k in range(3):
+                lo[k] = 1.0e38; hi[k] = -1.0e38
+            for j in range(NUM_BINS-1, 0, -1):
+                for k in range(3):
+                    lo[k] = minFloat(lo[k], binMin[j][k])
+                    hi[k] = maxFloat(hi[k], binMax[j][k])
+                rightArea[j] = halfArea(lo, hi)
+            # sweep from the left and evaluate the splits
+            for k in range(3):
+                lo[k] = 1.0e38; hi[k] = -1.0e38
+            leftCount = 0
+            for j in range(NUM_BINS-1):
+                leftCount += binCount[j]
+                for k in range(3):
+                    lo[k] = minFloat(lo[k], binMin[j][k])
+                    hi[k] = maxFloat(hi[k], binMax[j][k])
+                rightCount = count - leftCount
+                if leftCount==0 or rightCount==0: continue
+                cost = leftCount*halfArea(lo, hi) + rightCount*rightArea[j+1]
+                if cost < bestCost:
+                    bestCost = cost
+                    bestAxis = axis
+                    bestBin = j
+
+        for k in range(3):
+            lo[k] = nodeMin[node,k]; hi[k] = nodeMax[node,k]
+        area = halfArea(lo, hi)
+        leafCost = count*area
+        if bestAxis==-1:
+            # all centroids at the same point
+            if count <= MAX_LEAF_SIZE: continue
+            # split in the middle of the order
+            leftCount = count/2
+        else:
+            # keep small nodes if splitting is not cheaper
+            if count <= MAX_LEAF_SIZE and TRAVERSAL_COST*area + bestCost >= leafCost:
+                continue
+            # partition the primitives of the node by the best split
+            scale = NUM_BINS / (cmax[bestAxis] - cmin[bestAxis])
+            a = start
+            b = end - 1
+            while a <= b:
+                prim = order[a]
+                j = <int>((centroids[prim,bestAxis] - cmin[bestAxis])*scale)
+                if j >= NUM_BINS: j = NUM_BINS-1
+                if j <= bestBin:
+                    a += 1
+                else:
+                    tmp = order[b]; order[b] = order[a]; order[a] = tmp
+                    b -= 1
+            leftCount = a - start
+
+        nodeChild[node] = numNodes
+        for j in range(2):
+            nodeChild[numNodes+j] = -1
+        nodeStart[numNodes] = start
+        nodeCount[numNodes] = leftCount
+        nodeStart[numNodes+1] = start + leftCount
+        nodeCount[numNodes+1] = count - leftCount
+        stack[stackSize] = numNodes
+        stack[stackSize+1] = numNodes+1
+        stackSize += 2
+        numNodes += 2
+
+    return (nodeMin[:numNodes], nodeMax[:numNodes], nodeChild[:numNodes],
+            nodeStart[:numNodes], nodeCount[:numNodes], order)
+
+@cython.profile(False)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def refitBVH(np.ndarray[DTYPE_t, ndim=2, mode="c"] nodeMin,
+             np.ndarray[DTYPE_t, ndim=2, mode="c"] nodeMax,
+             np.ndarray[ITYPE_t, ndim=1] nodeChild,
+             np.ndarray[ITYPE_t, ndim=1] nodeStart,
+             np.ndarray[ITYPE_t, ndim=1] nodeCount,
+             np.ndarray[ITYPE_t, ndim=1] order,
+             np.ndarray[DTYPE_t, ndim=2, mode="c"] boxMin,
+             np.ndarray[DTYPE_t, ndim=2, mode="c"] boxMax):
+    """
+    updates the node bounds for changed primitive boxes,
+    the tree structure is kept.
+    """
+    cdef int node, i, k, prim, child
+    for node in range(nodeMin.shape[0]-1, -1, -1):
+        child = nodeChild[node]
+        if child==-1:
+            for k in range(3):
+                nodeMin[node,k] = 1.0e38; nodeMax[node,k] = -1.0e38
+            for i in range(nodeStart[node], nodeStart[node]+nodeCount[node]):
+                prim = order[i]
+                for k in range(3):
+                    nodeMin[node,k] = minFloat(nodeMin[node,k], boxMin[prim,k])
+                    nodeMax[node,k] = maxFloat(nodeMax[node,k], boxMax[prim,k])
+        else:
+            for k in range(3):
+                nodeMin[node,k] = minFloat(nodeMin[child,k], nodeMin[child+1,k])
+                nodeMax[node,k] = maxFloat(nodeMax[child,k], nodeMax[child+1,k])
+
+#### QUERIES ####
+
+# results of a box frustum test
+DEF OUTSIDE = 0
+DEF INTERSECTING = 1
+DEF INSIDE = 2
+
+@cython.profile(False)
+cdef inline int boxInFrustum(float *planes, int numPlanes, float *lo, float *hi):
+    cdef int j, result = INSIDE
+    cdef float a, b, c, d
+    for j in range(numPlanes):
+        a = planes[4*j]; b = planes[4*j+1]; c = planes[4*j+2]; d = planes[4*j+3]
+        # corner furthest in plane direction outside -> box outside
+        if a*(hi[0] if a >= 0.0 else lo[0]) +\
+           b*(hi[1] if b >= 0.0 else lo[1]) +\
+           c*(hi[2] if c >= 0.0 else lo[2]) + d < 0.0:
+            return OUTSIDE
+        # nearest corner outside -> box intersects the plane
+        if a*(lo[0] if a >= 0.0 else hi[0]) +\
+           b*(lo[1] if b >= 0.0 else hi[1]) +\
+           c*(lo[2] if c >= 0.0 else hi[2]) + d < 0.0:
+            result = INTERSECTING
+    return result
+
+@cython.profile(False)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def frustumQueryBVH(np.ndarray[DTYPE_t, ndim=2, mode="c"] planes,
+                    np.ndarray[DTYPE_t, ndim=2, mode="c"] nodeMin,
+                    np.ndarray[DTYPE_t, ndim=2, mode="c"] nodeMax,
+                    np.ndarray[ITYPE_t, ndim=1] nodeChild,
+                    np.ndarray[ITYPE_t, ndim=1] nodeStart,
+                    np.ndarray[ITYPE_t, ndim=1] nodeCount,
+                    np.ndarray[ITYPE_t, ndim=1] order,
+                    np.ndarray[DTYPE_t, ndim=2, mode="c"] boxMin,
+                    np.ndarray[DTYPE_t, ndim=2, mode="c"] boxMax):
+    """
+    returns a mask with 1 for primitives with boxes intersecting
+    the space inside all planes.
+    subtrees completely inside are not tested further.
+    """
+    cdef int n = order.shape[0]
+    cdef np.ndarray[np.uint8_t, ndim=1] visible = np.zeros( n, np.uint8 )
+    if nodeMin.shape[0]==0: return visible
+    cdef np.ndarray[ITYPE_t, ndim=1] stack = np.empty( nodeMin.shape[0], ITYPE )
+    cdef int stackSize = 1, node, result, i, prim, child
+    stack[0] = 0
+    while stackSize > 0:
+        stackSize -= 1
+        node = stack[stackSize]
+        result = boxInFrustum(&planes[0,0], planes.shape[0], &nodeMin[node,0], &nodeMax[node,0])
+        if result==OUTSIDE: continue
+        if result==INSIDE:
+            for i in range(nodeStart[node], nodeStart[node]+nodeCount[node]):
+                visible[order[i]] = 1
+            continue
+        child = nodeChild[node]
+        if child==-1:
+            for i in range(nodeStart[node], nodeStart[node]+nodeCount[node]):
+                prim = order[i]
+                if boxInFrustum(&planes[0,0], planes.shape[0],
+                                &boxMin[prim,0], &boxMax[prim,0])!=OUTSIDE:
+                    visible[prim] = 1
+        else:
+            stack[stackSize] = child
+            stack[stackSize+1] = child+1
+            stackSize += 2
+    return visible
+
+@cython.profile(False)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef inline float rayBox(float *origin, float *invDir,
+                         float *lo, float *hi, float maxDistance):
+    """
+    returns the ray distance to the box or -1 if the box is missed.
+    """
+    cdef float tmin = 0.0, tmax = maxDistance, t0, t1
+    cdef int k
+    for k in range(3):
+        t0 = (lo[k] - origin[k])*invDir[k]
+        t1 = (hi[k] - origin[k])*invDir[k]
+        if t0 > t1: t0, t1 = t1, t0
+        tmin = maxFloat(tmin, t0)
+        tmax = minFloat(tmax, t1)
+        if tmin > tmax: return -1.0
+    return tmin
+
+@cython.profile(False)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def rayQueryBVH(np.ndarray[DTYPE_t, ndim=1] rayOrigin,
+                np.ndarray[DTYPE_t, ndim=1] rayDirection,
+                float maxDistance,
+                np.ndarray[DTYPE_t, ndim=2, mode="c"] nodeMin,
+                np.ndarray[DTYPE_t, ndim=2, mode="c"] nodeMax,
+                np.ndarray[ITYPE_t, ndim=1] nodeChild,
+                np.ndarray[ITYPE_t, ndim=1] nodeStart,
+                np.ndarray[ITYPE_t, ndim=1] nodeCount,
+                np.ndarray[ITYPE_t, ndim=1] order,
+                np.ndarray[DTYPE_t, ndim=2, mode="c"] boxMin,
+                np.ndarray[DTYPE_t, ndim=2, mode="c"] boxMax):
+    """
+    returns the primitives with boxes hit by the ray
+    and the ray distance to each box.
+    """
+    cdef float origin[3]
+    cdef float invDir[3]
+    cdef int k
+    for k in range(3):
+        origin[k] = rayOrigin[k]
+        if rayDirection[k]!=0.0:
+            invDir[k] = 1.0/rayDirection[k]
+        else:
+            invDir[k] = 1.0e38
+    hits = []
+    distances = []
+    if nodeMin.shape[0]==0:
+        return (np.array(hits, ITYPE), np.array(distances, DTYPE))
+    cdef np.ndarray[ITYPE_t, ndim=1] stack = np.empty( nodeMin.shape[0], ITYPE )
+    cdef int stackSize = 1, node, i, prim, child
+    cdef float t
+    stack[0] = 0
+    while stackSize > 0:
+        stackSize -= 1
+        node = stack[stackSize]
+        if rayBox(origin, invDir, &nodeMin[node,0], &nodeMax[node,0], maxDistance) < 0.0:
+            continue
+        child = nodeChild[node]
+        if child==-1:
+            for i in range(nodeStart[node], nodeStart[node]+nodeCount[node]):
+                prim = order[i]
+                t = rayBox(origin, invDir, &boxMin[prim,0], &boxMax[prim,0], maxDistance)
+                if t >= 0.0:
+                    hits.append(prim)
+                    distances.append(t)
+        else:
+            stack[stackSize] = child
+            stack[stackSize+1] = child+1
+            stackSize += 2
+    return (np.array(hits, ITYPE), np.array(distances, DTYPE))
+
+@cython.profile(False)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline float boxDistance2(float *center, float *lo, float *hi):
+    """
+    squared distance of a point to the box.
+    """
+    cdef float d, dist = 0.0
+    cdef int k
+    for k in range(3):
+        if center[k] < lo[k]:
+            d = lo[k] - center[k]
+            dist += d*d
+        elif center[k] > hi[k]:
+            d = center[k] - hi[k]
+            dist += d*d
+    return dist
+
+@cython.profile(False)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline int boxOverlap(float *queryLo, float *queryHi, float *lo, float *hi):
+    cdef int k
+    for k in range(3):
+        if hi[k] < queryLo[k] or lo[k] > queryHi[k]: return 0
+    return 1
+
+@cython.profile(False)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def overlapQueryBVH(np.ndarray[DTYPE_t, ndim=1] queryMin,
+                    np.ndarray[DTYPE_t, ndim=1] queryMax,
+                    float radius,
+                    np.ndarray[DTYPE_t, ndim=2, mode="c"] nodeMin,
+                    np.ndarray[DTYPE_t, ndim=2, mode="c"] nodeMax,
+                    np.ndarray[ITYPE_t, ndim=1] nodeChild,
+                    np.ndarray[ITYPE_t, ndim=1] nodeStart,
+                    np.ndarray[ITYPE_t, ndim=1] nodeCount,
+                    np.ndarray[ITYPE_t, ndim=1] order,
+                    np.ndarray[DTYPE_t, ndim=2, mode="c"] boxMin,
+                    np.ndarray[DTYPE_t, ndim=2, mode="c"] boxMax):
+    """
+    returns the primitives with boxes overlapping the query box,
+    or the sphere at queryMin with @radius if radius is not negative.
+    """
+    cdef float lo[3]
+    cdef float hi[3]
+    cdef int k, isSphere = radius >= 0.0
+    cdef float radius2 = radius*radius
+    for k in range(3):
+        lo[k] = queryMin[k]
+        hi[k] = queryMax[k]
+    hits = []
+    if nodeMin.shape[0]==0:
+        return np.array(hits, ITYPE)
+    cdef np.ndarray[ITYPE_t, ndim=1] stack = np.empty( nodeMin.shape[0], ITYPE )
+    cdef int stackSize = 1, node, i, prim, child
+    stack[0] = 0
+    while stackSize > 0:
+        stackSize -= 1
+        node = stack[stackSize]
+        if isSphere:
+            if boxDistance2(lo, &nodeMin[node,0], &nodeMax[node,0]) > radius2: continue
+        elif not boxOverlap(lo, hi, &nodeMin[node,0], &nodeMax[node,0]): continue
+        child = nodeChild[node]
+        if child==-1:
+            for i in range(nodeStart[node], nodeStart[node]+nodeCount[node]):
+                prim = order[i]
+                if isSphere:
+                    if boxDistance2(lo, &boxMin[prim,0], &boxMax[prim,0]) <= radius2:
+                        hits.append(prim)
+                elif boxOverlap(lo, hi, &boxMin[prim,0], &boxMax[prim,0]):
+                    hits.append(prim)
+        else:
+            stack[stackSize] = child
+            stack[stackSize+1] = child+1
+            stackSize += 2
+    return np.array(hits, ITYPE)
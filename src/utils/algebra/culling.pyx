@@ -0,0 +1,63 @@
+from __future__ import division
+
+import numpy as np
+cimport numpy as np
+
+DTYPE = np.float32
+ctypedef np.float32_t DTYPE_t
+
+cimport cython
+
+#### FRUSTUM CULLING ####
+
+@cython.profile(False)
+@cython.boundscheck(False)
+def frustumPlanes(np.ndarray[DTYPE_t, ndim=2] projection,
+                  np.ndarray[DTYPE_t, ndim=2] modelView):
+    """
+    returns the 6 normalized planes (a,b,c,d) of the frustum,
+    the matrices are in gl (column major) layout.
+    points p with a*p.x + b*p.y + c*p.z + d >= 0 are inside a plane.
+    """
+    # gl matrices are transposed, m is projection*modelView
+    cdef np.ndarray[DTYPE_t, ndim=2] m = np.dot( modelView, projection ).T
+    cdef np.ndarray[DTYPE_t, ndim=2] planes = np.empty( (6,4), DTYPE )
+    planes[0] = m[3] + m[0] # left
+    planes[1] = m[3] - m[0] # right
+    planes[2] = m[3] + m[1] # bottom
+    planes[3] = m[3] - m[1] # top
+    planes[4] = m[3] + m[2] # near
+    planes[5] = m[3] - m[2] # far
+    planes /= np.sqrt( (planes[:,:3]**2).sum(axis=1) )[:,None]
+    return planes
+
+@cython.profile(False)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def visibleBounds(np.ndarray[DTYPE_t, ndim=2] planes,
+                  np.ndarray[DTYPE_t, ndim=2] centers,
+                  np.ndarray[DTYPE_t, ndim=1] radii,
+                  np.ndarray[DTYPE_t, ndim=2] extents):
+    """
+    tests bounding spheres and axis aligned boxes against the planes.
+    @param centers: the center of sphere and box of each segment
+    @param extents: half the box size of each segment
+    returns a mask with 1 for bounds intersecting the frustum.
+    """
+    cdef int n = centers.shape[0]
+    cdef np.ndarray[np.uint8_t, ndim=1] visible = np.ones( n, np.uint8 )
+    cdef int i, j
+    cdef float a, b, c, d, dist, boxRadius
+    for j in range(6):
+        a = planes[j,0]; b = planes[j,1]; c = planes[j,2]; d = planes[j,3]
+        for i in range(n):
+            if visible[i]==0: continue
+            dist = a*centers[i,0] + b*centers[i,1] + c*centers[i,2] + d
+            if dist < -radii[i]:
+                visible[i] = 0
+                continue
+            # projected box radius on the plane normal
+            boxRadius = abs(a)*extents[i,0] + abs(b)*extents[i,1] + abs(c)*extents[i,2]
+            if dist < -boxRadius:
+                visible[i] = 0
+    return visible
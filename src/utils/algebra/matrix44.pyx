@@ -306,18 +306,26 @@ def lookAtCameraInverse(np.ndarray[DTYPE_t, ndim=2] src):
 def getDirectionalShadowMapMatrices(np.ndarray[DTYPE_t, ndim=2] shadModelview,
                                     np.ndarray[DTYPE_t, ndim=2] frustumPoints,
                                     np.ndarray[DTYPE_t, ndim=2] sceneBoundPoints,
-                                    float sceneBoundRadius):
+                                    np.ndarray[DTYPE_t, ndim=2] casterBoundPoints):
+    """
+    returns the projection crop matrix and the model view projection crop matrix
+    of a frustum slice. the crop is the part of the slice containing scene
+    geometry, the depth range is extended towards the light
+    to include the shadow casters. bound points are the corners
+    of the world space scene and caster boxes.
+    """
     cdef np.ndarray[DTYPE_t, ndim=2] projectionCropMatrix 
     cdef np.ndarray[DTYPE_t, ndim=2] modelViewProjectionCropMatrix
     cdef np.ndarray[DTYPE_t, ndim=2] shadProj
     cdef np.ndarray[DTYPE_t, ndim=2] shadMvp
     cdef np.ndarray[DTYPE_t, ndim=1] transf
     cdef np.ndarray[DTYPE_t, ndim=1] v4 = np.ones( 4, DTYPE )
-    cdef float maxX, minX, maxY, minY, maxZ, minZ, _maxZ, buf
+    cdef float maxX, minX, maxY, minY, maxZ, minZ, buf
+    cdef float sceneMaxX, sceneMinX, sceneMaxY, sceneMinY, sceneMaxZ, sceneMinZ
     cdef int i
     
-    maxX = maxY = -1000.0
-    minX = minY =  1000.0
+    maxX = maxY = sceneMaxX = sceneMaxY = sceneMaxZ = -1.0e38
+    minX = minY = sceneMinX = sceneMinY = sceneMinZ =  1.0e38
     
     # note that only the z-component is need and thus
     # the multiplication can be simplified
@@ -334,14 +342,26 @@ def getDirectionalShadowMapMatrices(np.ndarray[DTYPE_t, ndim=2] shadModelview,
         if buf > maxZ: maxZ = buf
         if buf < minZ: minZ = buf
     
-    # make sure all relevant shadow casters are included
-    for i in range(4):
-        transf = transformVec4C(shadModelview, sceneBoundPoints[i])
-        
-        _maxZ = transf[2] + sceneBoundRadius
-        if _maxZ > maxZ: maxZ = _maxZ
-        #_minZ = transf[2] - radius
-        #if _minZ < minZ: minZ = _minZ
+    # receivers are inside the slice and the scene
+    for i in range(sceneBoundPoints.shape[0]):
+        buf = shadModelview[0,2] * sceneBoundPoints[i][0] +\
+              shadModelview[1,2] * sceneBoundPoints[i][1] +\
+              shadModelview[2,2] * sceneBoundPoints[i][2] +\
+              shadModelview[3,2]
+        if buf > sceneMaxZ: sceneMaxZ = buf
+        if buf < sceneMinZ: sceneMinZ = buf
+    if sceneMinZ < maxZ and sceneMaxZ > minZ:
+        if sceneMinZ > minZ: minZ = sceneMinZ
+        if sceneMaxZ < maxZ: maxZ = sceneMaxZ
+    
+    # make sure all relevant shadow casters are included,
+    # the light looks at the neg. z axis.
+    for i in range(casterBoundPoints.shape[0]):
+        buf = shadModelview[0,2] * casterBoundPoints[i][0] +\
+              shadModelview[1,2] * casterBoundPoints[i][1] +\
+              shadModelview[2,2] * casterBoundPoints[i][2] +\
+              shadModelview[3,2]
+        if buf > maxZ: maxZ = buf
     
     # get the projection matrix with the new z-bounds
     # note the inversion because the light looks at the neg. z axis
@@ -362,6 +382,23 @@ def getDirectionalShadowMapMatrices(np.ndarray[DTYPE_t, ndim=2] shadModelview,
         if transf[1] > maxY: maxY = transf[1]
         if transf[1] < minY: minY = transf[1]
     
+    # and of the scene, the shadow map only needs to cover both
+    for i in range(sceneBoundPoints.shape[0]):
+        transf = transformVec4C(shadMvp, sceneBoundPoints[i])
+        transf[0] /= transf[3]
+        transf[1] /= transf[3]
+
+        if transf[0] > sceneMaxX: sceneMaxX = transf[0]
+        if transf[0] < sceneMinX: sceneMinX = transf[0]
+        if transf[1] > sceneMaxY: sceneMaxY = transf[1]
+        if transf[1] < sceneMinY: sceneMinY = transf[1]
+    if sceneMinX < maxX and sceneMaxX > minX and\
+       sceneMinY < maxY and sceneMaxY > minY:
+        if sceneMinX > minX: minX = sceneMinX
+        if sceneMaxX < maxX: maxX = sceneMaxX
+        if sceneMinY > minY: minY = sceneMinY
+        if sceneMaxY < maxY: maxY = sceneMaxY
+    
     # calculate needed matrices
     projectionCropMatrix = np.dot( shadProj,
         getCropMatrixC(minX, maxX, minY, maxY) )
@@ -32,6 +32,20 @@ ext_modules = [
         #, extra_compile_args = ["-O3", "-Wall"]
         #, extra_link_args = ['-g']
         #, libraries = ["dv",]
+    ),
+    Extension("culling"
+        , ["culling.pyx"]
+        , include_dirs=[numpy.get_include()]
+        #, extra_compile_args = ["-O3", "-Wall"]
+        #, extra_link_args = ['-g']
+        #, libraries = ["dv",]
+    ),
+    Extension("bvh"
+        , ["bvh.pyx"]
+        , include_dirs=[numpy.get_include()]
+        #, extra_compile_args = ["-O3", "-Wall"]
+        #, extra_link_args = ['-g']
+        #, libraries = ["dv",]
     )
 ]
 
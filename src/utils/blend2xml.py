@@ -31,6 +31,8 @@ from Blender.Mathutils import *
 
 from PIL import Image
 import numpy
+import zlib
+from base64 import b64encode
 
 print dir(Blender)
 print dir(Blender.Image)
@@ -40,6 +42,10 @@ print Blender.Image.Get.__doc__
 DEFAULT_OUT_DIR = "/home/daniel/"
 outFile = None
 
+# write vertex data as zlib compressed base64 blocks of little-endian numbers,
+# much smaller and faster to load then one node per vertex and face.
+PACKED_ARRAYS = True
+
 def setOutFile(name):
     global outFile
     if outFile!=None:
@@ -50,6 +56,15 @@ def printXML(xml):
     global outFile
     print >>outFile, xml
 
+def packedArrayXML(name, data, dtype, size):
+    """
+    returns a packed array node, see xml_parser.xml_helper.xmlPackedArray.
+    """
+    packedType = { 'float32': '<f4', 'int32': '<i4' }[dtype]
+    buf = numpy.asarray(data, packedType).tostring()
+    return '<array name="%s" type="%s" size="%d" encoding="base64" compression="zlib">%s</array>' % \
+                (name, dtype, size, b64encode(zlib.compress(buf, 9)))
+
 def pointbymatrix(p, m):
     return [p[0] * m[0][0] + p[1] * m[1][0] + p[2] * m[2][0] + m[3][0],
 			p[0] * m[0][1] + p[1] * m[1][1] + p[2] * m[2][1] + m[3][1],
@@ -189,6 +204,8 @@ def mesh2XML(oname, mesh, matrix):
     
     # write to file
     printXML ('<segment id="%s" type="vertexArray">' % oname)
+    if PACKED_ARRAYS:
+        return packedMesh2XML(vertices, normals, uvcos, useUVCOS, faces)
     printXML ('    <vertices>')
     for i in vertices.keys():
         if useUVCOS:
@@ -230,6 +247,58 @@ def mesh2XML(oname, mesh, matrix):
     
     return (segmentMaterial, segmentImage)
 
+def packedMesh2XML(vertices, normals, uvcos, useUVCOS, faces):
+    """
+    writes vertices and faces of a mesh as packed arrays.
+    """
+    segmentMaterial = None
+    segmentImage = None
+    
+    vertexIndexes = sorted(vertices.keys())
+    printXML ('    <vertices>')
+    printXML ('        ' + packedArrayXML('co', map(lambda i: vertices[i], vertexIndexes), 'float32', 3))
+    printXML ('        ' + packedArrayXML('no', map(lambda i: normals[i], vertexIndexes), 'float32', 3))
+    if useUVCOS:
+        printXML ('        ' + packedArrayXML('uvco', map(lambda i: uvcos[i], vertexIndexes), 'float32', 2))
+    printXML ('    </vertices>')
+    
+    indexes = []
+    faceData = { 'uv': ([], [], 2), 'vertexColors': ([], [], 4) }
+    for faceIndex in faces.keys():
+        face = faces[faceIndex]
+        if not face.has_key('indexes'): continue
+        
+        material = face.get('material')
+        if segmentMaterial==None:
+            segmentMaterial = material
+        elif material!=None and segmentMaterial != material:
+            print "WARNING: segment has different materials defined (%s and %s), this is not supported." % (segmentMaterial, material)
+        image = face.get('image')
+        if segmentImage==None:
+            segmentImage = image
+        elif image!=None and segmentImage != image:
+            print "WARNING: segment has different images defined (%s and %s), this is not supported." % (segmentImage, image)
+        
+        # corner data is saved for the faces listed in the faces array
+        for key in faceData.keys():
+            if face.has_key(key):
+                (data, faceIds, _) = faceData[key]
+                data += map(tuple, face[key])
+                faceIds.append(len(indexes)/3)
+        indexes += face['indexes']
+    
+    printXML ('    <faces type="triangles" faceLength="3" >')
+    printXML ('        ' + packedArrayXML('i', indexes, 'int32', 1))
+    for (key, name) in [('uv', 'uv'), ('vertexColors', 'col')]:
+        (data, faceIds, size) = faceData[key]
+        if faceIds==[]: continue
+        printXML ('        ' + packedArrayXML(name, data, 'float32', size))
+        printXML ('        ' + packedArrayXML(name + 'Faces', faceIds, 'int32', 1))
+    printXML ('    </faces>')
+    printXML ('</segment>')
+    
+    return (segmentMaterial, segmentImage)
+
 def materialToXML(material):
     global numCreatedTextures
     
@@ -0,0 +1,53 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+import sys
+
+from xml.etree.cElementTree import ElementTree
+
+from xml_parser.xml_helper import xmlGetRoot, xmlFindChild
+from xml_parser.xml_segment import parseSegmentGeometry, stripSegmentGeometry,\
+    packSegmentGeometry
+
+def _indent(node, level=0):
+    """
+    indents the node and its children with 4 spaces per level.
+    """
+    pad = "\n" + "    "*(level+1)
+    children = list(node)
+    if children==[]: return
+    if not (node.text or "").strip():
+        node.text = pad
+    for child in children:
+        _indent(child, level+1)
+        if not (child.tail or "").strip():
+            child.tail = pad
+    children[-1].tail = pad[:-4]
+
+def packXMLFile(inFile, outFile, encoding="base64", compression=None):
+    """
+    converts the vertex data of all segments in a xml file
+    to packed arrays, other nodes are written unchanged.
+    xml comments are not kept.
+    """
+    root = xmlGetRoot(inFile)
+    segmentsNode = xmlFindChild(root, "segments")
+    if segmentsNode!=None:
+        for node in list(segmentsNode):
+            if node.tag != "segment": continue
+            geometry = parseSegmentGeometry(node)
+            if geometry==None: continue
+            stripSegmentGeometry(node)
+            packSegmentGeometry(node, geometry, encoding, compression)
+            _indent(node, 1)
+    ElementTree(root).write(outFile, "utf-8")
+
+if __name__ == "__main__":
+    if len(sys.argv)<3:
+        print "usage: pack_xml.py IN.xml OUT.xml [base64|hex] [zlib]"
+        sys.exit(1)
+    packXMLFile(*sys.argv[1:5])
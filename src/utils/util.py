@@ -13,9 +13,14 @@ def listGet(list, index):
 def joinFunctions(func1, func2):
     if func1==doNothing: return func2
     if func2==doNothing: return func1
+    # joined functions are kept in one flat tuple,
+    # joining many functions does not nest calls.
+    funcs = getattr(func1, 'joinedFunctions', (func1,)) + \
+            getattr(func2, 'joinedFunctions', (func2,))
     def joinFuncs():
-        func1()
-        func2()
+        for func in funcs:
+            func()
+    joinFuncs.joinedFunctions = funcs
     return joinFuncs
 
 def format_number(n, accuracy=6):
@@ -0,0 +1,150 @@
+# -*- coding: UTF-8 -*-
+'''
+Created on 18.10.2026
+
+@author: Daniel Beßler <daniel@orgizm.net>
+'''
+
+import os
+import shutil
+from urllib import quote
+from hashlib import sha1
+
+import numpy
+
+# bump this if the geometry processing of segments changes,
+# all existing caches get invalid then.
+GEOMETRY_CACHE_VERSION = "6"
+
+# attributes of the final segment geometry stored in the cache
+GEOMETRY_ATTRIBUTES = ['cos', 'nos', 'uvco', 'cols', 'vertexTangent', 'indexes',
+                       'lodIndexes', 'lodLengths', 'lodErrors']
+
+
+def _fileHash(file):
+    """
+    hash of the file content and the cache version.
+    """
+    h = sha1(GEOMETRY_CACHE_VERSION)
+    f = open(file, 'rb')
+    try:
+        while True:
+            buf = f.read(1 << 20)
+            if not buf: break
+            h.update(buf)
+    finally:
+        f.close()
+    return h.hexdigest()
+
+class GeometryCache(object):
+    """
+    binary cache of processed segment geometry.
+    the cache is written to a directory next to the xml file,
+    each segment attribute is saved as .npy file and memory mapped on load.
+    the cache is invalid as soon as the content of the xml file changes.
+    """
+    def __init__(self, xmlFile, fileHash=None):
+        self.xmlFile = xmlFile
+        self.cacheDir = xmlFile + ".cache"
+        if fileHash==None:
+            fileHash = _fileHash(xmlFile)
+        self.hash = fileHash
+        self.hashDir = os.path.join(self.cacheDir, self.hash)
+        # stale caches are removed before first save
+        self.isClean = False
+
+    def _segmentDir(self, segmentName):
+        return os.path.join(self.hashDir, quote(segmentName, safe=''))
+
+    def hasSegment(self, segmentName):
+        """
+        returns True if geometry of the segment is cached.
+        """
+        return os.path.isdir(self._segmentDir(segmentName))
+
+    def load(self, segmentName):
+        """
+        returns dictionary with memory mapped geometry of the segment,
+        or None if the segment is not cached.
+        """
+        segmentDir = self._segmentDir(segmentName)
+        if not os.path.isdir(segmentDir):
+            return None
+
+        geometry = {}
+        try:
+            for name in GEOMETRY_ATTRIBUTES:
+                path = os.path.join(segmentDir, name + ".npy")
+                if os.path.isfile(path):
+                    geometry[name] = numpy.load(path, mmap_mode='r')
+        except (IOError, ValueError):
+            print "WARNING: cannot load geometry cache of segment '%s'." % segmentName
+            return None
+        if not geometry.has_key('cos'):
+            return None
+        return geometry
+
+    def save(self, segmentName, geometry):
+        """
+        saves the geometry (dictionary of arrays) of a segment.
+        """
+        try:
+            self._removeStale()
+
+            segmentDir = self._segmentDir(segmentName)
+            if os.path.isdir(segmentDir):
+                return
+
+            # write to temporary directory and rename it,
+            # others never see incomplete segments this way.
+            tmpDir = "%s.tmp%d" % (segmentDir, os.getpid())
+            if os.path.isdir(tmpDir):
+                shutil.rmtree(tmpDir)
+            os.makedirs(tmpDir)
+            for name in geometry.keys():
+                numpy.save(os.path.join(tmpDir, name + ".npy"), geometry[name])
+            os.rename(tmpDir, segmentDir)
+        except (IOError, OSError), e:
+            print "WARNING: cannot write geometry cache of segment '%s': %s" % (segmentName, e)
+
+    def _removeStale(self):
+        """
+        removes caches of older versions of the xml file.
+        """
+        if self.isClean: return
+        self.isClean = True
+        if not os.path.isdir(self.cacheDir): return
+        for d in os.listdir(self.cacheDir):
+            if d != self.hash:
+                shutil.rmtree(os.path.join(self.cacheDir, d), ignore_errors=True)
+
+    def clear(self):
+        """
+        removes the cache of the xml file.
+        """
+        shutil.rmtree(self.cacheDir, ignore_errors=True)
+
+class GeometryPayload(object):
+    """
+    processed segment geometry of a xml file created by a loader process.
+    works like a GeometryCache, segments missing in the payload
+    are looked up in the file cache.
+    """
+    def __init__(self, segmentGeometry, geometryCache=None):
+        self.segmentGeometry = segmentGeometry
+        self.geometryCache = geometryCache
+
+    def hasSegment(self, segmentName):
+        if self.segmentGeometry.has_key(segmentName):
+            return True
+        return self.geometryCache!=None and self.geometryCache.hasSegment(segmentName)
+
+    def load(self, segmentName):
+        geometry = self.segmentGeometry.get(segmentName)
+        if geometry==None and self.geometryCache!=None:
+            geometry = self.geometryCache.load(segmentName)
+        return geometry
+
+    def save(self, segmentName, geometry):
+        if self.geometryCache!=None:
+            self.geometryCache.save(segmentName, geometry)
@@ -6,8 +6,13 @@ Created on 01.07.2010
 '''
 
 from ctypes import c_int, c_byte, c_float
+from string import maketrans
+from base64 import b64encode, b64decode
+from binascii import a2b_hex, b2a_hex, Error as BinasciiError
+import zlib
 
 from numpy import array as NumpyArray
+import numpy
 
 from xml.etree.cElementTree import iterparse
 
@@ -113,24 +118,139 @@ def xmlFloatTupleList(listStr):
     return xmlList(listStr, xmlFloatTuple, default=None)
 
 
-# create numpy array for some states
+# brackets and separators are handled like whitespace
+# by the vectorized number parsing.
+_numberDelimiters = maketrans("[](),", "     ")
+
+def _xmlNumberTokens(numStr):
+    """
+    splits a xml number string into number tokens.
+    the nesting of the string is ignored.
+    """
+    return str(numStr).translate(_numberDelimiters).split()
+
+def _xmlTupleCount(listStr):
+    """
+    number of tuples in a xml tuple list string.
+    """
+    listStr = str(listStr).strip()
+    if listStr[:1] in ['[', '(']:
+        listStr = listStr[1:-1]
+    return listStr.count('(') + listStr.count('[')
+
+def xmlNumberArray(xmlStrs, dtype, elemSize=1):
+    """
+    converts a list of xml number strings to a contiguous numpy array
+    with the shape (N, elemSize).
+    all strings are joined and converted in one pass, this is much faster
+    then converting each string on its own.
+    raises ValueError for malformed strings.
+    """
+    tokens = _xmlNumberTokens(" ".join(xmlStrs))
+    if len(tokens) % elemSize != 0:
+        raise ValueError, "%d numbers cannot be grouped by %d" % (len(tokens), elemSize)
+    return NumpyArray(tokens, dtype).reshape((len(tokens)/elemSize, elemSize))
+
+
+# packed arrays are stored as little-endian blocks
+_packedTypes = { 'float32': '<f4', 'int32': '<i4' }
+
+def xmlPackedArray(node):
+    """
+    decodes a packed array node to a (N, size) numpy array.
+    the text of the node is a base64 or hex encoded block of little-endian
+    numbers, the attributes type (float32 or int32), size (values per element)
+    and encoding (base64 or hex) describe the block.
+    with compression="zlib" the block is zlib compressed before encoding.
+    raises ValueError for malformed nodes.
+    """
+    dtype = node.get('type', 'float32')
+    try:
+        packedType = _packedTypes[dtype]
+    except KeyError:
+        raise ValueError, "unknown packed array type '%s'" % dtype
+    size = xmlInt(node.get('size'), 1)
+    encoding = node.get('encoding', 'base64')
+    
+    text = node.text or ""
+    try:
+        if encoding == "base64":
+            buf = b64decode(text)
+        elif encoding == "hex":
+            buf = a2b_hex("".join(text.split()))
+        else:
+            raise ValueError, "unknown packed array encoding '%s'" % encoding
+        compression = node.get('compression')
+        if compression == "zlib":
+            buf = zlib.decompress(buf)
+        elif compression != None:
+            raise ValueError, "unknown packed array compression '%s'" % compression
+    except (TypeError, BinasciiError, zlib.error), e:
+        raise ValueError, str(e)
+    
+    if size<1 or len(buf) % (4*size) != 0:
+        raise ValueError, "%d bytes cannot be grouped by %d" % (len(buf), size)
+    # the only copy, also converts to native byte order
+    data = numpy.frombuffer(buf, packedType).astype(dtype)
+    return data.reshape((len(data)/size, size))
+
+def xmlPackArray(data, dtype, encoding="base64", compression=None):
+    """
+    encodes a numpy array as packed array string, see xmlPackedArray.
+    """
+    buf = numpy.ascontiguousarray(data, _packedTypes[dtype]).tostring()
+    if compression == "zlib":
+        buf = zlib.compress(buf, 9)
+    elif compression != None:
+        raise ValueError, "unknown packed array compression '%s'" % compression
+    if encoding == "base64":
+        return b64encode(buf)
+    elif encoding == "hex":
+        return b2a_hex(buf)
+    else:
+        raise ValueError, "unknown packed array encoding '%s'" % encoding
+
+
+# create numpy array for some states.
+# the strings are converted in one pass, the slow
+# parsers above are only used if this fails (hex values, ...).
 def xmlIntListC(xmlStr, default=None):
+    try:
+        return NumpyArray(_xmlNumberTokens(xmlStr), "int32")
+    except ValueError: pass
     p = xmlIntList(xmlStr, default)
     if p==None: return None
     return NumpyArray(p, "int32")
 def xmlFloatListC(xmlStr, default=None):
+    try:
+        return NumpyArray(_xmlNumberTokens(xmlStr), "float32")
+    except ValueError: pass
     p = xmlFloatList(xmlStr, default)
     if p==None: return None
     return NumpyArray(p, "float32")
 def xmlIntTupleC(xmlStr, default=None):
+    try:
+        return NumpyArray(_xmlNumberTokens(xmlStr), "int32")
+    except ValueError: pass
     p = xmlIntTuple(xmlStr, default)
     if p==None: return None
     return NumpyArray(p, "int32")
 def xmlFloatTupleC(xmlStr, default=None):
+    try:
+        return NumpyArray(_xmlNumberTokens(xmlStr), "float32")
+    except ValueError: pass
     p = xmlFloatTuple(xmlStr, default)
     if p==None: return None
     return NumpyArray(p, "float32")
 def xmlFloatTupleListC(listStr):
+    """
+    returns a (N, tupleSize) float32 array.
+    """
+    try:
+        tokens = _xmlNumberTokens(listStr)
+        numTuples = _xmlTupleCount(listStr) or len(tokens)
+        return NumpyArray(tokens, "float32").reshape((numTuples, -1))
+    except ValueError: pass
     return xmlList(listStr, xmlFloatTupleC, default=None)
 
 
@@ -167,6 +287,27 @@ def xmlGetRoot(file):
     
     return root
 
+def xmlStreamRoot(file, tagPath, handler):
+    """
+    like xmlGetRoot, but @handler is called for each node at @tagPath
+    (tags below the root) as soon as its end tag was parsed.
+    the handler may remove data from the node, this way
+    the complete tree never has to be in memory.
+    """
+    context = iter(iterparse(file, events=("start", "end")))
+    _, root = context.next()
+    
+    path = []
+    for event, node in context:
+        if event == "start":
+            path.append(node.tag)
+        else:
+            if tuple(path) == tagPath:
+                handler(node)
+            if path: path.pop()
+    
+    return root
+
 def xmlFindChild(node, name):
     """
     looks up a node with specified tag in the level below @node.
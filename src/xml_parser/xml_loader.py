@@ -5,20 +5,33 @@ Created on 02.07.2010
 @author: Daniel Beßler <daniel@orgizm.net>
 '''
 
-from xml_parser.xml_helper import xmlGetRoot, xmlFindChild
+from multiprocessing import Pool
+from xml.etree.cElementTree import tostring, fromstring
+
+from xml_parser.xml_helper import xmlGetRoot, xmlFindChild, xmlStreamRoot
 from xml_parser.xml_material import parseMaterialsNode, XMLMaterials
-from xml_parser.xml_segment import parseSegmentsNode, XMLSegments
+from xml_parser.xml_segment import parseSegmentsNode, XMLSegments,\
+    parseSegmentGeometry, stripSegmentGeometry, processSegmentGeometry
 from xml_parser.xml_model import parseModelsNode, XMLModels, loadXMLModel
 from xml_parser.xml_light import loadXMLLight
 from utils.util import unique
 from xml_parser.xml_states import XMLStateGroups, parseStateGroupNode
+from xml_parser.xml_cache import GeometryCache, GeometryPayload
 
 class XMLLoader(object):
     """
     interface for loading models from xml.
+    processed segment geometry is cached next to the xml files,
+    set useGeometryCache=False to always parse and process vertex data.
+    with streaming=True the vertex data of segments is converted while
+    the file is parsed, the xml tree of large files is never kept in memory.
+    with processes>1 multiple files are parsed and processed
+    concurrently by a pool of loader processes.
+    models loaded with lazy=True create their segments when drawn the
+    first time, use prefetch to process the segments in the background.
     """
     
-    def __init__(self, xmlFiles):
+    def __init__(self, xmlFiles, useGeometryCache=True, streaming=False, processes=1):
         self.xmlStateGroups = XMLStateGroups()
         self.xmlMaterials = XMLMaterials(self.xmlStateGroups)
         self.xmlSegments = XMLSegments(self.xmlStateGroups)
@@ -29,10 +42,13 @@ class XMLLoader(object):
                                    self.xmlStateGroups,
                                    self.xmlMaterials)
         
+        if processes>1 and len(xmlFiles)>1:
+            fileModels = _loadXMLModelsParallel(xmlFiles, useGeometryCache, processes)
+        else:
+            fileModels = map(lambda f: _loadXMLModels(f, useGeometryCache, streaming), xmlFiles)
+        
         # join results from all files
-        for f in xmlFiles:
-            (stat, mat, seg, mod, lights) = _loadXMLModels(f)
-            
+        for (stat, mat, seg, mod, lights) in fileModels:
             self.lights = unique( self.lights + lights)
             
             self.xmlStateGroups = self.xmlStateGroups.join(stat)
@@ -50,16 +66,27 @@ class XMLLoader(object):
             self.xmlModels.lights = self.lights
     
     def __del__(self):
-        self.xmlStateGroups.cleanup()
-        self.xmlMaterials.cleanup()
-        self.xmlSegments.cleanup()
-        self.xmlModels.cleanup()
+        xmlObjects = (self.xmlStateGroups, self.xmlMaterials,
+                      self.xmlSegments, self.xmlModels)
+        def cleanup():
+            for xmlObject in xmlObjects:
+                xmlObject.cleanup()
+        # lazy models need the xml nodes until their segments are loaded
+        self.xmlSegments.cleanupLater(cleanup)
     
-    def getModel(self, modelName):
+    def getModel(self, modelName, lazy=False):
         """
         returns instance for model with given name.
+        instance sets return one instanced model drawing all instances.
+        """
+        return loadXMLModel(self.xmlModels, modelName, lazy)
+    
+    def prefetch(self, modelNames):
+        """
+        processes vertex data of the models with given names
+        in a background thread, returns the started thread.
         """
-        return loadXMLModel(self.xmlModels, modelName)
+        return self.xmlModels.prefetch(modelNames)
 
 def _findChild(root, name):
     """
@@ -69,7 +96,7 @@ def _findChild(root, name):
     if materialNode != None:
         return materialNode
 
-def _loadXMLModelsRoot(root):
+def _loadXMLModelsRoot(root, geometryCache=None, segmentGeometry=None):
     """
     returns list of models found in xml root nodes.
     """
@@ -90,7 +117,8 @@ def _loadXMLModelsRoot(root):
     # load segment data
     node = _findChild(root, "segments")
     if node != None:
-        xmlSegments = parseSegmentsNode(node, xmlStateGroups)
+        xmlSegments = parseSegmentsNode(node, xmlStateGroups,
+                                        geometryCache, segmentGeometry)
     else:
         xmlSegments = None
         
@@ -109,8 +137,87 @@ def _loadXMLModelsRoot(root):
         xmlModels = None
     
     return (xmlStateGroups, xmlMaterials, xmlSegments, xmlModels, lights)
-def _loadXMLModels(file):
+def _loadXMLModelsStreaming(file, geometryCache=None):
     """
     returns list of models found in xml files.
+    segment vertex data is converted to arrays as soon as
+    the segment is parsed, the xml nodes are stripped afterwards.
+    memory needed for the xml tree is bound by the largest segment.
     """
-    return _loadXMLModelsRoot(xmlGetRoot(file))
+    segmentGeometry = {}
+    def convertSegment(node):
+        name = node.get('name')
+        if geometryCache==None or not geometryCache.hasSegment(name):
+            geometry = parseSegmentGeometry(node)
+            if geometry!=None:
+                segmentGeometry[name] = geometry
+        stripSegmentGeometry(node)
+    root = xmlStreamRoot(file, ("segments", "segment"), convertSegment)
+    return _loadXMLModelsRoot(root, geometryCache, segmentGeometry)
+def _loadXMLModels(file, useGeometryCache=False, streaming=False):
+    """
+    returns list of models found in xml files.
+    """
+    if useGeometryCache:
+        geometryCache = GeometryCache(file)
+    else:
+        geometryCache = None
+    if streaming:
+        return _loadXMLModelsStreaming(file, geometryCache)
+    return _loadXMLModelsRoot(xmlGetRoot(file), geometryCache)
+
+def _loadXMLPayload((file, useGeometryCache)):
+    """
+    runs in a loader process.
+    parses the file and processes vertex data of all segments.
+    returns the stripped xml tree as string, the processed geometry
+    and the hash of the file content.
+    """
+    if useGeometryCache:
+        geometryCache = GeometryCache(file)
+    else:
+        geometryCache = None
+    
+    segmentGeometry = {}
+    def processSegment(node):
+        name = node.get('name')
+        if geometryCache==None or not geometryCache.hasSegment(name):
+            geometry = parseSegmentGeometry(node)
+            if geometry!=None:
+                geometry = processSegmentGeometry(name, node, geometry)
+            if geometry!=None:
+                segmentGeometry[name] = geometry
+                if geometryCache!=None:
+                    geometryCache.save(name, geometry)
+        stripSegmentGeometry(node)
+    root = xmlStreamRoot(file, ("segments", "segment"), processSegment)
+    
+    if geometryCache==None:
+        fileHash = None
+    else:
+        fileHash = geometryCache.hash
+    return (tostring(root), segmentGeometry, fileHash)
+def _loadXMLModelsParallel(xmlFiles, useGeometryCache, processes):
+    """
+    returns list of models found in xml files.
+    files are loaded by a pool of processes, the processes return
+    numpy arrays and this process only creates the model descriptions.
+    """
+    pool = Pool(processes)
+    try:
+        payloads = pool.map(_loadXMLPayload,
+                            map(lambda f: (f, useGeometryCache), xmlFiles))
+    finally:
+        pool.close()
+        pool.join()
+    
+    fileModels = []
+    for i in range(len(xmlFiles)):
+        (xmlStr, segmentGeometry, fileHash) = payloads[i]
+        if useGeometryCache:
+            geometryCache = GeometryCache(xmlFiles[i], fileHash)
+        else:
+            geometryCache = None
+        fileModels.append( _loadXMLModelsRoot(fromstring(xmlStr),
+                            GeometryPayload(segmentGeometry, geometryCache)) )
+    return fileModels
@@ -6,12 +6,14 @@ Created on 08.05.2010
 '''
 
 from core.model import Model
+from core.instanced_model import InstancedModel
+from core.gl_object import transformationMatrix
 
-from xml_parser.xml_segment import loadXMLSegment
 from xml_material import loadXMLMaterial
 from core.material import GLMaterial
 from utils.util import unique
 from xml_parser.xml_state import xmlParseStateParam, xmlParseVertexParam
+from xml_parser.xml_helper import xmlFloatTupleC
 
 
 def _parseModelSegmentNode(xmlMaterials, lights, (segmentName, segmentParams, segmentCls), node):
@@ -46,23 +48,43 @@ def _parseModelSegmentNode(xmlMaterials, lights, (segmentName, segmentParams, se
     return segment
     
 
-def _parseModelNode(xmlSegments, xmlMaterials, lights, name, node):
+def _loadModelSegments(xmlMaterials, lights, segmentNodes):
+    """
+    creates the segments of a model.
+    @param segmentNodes: list of (segment handle, model segment node) tuples.
+    """
+    segments = []
+    try:
+        for (handle, node) in segmentNodes:
+            segment = handle.load()
+            if segment==None: continue
+            # load additional attributes into the datatype (rotation,translation,..)
+            segment = _parseModelSegmentNode(xmlMaterials, lights, segment, node)
+            segments.append(segment)
+    finally:
+        for (handle, _) in segmentNodes:
+            handle.release()
+    return segments
+
+def _parseModelNode(xmlSegments, xmlMaterials, lights, name, node, lazy=False,
+                    instanceMatrices=None):
     """
     parses a model node and creates a model instance.
+    with lazy=True the segments are created when the model
+    is drawn the first time or loadSegments is called.
+    if instanceMatrices are given an instanced model is created.
     """
     
     params = {}
     
-    segments = []
+    segmentNodes = []
     sLights = []
     for child in list(node):
         if child.tag == "segment":
             segmentName = child.get('name')
-            
-            segment = loadXMLSegment(xmlSegments, segmentName)
-            # load additional attributes into the datatype (rotation,translation,..)
-            segment = _parseModelSegmentNode(xmlMaterials, lights, segment, child)
-            segments.append(segment)
+            handle = xmlSegments.loadSegment(segmentName, lazy=True)
+            if handle!=None:
+                segmentNodes.append( (handle, child) )
                 
         elif child.tag == "state":
             xmlParseStateParam(child, params)
@@ -76,11 +98,47 @@ def _parseModelNode(xmlSegments, xmlMaterials, lights, name, node):
         else:
             print "WARNING: unknown model tag '%s'" % child.tag
     
-    m = Model(segments=segments, params=params)
+    if lazy:
+        segments = []
+        segmentLoader = lambda: _loadModelSegments(xmlMaterials, lights, segmentNodes)
+    else:
+        segments = _loadModelSegments(xmlMaterials, lights, segmentNodes)
+        segmentLoader = None
+    if instanceMatrices!=None:
+        m = InstancedModel(segments=segments, params=params,
+                           matrices=instanceMatrices, segmentLoader=segmentLoader)
+    else:
+        m = Model(segments=segments, params=params, segmentLoader=segmentLoader)
     m.setLights(sLights)
     
     return m
 
+def _instanceTuple(node, name):
+    val = node.get(name)
+    if val==None: return None
+    return xmlFloatTupleC(val)
+
+def _parseInstanceMatrices(node):
+    """
+    returns the matrices of the instance nodes of an instance set.
+    """
+    matrices = []
+    for child in list(node):
+        if child.tag == "instance":
+            matrices.append( transformationMatrix(
+                    _instanceTuple(child, 'translation'),
+                    _instanceTuple(child, 'rotation'),
+                    _instanceTuple(child, 'scaling')) )
+        else:
+            print "WARNING: unknown instances tag '%s'" % child.tag
+    return matrices
+
+def _modelSegmentNames(node):
+    """
+    returns names of segments used by a model node.
+    """
+    return [child.get('name') for child in list(node) if child.tag == "segment"]
+
 class XMLModels(object):
     """
     class managing model xml nodes.
@@ -91,7 +149,14 @@ class XMLModels(object):
         self.xmlMaterials = xmlMaterials
         self.lights = lights
         self.modelNodes = {}
-    def loadModel(self, name):
+        # instance sets drawing a model many times
+        self.instanceNodes = {}
+    def loadModel(self, name, lazy=False):
+        instanceMatrices = None
+        instanceNode = self.instanceNodes.get(name)
+        if instanceNode!=None:
+            instanceMatrices = _parseInstanceMatrices(instanceNode)
+            name = instanceNode.get('model')
         try:
             modelNode = self.modelNodes[name]
         except KeyError:
@@ -99,13 +164,32 @@ class XMLModels(object):
             return
         modelIter = modelNode.getiterator()
         modelNode = modelIter.next()
-        return _parseModelNode(self.xmlSegments, self.xmlMaterials, self.lights, name, modelNode)
+        return _parseModelNode(self.xmlSegments, self.xmlMaterials, self.lights,
+                               name, modelNode, lazy, instanceMatrices)
+    def prefetch(self, names):
+        """
+        prefetches segments of models with given names in a background thread.
+        returns the started thread.
+        """
+        segmentNames = []
+        for name in names:
+            instanceNode = self.instanceNodes.get(name)
+            if instanceNode!=None:
+                name = instanceNode.get('model')
+            try:
+                segmentNames += _modelSegmentNames(self.modelNodes[name])
+            except KeyError:
+                print "WARNING: cannot prefetch model '%s'" % name
+        return self.xmlSegments.prefetch(unique(segmentNames))
     def addModel(self, node):
         self.modelNodes[node.get('name')] = node
+    def addInstances(self, node):
+        self.instanceNodes[node.get('name')] = node
     def cleanup(self):
-        for node in self.modelNodes.values():
+        for node in self.modelNodes.values() + self.instanceNodes.values():
             node.clear()
         self.modelNodes = {}
+        self.instanceNodes = {}
     def join(self, other):
         xmlStateGroups  = self.xmlStateGroups.join(other.xmlStateGroups)
         xmlSegments  = self.xmlSegments.join(other.xmlSegments)
@@ -116,23 +200,33 @@ class XMLModels(object):
         for n in other.modelNodes.keys():
             nodes[n] = other.modelNodes[n]
         buf.modelNodes = nodes
+        nodes = self.instanceNodes.copy()
+        for n in other.instanceNodes.keys():
+            nodes[n] = other.instanceNodes[n]
+        buf.instanceNodes = nodes
         return buf
 
-def loadXMLModel(xmlModels, name):
+def loadXMLModel(xmlModels, name, lazy=False):
     """
     creates a model instance for a model with given name.
     """
-    return xmlModels.loadModel(name)
+    return xmlModels.loadModel(name, lazy)
 
 def parseModelsNode(node, lights, xmlSegments, xmlStateGroups, xmlMaterials):
     """
-    only model names are evaluated here
+    only model names are evaluated here.
+    instance set nodes name a model and contain an instance node
+    with translation, rotation and scaling for each instance:
+        <instances name="trees" model="tree">
+            <instance translation="(2.0, 0.0, 0.0)" rotation="(0.0, 90.0, 0.0)" />
+        </instances>
     """
     xmlModels = XMLModels(lights, xmlSegments, xmlStateGroups, xmlMaterials)
     for child in list(node):
-        if child.tag != "model":
-            continue
-        xmlModels.addModel(child)
+        if child.tag == "model":
+            xmlModels.addModel(child)
+        elif child.tag == "instances":
+            xmlModels.addInstances(child)
     return xmlModels
 
 def cleanupModels(xmlModels):
@@ -10,8 +10,8 @@ OpenGL = importGL()
 from OpenGL import GL as gl
 
 from xml_parser.xml_helper import xmlFloatTuple, xmlFloat, xmlInt,\
-    xmlIntList, xmlFloatTupleList, xmlFloatList, xmlFloatListC, xmlFloatTupleC,\
-    xmlIntListC, xmlFloatTupleListC
+    xmlFloatListC, xmlFloatTupleC, xmlIntListC, xmlFloatTupleListC,\
+    xmlNumberArray, xmlPackedArray, xmlPackArray, xmlFindChild
 from core.segments.lines import LineSegment
 from core.segments.points import PointSegment
 from core.segments.triangles import TriangleSegment
@@ -23,80 +23,346 @@ from core.evaluators import CurveEvaluator, EvalParam, PatchEvaluator,\
 from core.segments.evaluator_segment import EvaluatorSegment
 from xml_parser.xml_state import xmlParseStateParam, xmlParseVertexParam
 from core.gl_vertex_attribute import GLVertexAttribute
+from core.material import GLMaterial
 from xml_parser.xml_states import xmlParseStateGroupParam
+from xml_parser.xml_cache import GeometryPayload
 
 from numpy import array as NumpyArray
+import numpy
 
+from xml.etree.cElementTree import Element, SubElement
 
-def _parseSegmentVertices(node, segmentParams):
-    cos = []
-    nos = []
-    cols = []
-    uvcos = []
-    tangents = []
+from threading import Thread, Lock
+
+
+# segment parameter -> (shader attribute name, values per vertex)
+_vertexAttributes = { 'cos':           ("vertexPosition", 3)
+                    , 'nos':           ("vertexNormal", 3)
+                    , 'uvco':          ("vertexUV", 2)
+                    , 'cols':          ("vertexColor", 4)
+                    , 'vertexTangent': ("vertexTangent", 4)
+                      }
+
+# segment parameter -> attribute name in xml
+_vertexAttributeNames = [ ('cos', 'co')
+                        , ('nos', 'no')
+                        , ('cols', 'col')
+                        , ('uvco', 'uvco')
+                        , ('vertexTangent', 'tangents')
+                          ]
+
+def _vertexAttribute(key, data):
+    """
+    creates a float vertex attribute for the segment parameter @key.
+    """
+    name, size = _vertexAttributes[key]
+    return GLVertexAttribute(name=name,
+                             data=data,
+                             elementSize=size*4,  # size times 4 byte (sizeof float)
+                             normalize=False,
+                             dataType=gl.GL_FLOAT)
+
+def _parseVertexAttribute(vNodes, name):
+    """
+    converts the attribute @name of all vertex nodes in one pass.
+    returns None if the attribute is not set for all vertices.
+    """
+    attStrs = map(lambda vNode: vNode.get(name), vNodes)
+    if attStrs==[] or None in attStrs:
+        return None
+    try:
+        # the first vertex defines the number of values per vertex
+        elemSize = len(xmlFloatTupleC(attStrs[0]))
+        return xmlNumberArray(attStrs, "float32", elemSize)
+    except ValueError:
+        print "WARNING: cannot parse vertex attribute '%s'." % name
+        return None
+
+def _parsePackedArrays(node):
+    """
+    decodes all packed array nodes below @node.
+    returns dictionary with the array names as keys.
+    """
+    arrays = {}
+    for child in list(node):
+        if child.tag != "array": continue
+        name = child.get('name')
+        try:
+            arrays[name] = xmlPackedArray(child)
+        except ValueError, e:
+            print "WARNING: cannot decode packed array '%s': %s" % (name, e)
+    return arrays
+
+def _parseSegmentVertices(node, geometry):
+    # packed vertex data is decoded without parsing numbers
+    packed = _parsePackedArrays(node)
+    if packed!={}:
+        for (key, name) in _vertexAttributeNames:
+            if packed.has_key(name):
+                geometry[key] = packed[name]
+        return
+    
+    vNodes = filter(lambda vNode: vNode.tag == "v", list(node))
     
-    for vNode in list(node):
-        if vNode.tag != "v": continue
+    # vertex coordinates must be specified
+    numVertices = len(vNodes)
+    vNodes = filter(lambda vNode: vNode.get('co')!=None, vNodes)
+    if len(vNodes)!=numVertices:
+        print "WARNING: skipping %d vertex nodes without co tag." % (numVertices-len(vNodes))
+    
+    # each attribute is converted to a contiguous (N, size) array
+    for (key, name) in _vertexAttributeNames:
+        data = _parseVertexAttribute(vNodes, name)
+        if data is not None:
+            geometry[key] = data
+
+def _splitFaceArray(data, faceLengths):
+    """
+    splits a per face corner array into views for each face.
+    """
+    if len(faceLengths)==0:
+        return []
+    return numpy.split(data, numpy.cumsum(faceLengths)[:-1])
+
+def _parseFaceIndexes(indexStrs):
+    """
+    converts the index strings of all faces in one pass.
+    returns the flat index array and the number of indexes per face.
+    """
+    faceLengths = map(lambda i: i.count(',')+1, indexStrs)
+    try:
+        indexes = xmlNumberArray(indexStrs, "int32").ravel()
+        if len(indexes)==sum(faceLengths):
+            return (indexes, NumpyArray(faceLengths, "int32"))
+    except ValueError: pass
+    
+    # fallback to the slow parser, supports hex indexes
+    faceIndexes = map(xmlIntListC, indexStrs)
+    faceLengths = NumpyArray(map(len, faceIndexes), "int32")
+    if faceIndexes==[]:
+        return (numpy.zeros(0, "int32"), faceLengths)
+    return (numpy.concatenate(faceIndexes), faceLengths)
+
+def _parseFaceCorners(cornerStrs, faceLengths):
+    """
+    converts per face corner data (uv, colors, normals) of multiple faces in one pass.
+    returns a (numCorners, size) array.
+    """
+    numCorners = sum(faceLengths)
+    try:
+        data = xmlNumberArray(cornerStrs, "float32")
+        if numCorners>0 and data.size%numCorners==0:
+            return data.reshape((numCorners, data.size/numCorners))
+    except ValueError: pass
+    
+    # fallback to the slow parser
+    return numpy.concatenate(map(xmlFloatTupleListC, cornerStrs))
+
+def _parseSegmentFaces(node, geometry):
+    """
+    converts the faces to flat arrays.
+    indexes of all faces are saved in geometry['indexes'] and
+    the number of indexes per face in geometry['faceLengths'].
+    per face corner data is saved in geometry['uv'], geometry['col'] and geometry['nor'],
+    geometry['uvFaces'],... contains the faces with the data set.
+    """
+    # packed face data is decoded without parsing numbers
+    packed = _parsePackedArrays(node)
+    if packed.has_key('i'):
+        _setPackedSegmentFaces(node, packed, geometry)
+        return
+    
+    # collect the face strings, they are converted together below
+    faceStrs = []
+    for fNode in list(node):
+        if fNode.tag != "face": continue
         
-        # vertex coordinates must be specified
-        co = xmlFloatTupleC(vNode.get('co'))
-        if co==None:
-            print "WARNING: skipping vertex node without co tag."
+        faceStr = {}
+        for iNode in list(fNode):
+            if iNode.tag in ["i", "uv", "col", "nor"]:
+                faceStr[iNode.tag] = iNode.get('val')
+        
+        if faceStr.get('i')==None:
+            print "WARNING: skipping face node without index tag."
             continue
-        cos.append(co)
-            
-        if nos!=None:
-            no = xmlFloatTupleC(vNode.get('no'))
-            if no==None: nos=None
-            else: nos.append(no)
-            
-        if cols!=None:
-            col = xmlFloatTupleC(vNode.get('col'))
-            if col==None: cols=None
-            else: cols.append(col)
-            
-        if uvcos!=None:
-            uvco = xmlFloatTupleC(vNode.get('uvco'))
-            if uvco==None: uvcos=None
-            else: uvcos.append(col)
-            
-        if tangents!=None:
-            tangent = xmlFloatTupleC(vNode.get('tangents'))
-            if tangent==None: tangents=None
-            else: tangents.append(tangent)
-    
-    # TODO: support other formats
-    segmentParams['cos'] = GLVertexAttribute(name="vertexPosition",
-                                    data=cos,
-                                    elementSize=3*4,              # 3 (x/y/z) times 4 byte (sizeof float)
-                                    normalize=False,
-                                    dataType=gl.GL_FLOAT)
-    if uvcos!=None:
-        segmentParams['uvcos'] = GLVertexAttribute(name="vertexUV",
-                                            data=uvcos,
-                                            elementSize=2*4,      # 2 (u/v) times 4 byte (sizeof float)
-                                            normalize=False,
-                                            dataType=gl.GL_FLOAT)
-    if nos!=None:
-        segmentParams['nos'] = GLVertexAttribute(name="vertexNormal",
-                                            data=nos,
-                                            elementSize=3*4,      # 2 (u/v) times 4 byte (sizeof float)
-                                            normalize=False,
-                                            dataType=gl.GL_FLOAT)
-    if cols!=None:
-        segmentParams['col'] = GLVertexAttribute(name="vertexColor",
-                                            data=cols,
-                                            elementSize=4*4,      # 4 (r/g/b/a) times 4 byte (sizeof float)
-                                            normalize=False,
-                                            dataType=gl.GL_FLOAT)
-    if tangents!=None:
-        segmentParams['tangents'] = GLVertexAttribute(name="vertexTangent",
-                                            data=tangents,
-                                            elementSize=4*4,      # 4 (x/y/z/w) times 4 byte (sizeof float)
-                                            normalize=False,
-                                            dataType=gl.GL_FLOAT)
-
-def _parseSegmentFaces(node, segmentParams, xmlStateGroups):
+        faceStrs.append(faceStr)
+    
+    # convert indexes of all faces in one pass
+    indexes, faceLengths = _parseFaceIndexes(
+            map(lambda faceStr: faceStr['i'], faceStrs))
+    geometry['indexes'] = indexes
+    geometry['faceLengths'] = faceLengths
+    
+    # convert per face corner data in one pass
+    for tag in ["uv", "col", "nor"]:
+        faceIds = filter(lambda i: faceStrs[i].has_key(tag), range(len(faceStrs)))
+        if faceIds==[]: continue
+        try:
+            geometry[tag] = _parseFaceCorners(
+                    map(lambda i: faceStrs[i][tag], faceIds),
+                    faceLengths[faceIds])
+            geometry[tag + 'Faces'] = NumpyArray(faceIds, "int32")
+        except (ValueError, TypeError):
+            print "WARNING: cannot parse face attribute '%s'." % tag
+
+def _setPackedSegmentFaces(node, packed, geometry):
+    """
+    sets face geometry from packed arrays.
+    the number of indexes per face is the faceLength attribute of the faces node
+    or the faceLengths array, corner data (uv, col, nor) is set for all faces
+    or the faces listed in the uvFaces, colFaces and norFaces arrays.
+    """
+    indexes = packed['i'].ravel()
+    if packed.has_key('faceLengths'):
+        faceLengths = packed['faceLengths'].ravel()
+    else:
+        faceLength = xmlInt(node.get('faceLength'), 1)
+        if faceLength<1:
+            print "WARNING: invalid face length %d." % faceLength
+            return
+        faceLengths = numpy.empty(len(indexes)/faceLength, "int32")
+        faceLengths.fill(faceLength)
+    if faceLengths.sum()!=len(indexes):
+        print "WARNING: face lengths do not match the number of indexes."
+        return
+    geometry['indexes'] = indexes
+    geometry['faceLengths'] = faceLengths
+    
+    for tag in ["uv", "col", "nor"]:
+        if not packed.has_key(tag): continue
+        if packed.has_key(tag + 'Faces'):
+            faceIds = packed[tag + 'Faces'].ravel()
+        else:
+            faceIds = numpy.arange(len(faceLengths), dtype="int32")
+        if faceLengths[faceIds].sum()!=len(packed[tag]):
+            print "WARNING: cannot parse face attribute '%s'." % tag
+            continue
+        geometry[tag] = packed[tag]
+        geometry[tag + 'Faces'] = faceIds
+
+def _packedArrayNode(parent, name, data, dtype, encoding, compression):
+    """
+    adds a packed array node to @parent.
+    """
+    data = numpy.asarray(data)
+    if data.ndim>1:
+        size = data.shape[1]
+    else:
+        size = 1
+    node = SubElement(parent, "array", name=name, type=dtype,
+                      size=str(size), encoding=encoding)
+    if compression!=None:
+        node.set('compression', compression)
+    node.text = xmlPackArray(data, dtype, encoding, compression)
+    return node
+
+def packSegmentGeometry(node, geometry, encoding="base64", compression=None):
+    """
+    adds vertices and faces of a segment as packed arrays to the segment node.
+    @param geometry: vertex data like returned by parseSegmentGeometry,
+                     the node must be stripped before.
+    """
+    vNode = Element("vertices")
+    for (key, name) in _vertexAttributeNames:
+        if geometry.has_key(key):
+            _packedArrayNode(vNode, name, geometry[key], "float32",
+                             encoding, compression)
+    
+    fNode = xmlFindChild(node, "faces")
+    if fNode==None:
+        node.append(vNode)
+    else:
+        # vertices before faces
+        node.insert(list(node).index(fNode), vNode)
+    if fNode==None or not geometry.has_key('indexes'):
+        return
+    
+    arrays = [('i', geometry['indexes'], "int32")]
+    faceLengths = geometry['faceLengths']
+    if len(faceLengths)>0 and (faceLengths==faceLengths[0]).all():
+        fNode.set('faceLength', str(faceLengths[0]))
+    else:
+        arrays.append(('faceLengths', faceLengths, "int32"))
+    for tag in ["uv", "col", "nor"]:
+        if not geometry.has_key(tag): continue
+        arrays.append((tag, geometry[tag], "float32"))
+        faceIds = geometry[tag + 'Faces']
+        if len(faceIds)!=len(faceLengths):
+            arrays.append((tag + 'Faces', faceIds, "int32"))
+    for (name, data, dtype) in arrays:
+        _packedArrayNode(fNode, name, data, dtype, encoding, compression)
+
+def parseSegmentGeometry(node):
+    """
+    converts vertices and faces of a segment node to a dictionary of arrays.
+    returns None if the segment has no vertices.
+    """
+    geometry = {}
+    for child in list(node):
+        if child.tag == "vertices":
+            _parseSegmentVertices(child, geometry)
+        elif child.tag == "faces":
+            _parseSegmentFaces(child, geometry)
+    if not geometry.has_key('cos'):
+        return None
+    return geometry
+
+def stripSegmentGeometry(node):
+    """
+    removes vertex data from a segment node,
+    the node keeps states and the primitive of the faces.
+    """
+    for child in list(node):
+        if child.tag == "vertices":
+            node.remove(child)
+        elif child.tag == "faces":
+            for fNode in list(child):
+                if fNode.tag == "array":
+                    child.remove(fNode)
+                    continue
+                for iNode in list(fNode):
+                    if iNode.tag in ["i", "uv", "col", "nor"]:
+                        fNode.remove(iNode)
+                if len(fNode)==0:
+                    child.remove(fNode)
+
+def createGeometrySegment(name, node, geometry):
+    """
+    creates a segment instance with the geometry only,
+    states of the segment node are ignored.
+    returns None if the segment has no known primitive.
+    """
+    segmentParams = {}
+    faceVertices = None
+    for child in list(node):
+        if child.tag == "faces":
+            faceVertices = _parseSegmentPrimitive(child, segmentParams)
+    if faceVertices==None:
+        return None
+    _setSegmentGeometry(segmentParams, geometry, faceVertices)
+    # processed geometry does not depend on the material
+    segmentParams['material'] = GLMaterial({})
+    
+    return segmentParams['cls'](name=name, params=segmentParams)
+
+def processSegmentGeometry(name, node, geometry):
+    """
+    runs the vertex processing of a segment (face split, normal and tangent generation)
+    without creating gl resources.
+    returns the processed geometry like it is saved in geometry caches.
+    """
+    segment = createGeometrySegment(name, node, geometry)
+    if segment==None:
+        return None
+    segment.createResources()
+    segment.createResourcesPost()
+    return segment.getGeometry()
+
+def _parseSegmentPrimitive(node, segmentParams):
+    """
+    sets segment class, primitive and vertex processing params of a faces node.
+    returns the number of vertices per face or None for unknown primitives.
+    """
     segmentTypes = { 'Points':        (PointSegment, gl.GL_POINTS, 1)
                    , 'Lines':         (LineSegment, gl.GL_LINES, 2)
                    , 'LineStrip':     (LineSegment, gl.GL_LINE_STRIP, 2)
@@ -113,52 +379,82 @@ def _parseSegmentFaces(node, segmentParams, xmlStateGroups):
         segmentCls, primitive, faceVertices = segmentTypes[node.get('primitive')]
     except:
         print "WARNING: unknown faces type '%s'" % node.get('primitive')
-        return
+        return None
     segmentParams['cls'] = segmentCls
     segmentParams['primitive'] = primitive
+    if node.get('normalWeighting')!=None:
+        segmentParams['normalWeighting'] = node.get('normalWeighting')
+    if node.get('vertexCacheSize')!=None:
+        segmentParams['vertexCacheSize'] = int(node.get('vertexCacheSize'))
+    if node.get('lodLevels')!=None:
+        segmentParams['lodLevels'] = int(node.get('lodLevels'))
+    return faceVertices
+
+def _parseSegmentFaceStates(node, segmentParams, xmlStateGroups):
+    """
+    reads primitive and states of a faces node.
+    returns the number of vertices per face.
+    """
+    faceVertices = _parseSegmentPrimitive(node, segmentParams)
     
-    faces = []
-    indexes = []
-    numIndexes = 0
-    for fNode in list(node):
-        if fNode.tag != "face": continue
-        
-        faceParams = {}
-        
-        for iNode in list(fNode):
-            if iNode.tag == "i":
-                if faceVertices==1 or faceVertices==2:
-                    i = xmlIntList(iNode.get('val'))
-                    if i!=None:
-                        indexes += i
-                        numIndexes += len(i)
-                else:
-                    faceParams['i'] = xmlIntListC(iNode.get('val'))
-                    numIndexes += faceVertices
-            elif iNode.tag == "state":
-                if faceVertices==1 or faceVertices==2:
+    if faceVertices==1 or faceVertices==2:
+        # face states of points and lines are segment states
+        for fNode in list(node):
+            if fNode.tag != "face": continue
+            for iNode in list(fNode):
+                if iNode.tag == "state":
                     xmlParseStateParam( iNode, segmentParams )
-                else:
-                    xmlParseStateParam( iNode, faceParams )
-            elif iNode.tag == "stateGroup":
-                if faceVertices==1 or faceVertices==2:
+                elif iNode.tag == "stateGroup":
                     xmlParseStateGroupParam( iNode, segmentParams, xmlStateGroups )
-                else:
-                    xmlParseStateGroupParam( iNode, faceParams, xmlStateGroups )
-            elif iNode.tag == "uv":
-                faceParams['uv'] = xmlFloatTupleListC(iNode.get('val'))
-            elif iNode.tag == "col":
-                faceParams['col'] = xmlFloatTupleListC(iNode.get('val'))
-            elif iNode.tag == "nor":
-                faceParams['nor'] = xmlFloatTupleListC(iNode.get('val'))
-        
-        if not (faceVertices==1 or faceVertices==2):
-            faces.append(VArrayFace(faceParams))
-        
+    
+    return faceVertices
+
+def _setSegmentGeometry(segmentParams, geometry, faceVertices):
+    """
+    creates vertex attributes and faces from the geometry arrays.
+    arrays changed by the segment are copied, so the geometry
+    can be used for multiple segments.
+    """
+    for key in _vertexAttributes.keys():
+        if geometry.has_key(key):
+            segmentParams[key] = _vertexAttribute(key, geometry[key])
+    
+    indexes = numpy.array(geometry['indexes'])
+    faceLengths = geometry['faceLengths']
+    
+    faces = []
     if faceVertices==1 or faceVertices==2:
         segmentParams['indexes'] = indexes
-    segmentParams['numIndexes'] = numIndexes
-    segmentParams['faces'] = (faces, primitive, faceVertices)
+    else:
+        faceParamsList = map(lambda i: {'i': i}, _splitFaceArray(indexes, faceLengths))
+        for tag in ["uv", "col", "nor"]:
+            if not geometry.has_key(tag): continue
+            faceIds = geometry[tag + 'Faces']
+            cornerData = _splitFaceArray(geometry[tag], faceLengths[faceIds])
+            for j in range(len(faceIds)):
+                faceParamsList[faceIds[j]][tag] = cornerData[j]
+        faces = map(VArrayFace, faceParamsList)
+        # face indexes are views on the flat index array
+        segmentParams['faceIndexes'] = (indexes, faceLengths)
+    segmentParams['numIndexes'] = len(indexes)
+    segmentParams['faces'] = (faces, segmentParams['primitive'], faceVertices)
+
+def _setCachedSegmentGeometry(segmentParams, geometry, faceVertices):
+    """
+    uses processed geometry loaded from a cache.
+    """
+    for key in _vertexAttributes.keys():
+        if geometry.has_key(key):
+            segmentParams[key] = _vertexAttribute(key, geometry[key])
+    segmentParams['indexes'] = geometry['indexes']
+    segmentParams['numIndexes'] = len(geometry['indexes'])
+    if geometry.has_key('lodIndexes'):
+        segmentParams['lodIndexes'] = geometry['lodIndexes']
+        segmentParams['lodLengths'] = geometry['lodLengths']
+        segmentParams['lodErrors'] = geometry['lodErrors']
+    # faces are already processed, the segment only needs the primitive
+    segmentParams['faces'] = ([], segmentParams['primitive'], faceVertices)
+    segmentParams['cachedGeometry'] = True
 
 def _curveTargets():
     return {
@@ -318,20 +614,31 @@ def _parseSegmentNurbs(node, segmentParams, xmlStateGroups):
     segmentParams['evaluators'] = evaluators
 
 
-def _parseSegmentNode(name, node, xmlStateGroups):
+def _parseSegmentNode(name, node, xmlStateGroups,
+                      geometryCache=None, geometry=None):
     """
     parses a segment node and creates a segment instance.
+    @param geometry: vertex data of the segment converted before,
+                     see parseSegmentGeometry.
     """
     
     segmentParams = {}
     
+    # processed vertex data of the segment may be cached
+    cachedGeometry = None
+    if geometryCache!=None:
+        cachedGeometry = geometryCache.load(name)
+    if cachedGeometry==None and geometry==None:
+        geometry = parseSegmentGeometry(node)
+    faceVertices = None
+    
     for child in list(node):
-        # parse vertices
+        # vertices are converted above
         if child.tag == "vertices":
-            _parseSegmentVertices(child, segmentParams)
+            pass
         # parse faces
         elif child.tag == "faces":
-            _parseSegmentFaces(child, segmentParams, xmlStateGroups)
+            faceVertices = _parseSegmentFaceStates(child, segmentParams, xmlStateGroups)
         # parse evaluators
         elif child.tag == "evaluators":
             _parseSegmentEvaluators(child, segmentParams, xmlStateGroups)
@@ -347,6 +654,18 @@ def _parseSegmentNode(name, node, xmlStateGroups):
         else:
             print "WARNING: XML: unknown tag '%s'" % child.tag
     
+    if faceVertices!=None:
+        if cachedGeometry!=None:
+            _setCachedSegmentGeometry(segmentParams, cachedGeometry, faceVertices)
+        elif geometry!=None:
+            _setSegmentGeometry(segmentParams, geometry, faceVertices)
+            if geometryCache!=None:
+                # let the segment save its vertex data after processing
+                segmentParams['geometryCache'] = (geometryCache, name)
+        else:
+            print "WARNING: no vertex data for segment '%s'" % name
+            return None
+    
     try:
         segmentCls = segmentParams['cls']
     except:
@@ -383,6 +702,40 @@ def _parseEvaluatorCtrls(node, level=0):
 ### ###
 
 
+class XMLSegmentHandle(object):
+    """
+    lazy handle of a segment, the vertex data of the segment
+    is parsed and converted on first load.
+    the xml nodes are kept until the handle is released.
+    """
+    def __init__(self, xmlSegments, name):
+        self.xmlSegments = xmlSegments
+        self.name = name
+        self.segment = None
+        self.loaded = False
+        self.released = False
+    def load(self):
+        """
+        returns the segment tuple like XMLSegments.loadSegment.
+        """
+        if not self.loaded:
+            self.segment = self.xmlSegments.loadSegment(self.name)
+            self.loaded = True
+        return self.segment
+    def prefetch(self):
+        """
+        converts the vertex data of the segment without loading it.
+        """
+        if not self.loaded:
+            self.xmlSegments.prefetchSegment(self.name)
+    def release(self):
+        """
+        tells the segment manager that the xml nodes are not needed anymore.
+        """
+        if not self.released:
+            self.released = True
+            self.xmlSegments.releaseHandle()
+
 class XMLSegments(object):
     """
     class managing segment xml nodes.
@@ -390,25 +743,118 @@ class XMLSegments(object):
     def __init__(self, xmlStateGroups):
         self.xmlStateGroups = xmlStateGroups
         self.segmentNodes = {}
-    def loadSegment(self, name):
-        try:
-            segmentNode = self.segmentNodes[name]
-        except:
+        # geometry cache of the file defining the segment
+        self.geometryCaches = {}
+        # vertex data converted while streaming the file
+        self.segmentGeometry = {}
+        # guards vertex data conversion, segments may be prefetched
+        # by a background thread
+        self.lock = Lock()
+        # number of lazy handles not loaded yet,
+        # the xml nodes are kept until all handles are loaded
+        self.numHandles = 0
+        self.pendingCleanup = None
+    def loadSegment(self, name, lazy=False):
+        """
+        creates the segment tuple (name, params, class) for a segment.
+        with lazy=True a XMLSegmentHandle is returned instead,
+        the segment is created when the handle is loaded.
+        """
+        if not self.segmentNodes.has_key(name):
             print "WARNING: cannot load segment '%s'" % name
             return
-        return _parseSegmentNode(name, segmentNode, self.xmlStateGroups)
-    def addSegment(self, node):
-        self.segmentNodes[node.get('name')] = node
+        if lazy:
+            self.numHandles += 1
+            return XMLSegmentHandle(self, name)
+        self.lock.acquire()
+        try:
+            return _parseSegmentNode(name, self.segmentNodes[name], self.xmlStateGroups,
+                                     self.geometryCaches.get(name),
+                                     self.segmentGeometry.get(name))
+        finally:
+            self.lock.release()
+    def prefetchSegment(self, name):
+        """
+        parses and processes the vertex data of a segment.
+        the segment loads the processed vertex data like cached geometry then.
+        """
+        self.lock.acquire()
+        try:
+            node = self.segmentNodes.get(name)
+            if node==None: return
+            geometryCache = self.geometryCaches.get(name)
+            if geometryCache!=None and geometryCache.hasSegment(name):
+                return
+            geometry = self.segmentGeometry.get(name)
+            if geometry==None:
+                geometry = parseSegmentGeometry(node)
+            if geometry!=None:
+                geometry = processSegmentGeometry(name, node, geometry)
+            if geometry==None: return
+            if geometryCache!=None:
+                geometryCache.save(name, geometry)
+            self.geometryCaches[name] = GeometryPayload({name: geometry}, geometryCache)
+            if self.segmentGeometry.has_key(name):
+                del self.segmentGeometry[name]
+        finally:
+            self.lock.release()
+    def prefetch(self, names):
+        """
+        prefetches segments with given names in a background thread.
+        returns the started thread.
+        """
+        def _prefetch():
+            for name in names:
+                self.prefetchSegment(name)
+        thread = Thread(target=_prefetch, name="segment prefetch")
+        thread.setDaemon(True)
+        thread.start()
+        return thread
+    def addSegment(self, node, geometryCache=None, geometry=None):
+        name = node.get('name')
+        self.segmentNodes[name] = node
+        self.geometryCaches[name] = geometryCache
+        if geometry!=None:
+            self.segmentGeometry[name] = geometry
+    def releaseHandle(self):
+        self.numHandles -= 1
+        if self.numHandles==0 and self.pendingCleanup!=None:
+            cleanup = self.pendingCleanup
+            self.pendingCleanup = None
+            cleanup()
+    def cleanupLater(self, cleanup):
+        """
+        calls cleanup as soon as all lazy handles are loaded.
+        """
+        if self.numHandles>0:
+            self.pendingCleanup = cleanup
+        else:
+            cleanup()
     def cleanup(self):
-        for node in self.segmentNodes.values():
-            node.clear()
-        self.segmentNodes = {}
+        self.lock.acquire()
+        try:
+            for node in self.segmentNodes.values():
+                node.clear()
+            self.segmentNodes = {}
+            self.geometryCaches = {}
+            self.segmentGeometry = {}
+        finally:
+            self.lock.release()
     def join(self, other):
         nodes = self.segmentNodes.copy()
+        caches = self.geometryCaches.copy()
+        geometry = self.segmentGeometry.copy()
         for n in other.segmentNodes.keys():
             nodes[n] = other.segmentNodes[n]
+            caches[n] = other.geometryCaches.get(n)
+            if other.segmentGeometry.has_key(n):
+                geometry[n] = other.segmentGeometry[n]
+            elif geometry.has_key(n):
+                del geometry[n]
         buf = XMLSegments(self.xmlStateGroups)
         buf.segmentNodes = nodes
+        buf.geometryCaches = caches
+        buf.segmentGeometry = geometry
         return buf
 
 def loadXMLSegment(xmlSegments, name):
@@ -417,15 +863,18 @@ def loadXMLSegment(xmlSegments, name):
     """
     return xmlSegments.loadSegment(name)
 
-def parseSegmentsNode(node, xmlStateGroups):
+def parseSegmentsNode(node, xmlStateGroups, geometryCache=None, segmentGeometry=None):
     """
     only segment names are evaluated here
     """
+    if segmentGeometry==None:
+        segmentGeometry = {}
     xmlSegments = XMLSegments(xmlStateGroups)
     for child in list(node):
         if child.tag != "segment":
             continue
-        xmlSegments.addSegment(child)
+        xmlSegments.addSegment(child, geometryCache,
+                               segmentGeometry.get(child.get('name')))
     return xmlSegments
 
 def cleanupSegments(xmlSegments):